@@ -2,36 +2,48 @@
 # Android XML format
 #
 # Usage:
-#     python app_lang_translate.py <langfile.xlsx>
+#     python app_lang_translate.py <langfile.xlsx> [<langfile.xlsx> | <dir>]...
 # where:
-#     lang_file.xlsx: language translations file in HelpinOut format
+#     lang_file.xlsx: language translations file in HelpinOut format, or a
+#          CSV, TSV, or JSON table with the same layout
+#     dir: directory of language translations files
 #
 # Try:
 #     python app_lang_translate.py --help
 # for a detailed help message
 import argparse
 import logging
+import os
 import sys
 
 from  constants import (
-    ENGLISH_COL, JSON_LANG_ROW, JSON_ZIP_FILE_NAME, LOG_LEVELS, START_COL,
-    START_ROW, XML_CDATA_COL, XML_KEY_COL, XML_LANG_ROW, XML_TRANS_COL,
-    XML_ZIP_FILE_NAME
+    ALL_OUT_FMTS, DEF_LOG_LEVEL, DEF_XLSX_ENGINE, DELTA_DIR_NAME,
+    DELTA_ZIP_FILE_NAME, ENGLISH_COL, IN_FMTS, JSON_LANG_ROW,
+    JSON_ZIP_FILE_NAME, LOG_LEVELS, OUT_FMTS, OUT_FMT_JSON, OUT_FMT_PACK,
+    OUT_FMT_XML, PACK_FILE_NAME, PROFILE_FILE_NAME, START_COL, START_ROW,
+    VALIDATION_FILE_NAME, WATCH_INTERVAL, XLSX_ENGINES, XLSX_ENGINE_LXML,
+    XML_CDATA_COL, XML_KEY_COL, XML_LANG_ROW, XML_TRANS_COL, XML_ZIP_FILE_NAME
+)
+from delta import DeltaPacks
+from utils import (
+    AppLangTranslate, Profiler, Validator, export_batch, get_peak_memory
 )
-from utils import AppLangTranslate
 
 COLS = '{},0'.format( START_COL )
 ROWS = '{},0'.format( START_ROW )
 
 LANG_ROWS = '{},{}'.format( JSON_LANG_ROW, XML_LANG_ROW )
 
-FMT_JSON = 'json'
-FMT_XML = 'xml'
-OUTPUT_FMTS = [FMT_JSON, FMT_XML]
+FMT_JSON = OUT_FMT_JSON
+FMT_XML = OUT_FMT_XML
+FMT_PACK = OUT_FMT_PACK
+OUTPUT_FMTS = list( ALL_OUT_FMTS )
+DEF_OUTPUT_FMTS = list( OUT_FMTS )
 
 EXIT_SUCCESS = 0
 EXIT_FAILURE_MISSING_ARG = 1
 EXIT_FAILURE_RUNTIME_ERROR = 2
+EXIT_FAILURE_VALIDATION = 3
 
 def _parse_command_line():
     parser = argparse.ArgumentParser(
@@ -45,9 +57,13 @@ def _parse_command_line():
     )
 
     parser.add_argument(
-        '-o', '--out', default=','.join( OUTPUT_FMTS ),
-        help='Comma-separated list of output format(s) from "{}". '
-        'Default is "{}"'.format( OUTPUT_FMTS, ','.join( OUTPUT_FMTS ) )
+        '-o', '--out', default=','.join( DEF_OUTPUT_FMTS ),
+        help='Comma-separated list of output format(s) from "{}". "{}" is a '
+        'binary language pack of all languages for servers, "{}", which is '
+        'written to the output directory, and can be memory-mapped. Default '
+        'is "{}"'.format(
+            OUTPUT_FMTS, FMT_PACK, PACK_FILE_NAME, ','.join( DEF_OUTPUT_FMTS )
+        )
     )
 
     parser.add_argument(
@@ -120,11 +136,193 @@ def _parse_command_line():
         'encountered.'
     )
 
+    parser.add_argument(
+        '-j', '--jobs', default=1, type=int,
+        help='No. of worker processes in which language columns are '
+        'converted in parallel. Zero means the no. of CPUs. Default is "1"'
+    )
+
+    parser.add_argument(
+        '--incremental', default=False, action='store_true',
+        help='Only convert language columns whose contents, or the shared '
+        'key, flag, and English columns, changed since the previous '
+        'incremental run. The previous output is reused for the others. '
+        'Default is to convert all columns'
+    )
+
+    parser.add_argument(
+        '-w', '--watch', default=False, action='store_true',
+        help='Keep running, and convert again, incrementally, whenever the '
+        '.xlsx file changes. Stop with Ctrl-C. Default is to convert once'
+    )
+
+    parser.add_argument(
+        '--watch_interval', default=WATCH_INTERVAL, type=float,
+        help='Interval in seconds at which the .xlsx file is checked for '
+        'changes in watch mode. Default is "{}"'.format( WATCH_INTERVAL )
+    )
+
+    parser.add_argument(
+        '--out_dir', default='',
+        help='Directory for output files. With several .xlsx files, or a '
+        'directory of them, the output of each is written to a '
+        'sub-directory named after the file. Default is the current '
+        'directory'
+    )
+
+    parser.add_argument(
+        '--compact', default=False, action='store_true',
+        help='Write iOS JSON files compactly, with no whitespace, which is '
+        'smaller, and faster. orjson is used, if installed. Default is to '
+        'indent them'
+    )
+
+    parser.add_argument(
+        '--omit_fallback', default=False, action='store_true',
+        help='Leave out entries of languages other than English that are '
+        'missing, or the same as English, and rely on the platform fallback '
+        'to English in the apps instead. The bytes saved for each language '
+        'are printed at the end. Default is to write English for them'
+    )
+
+    parser.add_argument(
+        '--engine', choices=XLSX_ENGINES, default=DEF_XLSX_ENGINE,
+        help='Engine to read .xlsx files with. "{}" reads the sheet XML '
+        'directly, and is several times faster. Both give the same output. '
+        'Default is "{}"'.format( XLSX_ENGINE_LXML, DEF_XLSX_ENGINE )
+    )
+
+    parser.add_argument(
+        '--input_fmt', choices=IN_FMTS,
+        help='Format of input files: .xlsx, or a plain-text table with the '
+        'same layout, which is read with no spreadsheet decoding. A JSON '
+        'table is a list of rows, each a list of cell values. Default is '
+        'the format for the file extension, or .xlsx'
+    )
+
+    parser.add_argument(
+        '--profile', nargs='?', const=PROFILE_FILE_NAME,
+        help='Write a JSON report of the wall time, CPU time, and peak '
+        'memory of each stage, in total, and for each language column, to '
+        'this file. Columns are then converted in this process, whatever '
+        'the no. of jobs, and memory tracing slows conversion down. Default '
+        'file is "{}"'.format( PROFILE_FILE_NAME )
+    )
+
+    parser.add_argument(
+        '--profile_stats',
+        help='Write cProfile statistics of the conversion to this file, for '
+        'the "pstats" module'
+    )
+
+    parser.add_argument(
+        '--memory_budget', type=float,
+        help='Memory-bounded mode, with this budget in MiB for the '
+        'translations kept in memory. The rest are spilled to a temporary '
+        'file, languages are converted one at a time in this process, and '
+        'the peak memory is printed at the end. Large shared strings of '
+        '.xlsx files are only kept out of memory with "--engine {}". '
+        'Default is no budget'.format( XLSX_ENGINE_LXML )
+    )
+
+    parser.add_argument(
+        '--delta',
+        help='After converting, write delta language packs against this '
+        'previous export: a copy of an earlier output directory, or of an '
+        'output .zip file. A JSON patch of the keys added, changed, and '
+        'removed is written for each changed language, with a manifest, to '
+        '"{}", or to a "{}" directory with --filesystem'.format(
+            DELTA_ZIP_FILE_NAME, DELTA_DIR_NAME
+        )
+    )
+
+    parser.add_argument(
+        '--validate', nargs='?', const=VALIDATION_FILE_NAME,
+        help='Check translations while they are read: format specifiers, '
+        'e.g., "%%1$s", are the same as in English, markup is balanced, '
+        'CDATA entries do not contain "]]>", and keys are unique. A JSON '
+        'report of issues is written to this file, and the exit status is '
+        '{} if there are any. Default file is "{}"'.format(
+            EXIT_FAILURE_VALIDATION, VALIDATION_FILE_NAME
+        )
+    )
+
     return parser.parse_known_args()
 
+def _write_profile(args, profiler):
+    """
+    Stops the profiler, and writes the report, and the cProfile statistics
+    as requested on the command line
+    """
+    profiler.stop()
+
+    try:
+        if args.profile:
+            profiler.write_report( args.profile )
+            logging.info(
+                'Wrote profiling report to "{}"'.format( args.profile )
+            )
+
+        if args.profile_stats:
+            profiler.dump_stats( args.profile_stats )
+            logging.info(
+                'Wrote cProfile statistics to "{}"'.format(
+                    args.profile_stats
+                )
+            )
+    except OSError as e:
+        print(
+            'Writing profile failed. {}:{}'.format( e.__class__.__name__, e ),
+            file=sys.stderr
+        )
+
+def _write_validation(args, validator):
+    """
+    Writes the validation report, and prints a summary of issues
+    """
+    report = validator.report()
+    for kind, count in sorted( report['counts'].items() ):
+        print(
+            'Validation: {} issue(s) of type "{}"'.format( count, kind ),
+            file=sys.stderr
+        )
+
+    try:
+        validator.write_report( args.validate )
+        logging.info(
+            'Wrote validation report to "{}"'.format( args.validate )
+        )
+    except OSError as e:
+        print(
+            'Writing validation report failed. {}:{}'.format(
+                e.__class__.__name__, e
+            ), file=sys.stderr
+        )
+
+def _print_peak_memory():
+    peak = get_peak_memory()
+    if peak is not None:
+        print(
+            'Peak memory: {:.1f} MiB'.format( peak / 2**20 ), file=sys.stderr
+        )
+
+def _success_status(kwargs):
+    """
+    Returns the exit status of a successful conversion: a failure if
+    validation found issues
+    """
+    validator = kwargs.get( 'validator' )
+    if validator is not None and validator.issues:
+        return EXIT_FAILURE_VALIDATION
+
+    return EXIT_SUCCESS
+
 def main():
     args, files = _parse_command_line()
 
+    # The library leaves the logging configuration to its caller
+    logging.basicConfig( level=DEF_LOG_LEVEL )
+
     try:
         start_row, end_row = map( int, args.rows.split( ',' ) )
     except ValueError:
@@ -148,33 +346,130 @@ def main():
 
     if len( files ) == 0:
         print(
-            'Need exactly one argument: path to .xlsx file of language '
+            'Need at least one argument: path to .xlsx file of language '
             'translataions tobe converted to XML', file=sys.stderr
         )
 
         exit( EXIT_FAILURE_MISSING_ARG )
-    elif len( files ) > 1:
-        print(
-            'Ignoring all arguments agter the first,"{}"',format( file )
+
+    fmts = [fmt for fmt in OUTPUT_FMTS if fmt in args.out]
+
+    kwargs = dict(
+        start_col=start_col, end_col=end_col, start_row=start_row,
+        end_row=end_row, json_lang_row=json_lang_row,
+        xml_lang_row=xml_lang_row, english_col=args.english_col,
+        xml_cdata_col=args.cdata_col, xml_key_col=args.key_col,
+        xml_trans_col=args.trans_col, stop_on_null=not args.continue_on_null,
+        filesystem=args.filesystem, incremental=args.incremental,
+        compact=args.compact, engine=args.engine, input_fmt=args.input_fmt,
+        omit_fallback=args.omit_fallback
+    )
+
+    if args.memory_budget:
+        kwargs['memory_budget'] = int( args.memory_budget * 2**20 )
+
+    profiler = None
+    if args.profile or args.profile_stats:
+        profiler = kwargs['profiler'] = Profiler(
+            stats=bool( args.profile_stats )
+        )
+        profiler.start()
+
+    validator = None
+    if args.validate:
+        validator = kwargs['validator'] = Validator()
+
+    try:
+        _convert( args, files, fmts, kwargs )
+    finally:
+        if profiler is not None:
+            _write_profile( args, profiler )
+
+        if validator is not None:
+            _write_validation( args, validator )
+
+        if args.memory_budget:
+            _print_peak_memory()
+
+def _convert(args, files, fmts, kwargs):
+    """
+    Converts the files as per the command line, and exits
+    """
+    if len( files ) > 1 or os.path.isdir( files[0] ):
+        # Batch mode: one output directory per workbook
+        if args.watch or args.delta:
+            print(
+                '--watch, and --delta need exactly one .xlsx file',
+                file=sys.stderr
+            )
+            exit( EXIT_FAILURE_MISSING_ARG )
+
+        fallback_savings = {}
+        try:
+            failed = export_batch(
+                files, fmts, out_dir=args.out_dir, jobs=args.jobs,
+                stop_on_err=args.stop_on_err, level=args.level,
+                fallback_savings=fallback_savings, **kwargs
+            )
+        except Exception as e:
+            print(
+                'Processing failed. {}:{}'.format( e.__class__.__name__, e ),
+                file=sys.stderr
+            )
+            exit( EXIT_FAILURE_RUNTIME_ERROR )
+
+        for path, savings in fallback_savings.items():
+            for out_path, saved in savings.items():
+                print( '{}: {}: {} bytes saved'.format( path, out_path, saved ) )
+
+        for path, e in failed.items():
+            print(
+                'Processing failed for "{}". {}:{}'.format(
+                    path, e.__class__.__name__, e
+                ), file=sys.stderr
+            )
+
+        exit(
+            EXIT_FAILURE_RUNTIME_ERROR if failed else _success_status( kwargs )
         )
 
     try:
         app_lang_translate = AppLangTranslate(
-            files[0], start_col=start_col, end_col=end_col,
-            start_row=start_row, end_row=end_row, json_lang_row=json_lang_row,
-            xml_lang_row=xml_lang_row, english_col=args.english_col,
-            xml_cdata_col=args.cdata_col, xml_key_col=args.key_col,
-            xml_trans_col=args.trans_col,
-            stop_on_null=not args.continue_on_null,
-            stop_on_err=args.stop_on_err, filesystem=args.filesystem
+            files[0], stop_on_err=args.stop_on_err, jobs=args.jobs,
+            out_dir=args.out_dir, **kwargs
         )
 
         if args.level:
             app_lang_translate.set_log_level( args.level )
 
-        if FMT_JSON in args.out:
+        if args.watch:
+            try:
+                app_lang_translate.watch(
+                    fmts, interval=args.watch_interval
+                )
+            except KeyboardInterrupt:
+                pass
+        elif len( fmts ) > 1:
+            # Load the workbook only once for all output formats
+            app_lang_translate.export( fmts )
+        elif FMT_JSON in fmts:
             app_lang_translate.to_json()
+        elif FMT_XML in fmts:
+            app_lang_translate.to_xml()
+        elif FMT_PACK in fmts:
+            app_lang_translate.to_pack()
+
+        for path, saved in app_lang_translate.fallback_savings.items():
+            print( '{}: {} bytes saved'.format( path, saved ) )
 
+        if args.delta:
+            DeltaPacks(
+                args.delta, args.out_dir or os.curdir,
+                filesystem=args.filesystem, out_dir=args.out_dir,
+                profiler=kwargs.get( 'profiler' )
+            ).write()
+
+        if FMT_JSON in fmts:
             if args.filesystem:
                 logging.info(
                     'Wrote iOS language translation files to local files'
@@ -186,9 +481,7 @@ def main():
                     )
                 )
 
-        if FMT_XML in args.out:
-            app_lang_translate.to_xml()
-
+        if FMT_XML in fmts:
             if args.filesystem:
                 logging.info(
                     'Wrote Android language translation files to local values* '
@@ -200,6 +493,13 @@ def main():
                         XML_ZIP_FILE_NAME
                     )
                 )
+
+        if FMT_PACK in fmts:
+            logging.info(
+                'Wrote the binary language pack to "{}"'.format(
+                    PACK_FILE_NAME
+                )
+            )
     except Exception as e:
         print(
             'Processing failed. {}:{}'.format( e.__class__.__name__, e ),
@@ -207,7 +507,7 @@ def main():
         )
         exit( EXIT_FAILURE_RUNTIME_ERROR )
 
-    exit( EXIT_SUCCESS )
+    exit( _success_status( kwargs ) )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,388 @@
+# Script to benchmark conversion of language translation files for
+# HelpinOut, on synthetic files of a configurable size
+#
+# Times AppLangTranslate.to_json(), to_xml(), export(), and XML2JSON.to_json()
+# end to end, and the stages of a conversion through the public in-process
+# API: loading the workbook, building, and serializing JSON, and XML strings,
+# as recorded by a Profiler, rendering all with render(), and writing .zip
+# files of the rendered files. Results can be saved as JSON, and compared
+# with a saved baseline to catch regressions
+#
+# Usage:
+#     python benchmark.py --out results.json
+#     python benchmark.py --baseline results.json
+#
+# Try:
+#     python benchmark.py --help
+# for a detailed help message
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import lxml.etree
+import openpyxl
+
+from constants import (
+    DEF_LOG_LEVEL, DEF_XLSX_ENGINE, OUT_FMTS, XLSX_ENGINES, XML_ZIP_FILE_NAME
+)
+from synth_workbook import (
+    DEF_BLANK_ROWS, DEF_CDATA_RATIO, DEF_MISSING_RATIO, DEF_NONTRANS_RATIO,
+    DEF_SEED, make_workbook
+)
+from utils import (
+    AppLangTranslate, Profiler, XML2JSON, orjson, write_artifacts
+)
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE_REGRESSION = 1
+EXIT_FAILURE_RUNTIME_ERROR = 2
+
+# Version of the format of results
+RESULTS_VERSION = 3
+
+DEF_NLANGS = 20
+DEF_NKEYS = 2000
+DEF_REPEAT = 3
+# Allowed slowdown relative to the baseline, as a fraction
+DEF_TOLERANCE = 0.2
+# Differences in seconds below this are noise, and never a regression
+MIN_DIFF = 0.01
+
+# Stages of results to stages recorded by the Profiler in render()
+PROFILE_STAGES = {
+    'load': ('load_workbook', 'extract'),
+    'json_strings': ('json_strings',),
+    'json_serialize': ('json_serialize',),
+    'xml_strings': ('xml_strings',),
+    'xml_serialize': ('xml_serialize',),
+}
+
+class _Timer:
+    """
+    Context manager that records wall, and CPU time of a block in a dict of
+    stage names to lists of (wall, cpu) pairs
+    """
+    def __init__(self, times, stage):
+        self.times = times
+        self.stage = stage
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def __exit__(self, *args):
+        self.times.setdefault( self.stage, [] ).append(
+            (
+                time.perf_counter() - self.wall,
+                time.process_time() - self.cpu
+            )
+        )
+
+def _run_once(
+        path, out_dir, times, jobs=1, compact=False, engine=DEF_XLSX_ENGINE
+):
+    """
+    Runs every benchmark once on the workbook at path, and adds times to
+    times
+    """
+    def translate(**kwargs):
+        return AppLangTranslate(
+            path, out_dir=out_dir, jobs=jobs, compact=compact, engine=engine,
+            **kwargs
+        )
+
+    # Stages, through the in-process API. The profiler is not started, so
+    # memory is not traced, which would slow the stages down. Columns are
+    # rendered in this process
+    profiler = Profiler()
+    with _Timer( times, 'render' ):
+        rendered = translate( profiler=profiler ).render( OUT_FMTS )
+
+    for stage, names in PROFILE_STAGES.items():
+        stats = [profiler.stages[name] for name in names]
+        times.setdefault( stage, [] ).append(
+            (
+                sum( stat['wall'] for stat in stats ),
+                sum( stat['cpu'] for stat in stats )
+            )
+        )
+
+    with _Timer( times, 'write_zip' ):
+        for fmt, files in rendered.items():
+            write_artifacts(
+                files, out_dir=os.path.join( out_dir, 'rendered' ),
+                zip_name='{}.zip'.format( fmt )
+            )
+
+    # End to end
+    with _Timer( times, 'to_json' ):
+        translate().to_json()
+
+    with _Timer( times, 'to_xml' ):
+        translate().to_xml()
+
+    with _Timer( times, 'export' ):
+        translate().export( OUT_FMTS )
+
+    with _Timer( times, 'xml2json' ):
+        XML2JSON(
+            [os.path.join( out_dir, XML_ZIP_FILE_NAME )], out_dir=out_dir,
+            jobs=jobs, compact=compact
+        ).to_json()
+
+def run(
+        nlangs=DEF_NLANGS, nkeys=DEF_NKEYS, cdata_ratio=DEF_CDATA_RATIO,
+        nontrans_ratio=DEF_NONTRANS_RATIO, missing_ratio=DEF_MISSING_RATIO,
+        blank_rows=DEF_BLANK_ROWS, seed=DEF_SEED, repeat=DEF_REPEAT, jobs=1,
+        workbook=None, compact=False, engine=DEF_XLSX_ENGINE
+):
+    """
+    Runs the benchmarks, and returns the results as a dict. The time of each
+    stage is the minimum over all repeats
+
+    workbook: either None, or the path to a workbook to use instead of a
+         synthetic one. The other arguments for the synthetic workbook are
+         then ignored
+    compact: if True, iOS JSON is written compactly
+    engine: engine to read .xlsx files with, from XLSX_ENGINES
+    Other arguments are as for synth_workbook.make_workbook()
+    """
+    params = {
+        'langs': nlangs, 'keys': nkeys, 'cdata_ratio': cdata_ratio,
+        'nontrans_ratio': nontrans_ratio, 'missing_ratio': missing_ratio,
+        'blank_rows': blank_rows, 'seed': seed, 'repeat': repeat,
+        'jobs': jobs, 'workbook': workbook, 'compact': compact,
+        'engine': engine,
+    }
+
+    times = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = workbook
+        if path is None:
+            path = os.path.join( tmp_dir, 'synth.xlsx' )
+            make_workbook(
+                path, nlangs=nlangs, nkeys=nkeys, cdata_ratio=cdata_ratio,
+                nontrans_ratio=nontrans_ratio, missing_ratio=missing_ratio,
+                blank_rows=blank_rows, seed=seed
+            )
+
+        out_dir = os.path.join( tmp_dir, 'out' )
+        for _ in range( repeat ):
+            _run_once(
+                path, out_dir, times, jobs=jobs, compact=compact,
+                engine=engine
+            )
+
+    return {
+        'version': RESULTS_VERSION,
+        'params': params,
+        'env': {
+            'python': platform.python_version(),
+            'openpyxl': openpyxl.__version__,
+            'lxml': '.'.join( map( str, lxml.etree.LXML_VERSION ) ),
+            'orjson': None if orjson is None else orjson.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'results': {
+            stage: {
+                'wall': min( wall for wall, _ in vals ),
+                'cpu': min( cpu for _, cpu in vals ),
+            } for stage, vals in times.items()
+        },
+    }
+
+def compare(results, baseline, tolerance=DEF_TOLERANCE):
+    """
+    Compares results with a baseline. Returns a list of (stage, baseline wall
+    time, wall time) for stages that are slower than the baseline by more
+    than the tolerance
+    """
+    regressions = []
+    for stage, vals in results['results'].items():
+        base = baseline['results'].get( stage )
+        if base is None:
+            continue
+
+        wall, base_wall = vals['wall'], base['wall']
+        if wall > base_wall * ( 1 + tolerance ) and \
+           wall - base_wall > MIN_DIFF:
+            regressions.append( (stage, base_wall, wall) )
+
+    return regressions
+
+def _print_results(results, baseline=None):
+    base_results = {} if baseline is None else baseline['results']
+
+    print( '{:<14} {:>10} {:>10} {:>10}'.format(
+        'stage', 'wall (s)', 'cpu (s)', 'baseline'
+    ) )
+    for stage, vals in results['results'].items():
+        base = base_results.get( stage )
+        print( '{:<14} {:>10.4f} {:>10.4f} {:>10}'.format(
+            stage, vals['wall'], vals['cpu'],
+            '' if base is None else '{:.4f}'.format( base['wall'] )
+        ) )
+
+def _parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Benchmark conversion of language translation files, '
+        'on a synthetic file in the HelpinOut format. Prints the time of '
+        'each stage, and optionally saves the results as JSON, or compares '
+        'them with a saved baseline.'
+    )
+
+    parser.add_argument(
+        '-l', '--langs', default=DEF_NLANGS, type=int,
+        help='No. of languages, including English. Default is "{}"'.format(
+            DEF_NLANGS
+        )
+    )
+
+    parser.add_argument(
+        '-k', '--keys', default=DEF_NKEYS, type=int,
+        help='No. of keys. Default is "{}"'.format( DEF_NKEYS )
+    )
+
+    parser.add_argument(
+        '--cdata_ratio', default=DEF_CDATA_RATIO, type=float,
+        help='Fraction of keys with CDATA. Default is "{}"'.format(
+            DEF_CDATA_RATIO
+        )
+    )
+
+    parser.add_argument(
+        '--nontrans_ratio', default=DEF_NONTRANS_RATIO, type=float,
+        help='Fraction of keys that are not translatable. Default is '
+        '"{}"'.format( DEF_NONTRANS_RATIO )
+    )
+
+    parser.add_argument(
+        '--missing_ratio', default=DEF_MISSING_RATIO, type=float,
+        help='Fraction of missing translations. Default is "{}"'.format(
+            DEF_MISSING_RATIO
+        )
+    )
+
+    parser.add_argument(
+        '--blank_rows', default=DEF_BLANK_ROWS, type=int,
+        help='No. of blank rows at the end. Default is "{}"'.format(
+            DEF_BLANK_ROWS
+        )
+    )
+
+    parser.add_argument(
+        '--seed', default=DEF_SEED, type=int,
+        help='Seed for random numbers. Default is "{}"'.format( DEF_SEED )
+    )
+
+    parser.add_argument(
+        '--workbook',
+        help='Benchmark this .xlsx file instead of a synthetic one'
+    )
+
+    parser.add_argument(
+        '-n', '--repeat', default=DEF_REPEAT, type=int,
+        help='No. of times to repeat each benchmark. The minimum time is '
+        'reported. Default is "{}"'.format( DEF_REPEAT )
+    )
+
+    parser.add_argument(
+        '-j', '--jobs', default=1, type=int,
+        help='No. of worker processes. Zero means the no. of CPUs. Default '
+        'is "1"'
+    )
+
+    parser.add_argument(
+        '--compact', default=False, action='store_true',
+        help='Write iOS JSON files compactly'
+    )
+
+    parser.add_argument(
+        '--engine', choices=XLSX_ENGINES, default=DEF_XLSX_ENGINE,
+        help='Engine to read .xlsx files with. Default is "{}"'.format(
+            DEF_XLSX_ENGINE
+        )
+    )
+
+    parser.add_argument(
+        '-o', '--out', help='Save results as JSON to this file'
+    )
+
+    parser.add_argument(
+        '-b', '--baseline',
+        help='Compare results with this baseline, saved earlier with --out. '
+        'The exit status is {} if any stage is slower'.format(
+            EXIT_FAILURE_REGRESSION
+        )
+    )
+
+    parser.add_argument(
+        '-t', '--tolerance', default=DEF_TOLERANCE, type=float,
+        help='Allowed slowdown relative to the baseline, as a fraction. '
+        'Default is "{}"'.format( DEF_TOLERANCE )
+    )
+
+    return parser.parse_args()
+
+def main():
+    args = _parse_command_line()
+
+    # The library leaves the logging configuration to its caller
+    logging.basicConfig( level=DEF_LOG_LEVEL )
+
+    try:
+        baseline = None
+        if args.baseline:
+            with open( args.baseline, 'r' ) as finp:
+                baseline = json.loads( finp.read() )
+
+        results = run(
+            nlangs=args.langs, nkeys=args.keys, cdata_ratio=args.cdata_ratio,
+            nontrans_ratio=args.nontrans_ratio,
+            missing_ratio=args.missing_ratio, blank_rows=args.blank_rows,
+            seed=args.seed, repeat=args.repeat, jobs=args.jobs,
+            workbook=args.workbook, compact=args.compact,
+            engine=args.engine
+        )
+
+        if args.out:
+            with open( args.out, 'w' ) as foutp:
+                foutp.write( json.dumps( results, indent=4 ) )
+    except Exception as e:
+        print(
+            'Benchmark failed. {}:{}'.format( e.__class__.__name__, e ),
+            file=sys.stderr
+        )
+        exit( EXIT_FAILURE_RUNTIME_ERROR )
+
+    _print_results( results, baseline )
+
+    if baseline is not None:
+        if baseline.get( 'params' ) != results['params']:
+            print(
+                'Baseline was run with different parameters: {}'.format(
+                    baseline.get( 'params' )
+                ), file=sys.stderr
+            )
+
+        regressions = compare( results, baseline, args.tolerance )
+        for stage, base_wall, wall in regressions:
+            print(
+                'Regression in "{}": {:.4f}s vs. {:.4f}s in baseline'.format(
+                    stage, wall, base_wall
+                ), file=sys.stderr
+            )
+
+        if regressions:
+            exit( EXIT_FAILURE_REGRESSION )
+
+    exit( EXIT_SUCCESS )
+
+if __name__ == "__main__":
+    main()
@@ -22,11 +22,124 @@ XML_LANG_FILE_NAME = 'strings.xml'
 # English is dealt with specially in Android (e.g., some strings are not
 # translatable)
 XML_LANG_ENGLISH_CODE = 'values'
+# Language code of English for iOS JSON, for the default Android resources
+JSON_LANG_ENGLISH_CODE = 'en'
+
+# Indentation of iOS JSON files, unless they are written compactly
+JSON_INDENT = 4
+
+# Output formats (targets): JSON for iOS, and XML for Android, which are
+# written by default, and a binary language pack of all languages for servers
+OUT_FMT_JSON = 'json'
+OUT_FMT_XML = 'xml'
+OUT_FMT_PACK = 'pack'
+OUT_FMTS = (OUT_FMT_JSON, OUT_FMT_XML,)
+ALL_OUT_FMTS = OUT_FMTS + (OUT_FMT_PACK,)
+
+# Extension of workbook files
+XLSX_EXT = '.xlsx'
+
+# Input formats: .xlsx workbooks, and plain-text tables with the same layout
+# of rows, and columns, as CSV, TSV, or JSON (a list of rows, each a list of
+# cell values)
+IN_FMT_XLSX = 'xlsx'
+IN_FMT_CSV = 'csv'
+IN_FMT_TSV = 'tsv'
+IN_FMT_JSON = 'json'
+IN_FMTS = (IN_FMT_XLSX, IN_FMT_CSV, IN_FMT_TSV, IN_FMT_JSON,)
+# Input formats for file extensions
+IN_FMT_EXTS = {
+    XLSX_EXT: IN_FMT_XLSX,
+    '.csv': IN_FMT_CSV,
+    '.tsv': IN_FMT_TSV,
+    '.json': IN_FMT_JSON,
+}
+
+# Text values of flag cells (CDATA, and translatable) in plain-text tables,
+# e.g., CSV files, that are set, and unset
+FLAG_TEXT_SET = ('yes', 'true', '1',)
+FLAG_TEXT_UNSET = ('no', 'false', '0',)
+
+# Engines to read .xlsx files: openpyxl, or a direct reader of the sheet XML
+# with lxml, which is faster, and gives the same cell values
+XLSX_ENGINE_OPENPYXL = 'openpyxl'
+XLSX_ENGINE_LXML = 'lxml'
+XLSX_ENGINES = (XLSX_ENGINE_OPENPYXL, XLSX_ENGINE_LXML,)
+DEF_XLSX_ENGINE = XLSX_ENGINE_OPENPYXL
 
 # Names of output zip files
 JSON_ZIP_FILE_NAME = 'ios_languages.zip'
 XML_ZIP_FILE_NAME = 'android_languages.zip'
 
+# Name of the binary language pack file, which is written to the output
+# directory, and not to a .zip file, so that it can be memory-mapped, and its
+# magic no., and the version of its format
+PACK_FILE_NAME = 'app_languages.pack'
+PACK_MAGIC = b'ALPK'
+PACK_VERSION = 1
+
+# Name of the manifest file of input digests for incremental runs, and its
+# version. Change the version whenever the output for the same input changes
+MANIFEST_FILE_NAME = 'app_lang_manifest.json'
+MANIFEST_VERSION = 2
+
+# Suffix for the previous output zip file while it is updated incrementally
+PREV_ZIP_SFX = '.prev'
+
+# Interval in seconds at which the workbook is polled for changes in watch
+# mode
+WATCH_INTERVAL = 0.25
+
+# Fraction of the memory budget, in memory-bounded mode, for translations
+# read from the workbook, beyond which they are spilled to a temporary file.
+# The rest is for the working set of one language
+MEMORY_SPILL_FRACTION = 0.5
+
+# Default name of the profiling report written with --profile, and the
+# version of its format
+PROFILE_FILE_NAME = 'app_lang_profile.json'
+PROFILE_VERSION = 1
+
+# Default name of the validation report written with --validate, and the
+# version of its format
+VALIDATION_FILE_NAME = 'app_lang_validation.json'
+VALIDATION_VERSION = 1
+
+# Types of issues in the validation report: format specifiers of a
+# translation differ from those of English, markup tags are not balanced,
+# text of a CDATA entry contains the end of CDATA, and a key is repeated
+ISSUE_PLACEHOLDERS = 'placeholders'
+ISSUE_MARKUP = 'markup'
+ISSUE_CDATA_END = 'cdata_end'
+ISSUE_DUPLICATE_KEY = 'duplicate_key'
+
+# Regular expression for markup tags, e.g., <b>, </b>, or <br/>, and tags
+# that need no closing tag
+MARKUP_TAG_STR = r'<(/?)([A-Za-z][A-Za-z0-9]*)\b[^<>]*?(/?)>'
+MARKUP_VOID_TAGS = ('br', 'hr', 'img',)
+
+# Name of the output zip file of delta language packs, or of their
+# directory in the filesystem, the name of their manifest, and the version
+# of its format. Patches are named <platform>/<lang>.json inside, e.g.,
+# "ios/hi.json", or "android/values-hi.json"
+DELTA_ZIP_FILE_NAME = 'delta_languages.zip'
+DELTA_DIR_NAME = 'delta'
+DELTA_MANIFEST_FILE_NAME = 'delta_manifest.json'
+DELTA_VERSION = 1
+DELTA_PLATFORM_IOS = 'ios'
+DELTA_PLATFORM_ANDROID = 'android'
+
+# Default address, and port of the local HTTP server of language files.
+# Only local clients can connect to the default address. Files are served
+# under the URL prefix for their platform, e.g., "/ios/hi.json", or
+# "/android/values-hi/strings.xml", with these content types
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+SERVE_PREFIX_IOS = '/ios/'
+SERVE_PREFIX_ANDROID = '/android/'
+SERVE_TYPE_JSON = 'application/json; charset=utf-8'
+SERVE_TYPE_XML = 'application/xml; charset=utf-8'
+
 # Name of locale file for JSON, containing locale names, and codes
 JSON_LOCALE_FILE_NAME = 'locale.json'
 
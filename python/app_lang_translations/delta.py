@@ -0,0 +1,252 @@
+# Delta language packs of the changes since a previous export, for
+# delta_packs.py, and app_lang_translate.py
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import zipfile
+
+from  constants import (
+    DELTA_DIR_NAME, DELTA_MANIFEST_FILE_NAME, DELTA_PLATFORM_ANDROID,
+    DELTA_PLATFORM_IOS, DELTA_VERSION, DELTA_ZIP_FILE_NAME, JSON_INDENT,
+    JSON_ZIP_FILE_NAME, XML_LANG_ENGLISH_CODE, XML_LANG_FILE_NAME,
+    XML_ZIP_FILE_NAME
+)
+from utils import XML2JSON, _BaseLangTranslate
+
+class DeltaPacks(_BaseLangTranslate):
+    """
+    Writes delta language packs for over-the-air updates: for each language
+    file of an export that changed since a previous export, a JSON patch
+    with the keys "added", "changed", and "removed", and a manifest of the
+    patches. Android strings are the text of <string> elements, as for
+    XML2JSON. Patches are written compactly
+    """
+    compact = True
+
+    def __init__(
+            self, prev, current, filesystem=False, out_dir='', profiler=None
+    ):
+        """
+        prev: previous export, and
+        current: current export. Each is either a .zip file of iOS JSON, or
+             Android XML files, or a directory of these, or of such .zip
+             files, as written by AppLangTranslate
+        filesystem: if True, patches, and the manifest are written to a
+             "delta" directory, else to a .zip file
+        out_dir: directory in which the .zip file, or the directory is
+             written. '' is the current directory
+        profiler: either None, or a Profiler in which the stages are
+             recorded, for each language file
+        """
+        for path in prev, current:
+            if not os.path.isdir( path ) and not zipfile.is_zipfile( path ):
+                raise ValueError(
+                    '"{}" is neither a directory, nor a .zip file'.format(
+                        path
+                    )
+                )
+
+        self.prev = prev
+        self.current = current
+        self.filesystem = filesystem
+        self.out_dir = out_dir
+        self.profiler = profiler
+
+        # Parses Android XML
+        self._xml2json = XML2JSON( [], profiler=profiler )
+
+    def _classify(self, name):
+        """
+        Returns a tuple of (platform, language) for a file in an export, or
+        None if it is not a language file. name is relative to the export,
+        with "/" as separator
+        """
+        parts = name.split( '/' )
+        if len( parts ) == 1 and name.lower().endswith( '.json' ):
+            return DELTA_PLATFORM_IOS, posixpath.splitext( name )[0]
+
+        if len( parts ) == 2 and parts[1] == XML_LANG_FILE_NAME and \
+           parts[0].startswith( XML_LANG_ENGLISH_CODE ):
+            return DELTA_PLATFORM_ANDROID, parts[0]
+
+        return None
+
+    def _list_export(self, path, stack):
+        """
+        Returns a dict of patch path to a tuple of (platform, language,
+        name, function that returns the contents of the file as bytes) for
+        the language files of an export
+
+        stack: contextlib.ExitStack to which open .zip files are added
+        """
+        zips = []
+        files = {}
+        if zipfile.is_zipfile( path ):
+            zips.append( path )
+        else:
+            for name in (JSON_ZIP_FILE_NAME, XML_ZIP_FILE_NAME):
+                if zipfile.is_zipfile( os.path.join( path, name ) ):
+                    zips.append( os.path.join( path, name ) )
+
+            for root, dirs, fnames in os.walk( path ):
+                dirs.sort()
+
+                rel = os.path.relpath( root, path )
+                for fname in sorted( fnames ):
+                    name = fname if rel == os.curdir else \
+                        posixpath.join( rel.replace( os.sep, '/' ), fname )
+                    files[name] = os.path.join( root, fname )
+
+                # Language files are at most one level down
+                if rel != os.curdir:
+                    dirs.clear()
+
+        def read_file(fpath):
+            def read():
+                with open( fpath, 'rb' ) as finp:
+                    return finp.read()
+
+            return read
+
+        def read_member(zinp, name):
+            return lambda: zinp.read( name )
+
+        sources = [(name, read_file( fpath )) for name, fpath in files.items()]
+        for zpath in zips:
+            zinp = stack.enter_context( zipfile.ZipFile( zpath, 'r' ) )
+            sources.extend(
+                (name, read_member( zinp, name ))
+                for name in zinp.namelist() if not name.endswith( '/' )
+            )
+
+        export = {}
+        for name, read in sources:
+            kind = self._classify( name )
+            if kind is not None:
+                platform, lang = kind
+                export[posixpath.join( platform, lang + '.json' )] = \
+                    (platform, lang, name, read)
+
+        return export
+
+    def _read_strings(self, platform, name, buf):
+        """
+        Returns a dict of key to text in one language file, or None if it
+        is not a language file, e.g., a manifest
+        """
+        if platform == DELTA_PLATFORM_ANDROID:
+            return dict(
+                self._xml2json._iter_strings( io.BytesIO( buf ), name )
+            )
+
+        data = json.loads( buf )
+        if not isinstance( data, dict ) or 'Locale_Code' not in data:
+            return None
+
+        return data
+
+    def _diff(self, prev, current):
+        """
+        Returns the patch from one dict of key to text to another
+        """
+        return {
+            'added': {
+                key: txt for key, txt in current.items() if key not in prev
+            },
+            'changed': {
+                key: txt for key, txt in current.items()
+                if key in prev and prev[key] != txt
+            },
+            'removed': [key for key in prev if key not in current],
+        }
+
+    def write(self):
+        """
+        Writes the patches, and the manifest. Returns the manifest as a
+        dict
+        """
+        manifest = {
+            'version': DELTA_VERSION,
+            'patches': {},
+            'unchanged': [],
+            'removed': [],
+        }
+
+        if self.out_dir:
+            os.makedirs( self.out_dir, exist_ok=True )
+
+        root = ''
+        zoutp = None
+        if self.filesystem:
+            root = DELTA_DIR_NAME
+        else:
+            zoutp = zipfile.ZipFile(
+                self._out_path( DELTA_ZIP_FILE_NAME ), mode='w'
+            )
+
+        try:
+            with contextlib.ExitStack() as stack:
+                prev = self._list_export( self.prev, stack )
+                current = self._list_export( self.current, stack )
+
+                for path, (platform, lang, name, read) in current.items():
+                    with self._stage( 'delta', path ):
+                        buf = read()
+                        strings = self._read_strings( platform, name, buf )
+                        if strings is None:
+                            continue
+
+                        prev_digest, prev_strings = None, {}
+                        if path in prev:
+                            prev_buf = prev[path][3]()
+                            prev_digest = hashlib.sha256( prev_buf ).hexdigest()
+                            prev_strings = self._read_strings(
+                                platform, prev[path][2], prev_buf
+                            ) or {}
+
+                        patch = self._diff( prev_strings, strings )
+                        if not any( patch.values() ):
+                            manifest['unchanged'].append( path )
+                            continue
+
+                        patch_buf = self._json_dumps( patch )
+                        self._write_out_file(
+                            posixpath.join( root, path ), patch_buf, zoutp
+                        )
+
+                    manifest['patches'][path] = {
+                        'platform': platform,
+                        'lang': lang,
+                        'from': prev_digest,
+                        'to': hashlib.sha256( buf ).hexdigest(),
+                        'added': len( patch['added'] ),
+                        'changed': len( patch['changed'] ),
+                        'removed': len( patch['removed'] ),
+                        'size': len( patch_buf ),
+                        'full_size': len( buf ),
+                    }
+                    logging.info(
+                        'Wrote patch "{}" of {} bytes, for {} bytes in '
+                        'full'.format( path, len( patch_buf ), len( buf ) )
+                    )
+
+                manifest['removed'] = [
+                    path for path, (platform, _, name, read) in prev.items()
+                    if path not in current and
+                    self._read_strings( platform, name, read() ) is not None
+                ]
+
+            self._write_out_file(
+                posixpath.join( root, DELTA_MANIFEST_FILE_NAME ),
+                json.dumps( manifest, indent=JSON_INDENT ).encode( 'utf-8' ),
+                zoutp
+            )
+        finally:
+            if zoutp is not None:
+                zoutp.close()
+
+        return manifest
@@ -0,0 +1,100 @@
+# Script to write delta language packs for over-the-air string updates: for
+# each language file that changed between two exports of
+# app_lang_translate.py, a small JSON patch of the keys added, changed, and
+# removed, and a manifest of the patches
+#
+# Usage:
+#     python delta_packs.py <prev> <current>
+# where:
+#     prev: previous export: an output .zip file of app_lang_translate.py,
+#          e.g., ios_languages.zip, or a directory of output files, or of
+#          output .zip files
+#     current: current export, as for prev
+#
+# By default, the patches, and the manifest are written to a .zip file,
+# delta_languages.zip, e.g., containing:
+#     delta_manifest.json
+#     ios/hi.json
+#     android/values-hi.json
+#
+# Try:
+#     python delta_packs.py --help
+# for a detailed help message
+import argparse
+import sys
+
+from constants import DELTA_DIR_NAME, DELTA_ZIP_FILE_NAME, LOG_LEVELS
+from delta import DeltaPacks
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE_RUNTIME_ERROR = 2
+
+def _parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Compares two exports of language translation files, '
+        'and writes a JSON patch of the keys added, changed, and removed '
+        'for each language file that changed, and a manifest of the '
+        'patches. By default, these are written to "{}".'.format(
+            DELTA_ZIP_FILE_NAME
+        )
+    )
+
+    parser.add_argument(
+        'prev',
+        help='Previous export: a .zip file, or a directory of output files, '
+        'or of output .zip files'
+    )
+
+    parser.add_argument( 'current', help='Current export, as for prev' )
+
+    parser.add_argument(
+        '-f', '--filesystem', default=False, action='store_true',
+        help='If specified, patches are written to a "{}" directory, else to '
+        'a .zip file'.format( DELTA_DIR_NAME )
+    )
+
+    parser.add_argument(
+        '--out_dir', default='',
+        help='Directory for the output. Default is the current directory'
+    )
+
+    parser.add_argument(
+        '--level', choices=LOG_LEVELS,
+        help='Logging level in library. Default is "ERROR"'
+    )
+
+    return parser.parse_args()
+
+def main():
+    args = _parse_command_line()
+
+    try:
+        delta = DeltaPacks(
+            args.prev, args.current, filesystem=args.filesystem,
+            out_dir=args.out_dir
+        )
+
+        if args.level:
+            delta.set_log_level( args.level )
+
+        manifest = delta.write()
+    except Exception as e:
+        print(
+            'Processing failed. {}:{}'.format( e.__class__.__name__, e ),
+            file=sys.stderr
+        )
+        exit( EXIT_FAILURE_RUNTIME_ERROR )
+
+    for path, patch in manifest['patches'].items():
+        print(
+            '{}: {} added, {} changed, {} removed, {} bytes instead of '
+            '{}'.format(
+                path, patch['added'], patch['changed'], patch['removed'],
+                patch['size'], patch['full_size']
+            )
+        )
+
+    exit( EXIT_SUCCESS )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# Binary language packs: the format, and a memory-mapped reader
+import array
+import itertools
+import logging
+import mmap
+import struct
+import sys
+
+from  constants import PACK_MAGIC, PACK_VERSION
+
+# Header of binary language packs: magic no., version, no. of keys, and no.
+# of languages
+PACK_HEADER = struct.Struct( '<4sIII' )
+
+def pack_uint32s(vals):
+    """
+    Returns a list of integers as unsigned 32-bit little-endian bytes
+    """
+    vals = array.array( 'I', vals )
+    if sys.byteorder != 'little':
+        vals.byteswap()
+
+    return vals.tobytes()
+
+def pack_table(strings):
+    """
+    Returns a table of a binary language pack, as bytes: the offset of each
+    string in the blob, and one more for its end, followed by the blob of
+    the strings in UTF-8, padded to 4 bytes
+
+    strings: list of strings
+    """
+    blob = [txt.encode( 'utf-8' ) for txt in strings]
+    offsets = [0]
+    offsets.extend( itertools.accumulate( map( len, blob ) ) )
+    if offsets[-1] > 0xffffffff:
+        raise ValueError( 'Strings too large for a language pack' )
+
+    blob = b''.join( blob )
+    return pack_uint32s( offsets ) + blob + bytes( -len( blob ) % 4 )
+
+class LangPack:
+    """
+    Reader of a binary language pack, as written by AppLangTranslate with
+    the "pack" output format, e.g., for servers that render text in every
+    language. The file is memory-mapped, and only the header, and the
+    language codes are read when it is opened. Keys are looked up by binary
+    search, and strings are returned as views of the mapped file, with no
+    copy
+
+    Layout of the file. All integers are unsigned 32-bit little-endian:
+        header: magic no. "ALPK", version, no. of keys, no. of languages
+        offsets in the file of the tables of keys, of language codes, and of
+             the strings of each language, in the order of the codes
+        tables: offsets of each entry in the blob that follows, and one more
+             for the end of the last, and the blob of the entries in UTF-8,
+             padded to 4 bytes
+    Keys are sorted by their UTF-8 bytes, and the strings of each language
+    are in the order of the keys
+    """
+    def __init__(self, path):
+        """
+        path: path to the language pack, e.g., "app_languages.pack"
+        """
+        self.path = path
+
+        with open( path, 'rb' ) as finp:
+            self._mm = mmap.mmap( finp.fileno(), 0, access=mmap.ACCESS_READ )
+
+        # Views of the mapped file, released on close()
+        self._views = []
+        try:
+            magic, version, self.nkeys, nlangs = PACK_HEADER.unpack_from(
+                self._mm
+            )
+            if magic != PACK_MAGIC or version != PACK_VERSION:
+                raise ValueError(
+                    '"{}" is not a language pack of version {}'.format(
+                        path, PACK_VERSION
+                    )
+                )
+
+            self._data = self._view( memoryview( self._mm ) )
+            tables = self._uint32s( PACK_HEADER.size, 2 + nlangs )
+
+            self._keys = self._table( tables[0], self.nkeys )
+            codes = self._table( tables[1], nlangs )
+            self.langs = [
+                str( self._entry( codes, i ), 'utf-8' )
+                for i in range( nlangs )
+            ]
+            self._strings = {
+                lang: self._table( offset, self.nkeys )
+                for lang, offset in zip( self.langs, tables[2:] )
+            }
+        except Exception:
+            self.close()
+            raise
+
+    def _view(self, view):
+        self._views.append( view )
+        return view
+
+    def _uint32s(self, offset, n):
+        """
+        Returns n unsigned 32-bit integers at an offset in the file. They
+        are a view of the file on little-endian hosts
+        """
+        vals = self._data[offset:offset + 4 * n]
+        if sys.byteorder == 'little':
+            return self._view( self._view( vals ).cast( 'I' ) )
+
+        vals = array.array( 'I', vals )
+        vals.byteswap()
+        return vals
+
+    def _table(self, offset, n):
+        """
+        Returns a tuple of (offsets of the entries, offset of the blob) for
+        the table of n entries at an offset in the file
+        """
+        return self._uint32s( offset, n + 1 ), offset + 4 * ( n + 1 )
+
+    def _entry(self, table, i):
+        """
+        Returns entry i of a table as a view of the file
+        """
+        offsets, start = table
+        return self._data[start + offsets[i]:start + offsets[i + 1]]
+
+    def _check_open(self):
+        if self._mm is None:
+            raise ValueError(
+                'Language pack "{}" is closed'.format( self.path )
+            )
+
+    def _find(self, key):
+        """
+        Returns the index of a key, or None if it is not in the pack
+        """
+        if isinstance( key, str ):
+            key = key.encode( 'utf-8' )
+
+        offsets, start = self._keys
+        mm = self._mm
+        lo, hi = 0, self.nkeys
+        while lo < hi:
+            mid = ( lo + hi ) // 2
+            # Only the key compared with is copied: views are not ordered
+            val = mm[start + offsets[mid]:start + offsets[mid + 1]]
+            if val < key:
+                lo = mid + 1
+            elif val > key:
+                hi = mid
+            else:
+                return mid
+
+        return None
+
+    def lookup(self, lang, key):
+        """
+        Returns the string for a key in one language as a memoryview of its
+        UTF-8 bytes in the mapped file, with no copy, or None if the key is
+        not in the pack. Views should not outlive the pack: release them,
+        e.g., with a "with" block, before close(). Otherwise, the file stays
+        mapped until they are released
+
+        lang: language code, e.g., "hi"
+        key: key, as a string, or as UTF-8 bytes
+        """
+        self._check_open()
+
+        try:
+            table = self._strings[lang]
+        except KeyError:
+            raise ValueError(
+                'Unknown language "{}". Should be one of "{}"'.format(
+                    lang, self.langs
+                )
+            )
+
+        i = self._find( key )
+        if i is None:
+            return None
+
+        return self._entry( table, i )
+
+    def get(self, lang, key, default=None):
+        """
+        Returns the string for a key in one language, or default if the key
+        is not in the pack. Arguments are as for lookup()
+        """
+        val = self.lookup( lang, key )
+        if val is None:
+            return default
+
+        with val:
+            return str( val, 'utf-8' )
+
+    def keys(self):
+        """
+        Generator of the keys in the pack, in sorted order
+        """
+        self._check_open()
+        for i in range( self.nkeys ):
+            with self._entry( self._keys, i ) as val:
+                yield str( val, 'utf-8' )
+
+    def __contains__(self, key):
+        self._check_open()
+
+        return self._find( key ) is not None
+
+    def __len__(self):
+        return self.nkeys
+
+    def close(self):
+        """
+        Unmaps the file. If views from lookup() are still held, it is
+        unmapped once they are released instead, so that close() never
+        raises, e.g., from the end of a "with" block
+        """
+        if self._mm is None:
+            return
+
+        for view in reversed( self._views ):
+            view.release()
+
+        self._views = []
+        self._data = None
+
+        try:
+            self._mm.close()
+        except BufferError:
+            logging.warning(
+                'Views of language pack "{}" are still held. It is unmapped '
+                'once they are released'.format( self.path )
+            )
+
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,258 @@
+# Merging of translated language files back into the workbook, for
+# merge_translations.py
+import json
+import logging
+import openpyxl
+import os
+import posixpath
+import zipfile
+
+from  constants import (
+    ENGLISH_COL, JSON_LANG_ROW, START_ROW, XML_CDATA_COL, XML_KEY_COL,
+    XML_LANG_ENGLISH_CODE, XML_LANG_ROW
+)
+from utils import (
+    RE_FMT_SPEC, XML2JSON, _BaseLangTranslate, _fmt_specs, _is_cdata
+)
+
+class MergeTranslations(_BaseLangTranslate):
+    """
+    Merges translated iOS JSON, and Android XML language files, e.g., as
+    returned by translators, back into the workbook they were exported from.
+    The workbook is indexed by key once, and saved once, with the updates to
+    all languages
+    """
+    def __init__(
+            self, path, files, out_path=None, start_row=START_ROW,
+            json_lang_row=JSON_LANG_ROW, xml_lang_row=XML_LANG_ROW,
+            english_col=ENGLISH_COL, xml_cdata_col=XML_CDATA_COL,
+            xml_key_col=XML_KEY_COL, stop_on_err=False, profiler=None
+    ):
+        """
+        path: .xlsx file path. Workbook in HelpinOut format
+        files: list of input files. Each is either an iOS JSON file named
+             <lang>.json, an Android XML file named as for XML2JSON, e.g.,
+             values-mr/strings.xml, or mr.xml, or a .zip file of these. The
+             language column is that with the directory name, e.g.,
+             "values-mr", in the XML language row, or else with the file
+             name, e.g., "mr", in the JSON language row
+        out_path: path of the merged workbook. None means the workbook is
+             updated in place
+        stop_on_err: if True, merging stops at the first file with an
+             error, and nothing is saved, else the file is skipped
+        profiler: either None, or a Profiler in which the stages of the
+             merge are recorded, for each language
+        Other arguments are as for AppLangTranslate
+        """
+        if not self._is_readable_file( path ):
+            msg = '"{} is not a readable file'.format( path )
+            logging.error( msg )
+            raise ValueError( msg )
+
+        self.path = path
+        self.files = files
+        self.out_path = out_path or path
+
+        self.start_row = start_row
+
+        self.json_lang_row = json_lang_row
+        self.xml_lang_row = xml_lang_row
+
+        self.english_col = english_col
+
+        self.xml_key_col = xml_key_col
+        self.xml_cdata_col = xml_cdata_col
+
+        self.stop_on_err = stop_on_err
+
+        self.profiler = profiler
+
+        # Parses Android XML
+        self._xml2json = XML2JSON( files, profiler=profiler )
+
+    def _index(self, ws):
+        """
+        Reads the worksheet in one pass. Returns a tuple of (dict of key to
+        (row no., tuple of cell values), dict of language in the JSON, or
+        XML language row to column index)
+        """
+        rows = {}
+        langs = {}
+        for irow, row in enumerate( ws.iter_rows( values_only=True ), 1 ):
+            if irow in (self.json_lang_row, self.xml_lang_row):
+                for col, lang in enumerate( row, 1 ):
+                    if lang and isinstance( lang, str ):
+                        langs.setdefault( lang.strip(), col )
+
+            if irow < self.start_row:
+                continue
+
+            key = row[self.xml_key_col - 1]
+            if not key or not isinstance( key, str ):
+                continue
+
+            key = key.strip()
+            if key in rows:
+                logging.warning(
+                    'Key "{}" in row {} is also in row {}. Only the first '
+                    'is updated'.format( key, irow, rows[key][0] )
+                )
+                continue
+
+            rows[key] = (irow, row)
+
+        return rows, langs
+
+    def _iter_files(self):
+        """
+        Generator over the input files, and the members of input .zip files.
+        Yields tuples of (path, file-like object opened for reading bytes)
+        """
+        for f in self.files:
+            if not zipfile.is_zipfile( f ):
+                with open( f, 'rb' ) as finp:
+                    yield f, finp
+                continue
+
+            with zipfile.ZipFile( f, 'r' ) as zinp:
+                for fname in zinp.namelist():
+                    if fname.endswith( '/' ):
+                        continue
+
+                    with zinp.open( fname ) as finp:
+                        yield fname, finp
+
+    def _read_strings(self, path, finp):
+        """
+        Reads one language file. Returns a tuple of (language, True if it is
+        iOS JSON, else False, iterable of (key, text))
+        """
+        path = path.replace( os.sep, '/' )
+        name, ext = posixpath.splitext( posixpath.basename( path ) )
+        dir = posixpath.basename( posixpath.dirname( path ) )
+
+        if ext.lower() == '.json':
+            data = json.load( finp )
+            data.pop( 'Locale_Code', None )
+            return name, True, data.items()
+
+        lang = dir if dir.startswith( XML_LANG_ENGLISH_CODE ) else name
+        return lang, False, self._xml2json._iter_strings( finp, path )
+
+    def _merged_value(self, ios, row, col, txt):
+        """
+        Returns the new value of a cell for text from a language file, or
+        None if the cell is unchanged. The text is compared with the output
+        for the current value, so that unchanged strings, and strings that
+        fell back to English are not written
+
+        ios: True if the text is from iOS JSON, else from Android XML
+        row: tuple of cell values in the row of the key
+        col: column index of the language
+        """
+        current = row[col - 1] if col <= len( row ) else None
+        english = row[self.english_col - 1]
+
+        if ios:
+            if current:
+                out = RE_FMT_SPEC.sub( '', current )
+            else:
+                out = None if english is None else \
+                    RE_FMT_SPEC.sub( '', english )
+        elif _is_cdata( row[self.xml_cdata_col - 1] ):
+            out = current.replace( '\n', '<br/>' ) if current else None
+            txt = txt.replace( '<br/>', '\n' )
+        else:
+            out = current or english or ''
+
+        if txt == out or txt == current:
+            return None
+
+        return txt
+
+    def merge(self):
+        """
+        Merges the input files into the workbook, and saves it, unless it
+        is updated in place, and nothing changed. Returns a
+        dict of language to a dict of the no. of cells "updated", strings
+        "unchanged", "unknown" keys, which are not in the workbook, and
+        "conflict" strings, which are not merged: iOS JSON that differs for
+        keys whose English has format specifiers, as these are stripped from
+        iOS JSON, and would be lost for Android
+        """
+        with self._stage( 'load_workbook' ):
+            wb = openpyxl.load_workbook( self.path )
+
+        ws = wb.active
+
+        with self._stage( 'index' ):
+            rows, langs = self._index( ws )
+
+        stats = {}
+        for path, finp in self._iter_files():
+            try:
+                lang, ios, strings = self._read_strings( path, finp )
+
+                col = langs.get( lang )
+                if col is None:
+                    raise ValueError(
+                        'Language "{}" of "{}" is not in the language rows '
+                        'of the workbook'.format( lang, path )
+                    )
+
+                stat = stats.setdefault(
+                    lang, {
+                        'updated': 0, 'unchanged': 0, 'unknown': 0,
+                        'conflict': 0,
+                    }
+                )
+                with self._stage( 'merge', lang ):
+                    for key, txt in strings:
+                        key = key.strip()
+                        if key not in rows:
+                            stat['unknown'] += 1
+                            continue
+
+                        irow, row = rows[key]
+                        value = self._merged_value( ios, row, col, txt )
+                        if value is None:
+                            stat['unchanged'] += 1
+                            continue
+
+                        if ios and _fmt_specs( row[self.english_col - 1] ):
+                            stat['conflict'] += 1
+                            logging.warning(
+                                'Not merging key "{}" for language "{}" from '
+                                'iOS JSON, which has no format specifiers. '
+                                'Merge it from Android XML instead'.format(
+                                    key, lang
+                                )
+                            )
+                            continue
+
+                        ws.cell( row=irow, column=col ).value = value
+                        stat['updated'] += 1
+
+                logging.info(
+                    'Merged "{}" for language "{}": {}'.format(
+                        path, lang, stat
+                    )
+                )
+            except Exception as e:
+                logging.error(
+                    'Exception in processing "{}". {}:{}'.format(
+                        path, e.__class__.__name__, e
+                    )
+                )
+                if self.stop_on_err:
+                    raise
+
+        if self.out_path == self.path and \
+           not any( stat['updated'] for stat in stats.values() ):
+            logging.info( 'No changes to "{}"'.format( self.path ) )
+            return stats
+
+        with self._stage( 'save' ):
+            wb.save( self.out_path )
+
+        return stats
@@ -0,0 +1,167 @@
+# Script to merge translated iOS JSON, and Android XML language files, e.g.,
+# as returned by translators, back into the XLSX language translations file
+# for HelpinOut that they were exported from
+#
+# Usage:
+#     python merge_translations.py <langfile.xlsx> <file> [<file>]...
+# where:
+#     lang_file.xlsx: language translations file in HelpinOut format
+#     file: either an iOS JSON file, e.g., mr.json, an Android XML file, e.g.,
+#          values-mr/strings.xml, or mr.xml, or a .zip file of these, e.g.,
+#          ios_languages.zip, or android_languages.zip
+#
+# Only strings that differ from those exported from the workbook are written,
+# and the workbook is saved once
+#
+# Try:
+#     python merge_translations.py --help
+# for a detailed help message
+import argparse
+import logging
+import sys
+
+from  constants import (
+    ENGLISH_COL, JSON_LANG_ROW, LOG_LEVELS, PROFILE_FILE_NAME, START_ROW,
+    XML_CDATA_COL, XML_KEY_COL, XML_LANG_ROW
+)
+from merge import MergeTranslations
+from utils import Profiler
+
+LANG_ROWS = '{},{}'.format( JSON_LANG_ROW, XML_LANG_ROW )
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE_MISSING_ARG = 1
+EXIT_FAILURE_RUNTIME_ERROR = 2
+
+def _parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Merges translated iOS JSON, and Android XML language '
+        'files back into the XLSX language translations file. Keys are '
+        'looked up in an index of the workbook, and all languages are '
+        'updated with one save.'
+    )
+
+    parser.add_argument(
+        'path', help='XLSX language translations file in HelpinOut format'
+    )
+
+    parser.add_argument(
+        'files', nargs='+',
+        help='iOS JSON files, e.g., mr.json, Android XML files, e.g., '
+        'values-mr/strings.xml, or .zip files of these'
+    )
+
+    parser.add_argument(
+        '-o', '--out',
+        help='Write the merged workbook to this file. Default is to update '
+        'the workbook in place'
+    )
+
+    parser.add_argument(
+        '--start_row', default=START_ROW, type=int,
+        help='First row with keys. Default is "{}"'.format( START_ROW )
+    )
+
+    parser.add_argument(
+        '--lang_rows', default=LANG_ROWS,
+        help='Rows for language codes for JSON (iOS), and XML (Android). '
+        'Default is "{}"'.format( LANG_ROWS )
+    )
+
+    parser.add_argument(
+        '-e', '--english_col', type=int, default=ENGLISH_COL,
+        help='Column number for English. Default is "{}"'.format(
+            ENGLISH_COL
+        )
+    )
+
+    parser.add_argument(
+        '--cdata_col', default=XML_CDATA_COL, type=int,
+        help='Column for XML (Android) CDATA column. Default is "{}"'.format(
+            XML_CDATA_COL
+        )
+    )
+
+    parser.add_argument(
+        '--key_col', default=XML_KEY_COL, type=int,
+        help='Column for XML (Android) keys Default is "{}"'.format(
+            XML_KEY_COL
+        )
+    )
+
+    parser.add_argument(
+        '--level', choices=LOG_LEVELS,
+        help='Logging level in library. Default is "ERROR"'
+    )
+
+    parser.add_argument(
+        '--stop_on_err', default=False, action='store_true',
+        help='Stop, and save nothing if there is an error in any file. '
+        'Default is to skip the file'
+    )
+
+    parser.add_argument(
+        '--profile', nargs='?', const=PROFILE_FILE_NAME,
+        help='Write a JSON report of the wall time, CPU time, and peak '
+        'memory of each stage, in total, and for each language, to this '
+        'file. Default file is "{}"'.format( PROFILE_FILE_NAME )
+    )
+
+    return parser.parse_args()
+
+def main():
+    args = _parse_command_line()
+
+    try:
+        json_lang_row, xml_lang_row = map( int, args.lang_rows.split( ',' ) )
+    except ValueError:
+        print(
+            'The argument to --lang_rows should be a comma-separated list: '
+            '<json_lang_row>,<xml_lang_row>. It is "{}"'.format(
+                args.lang_rows
+            ), file=sys.stderr
+        )
+        exit( EXIT_FAILURE_MISSING_ARG )
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.start()
+
+    try:
+        merge = MergeTranslations(
+            args.path, args.files, out_path=args.out,
+            start_row=args.start_row, json_lang_row=json_lang_row,
+            xml_lang_row=xml_lang_row, english_col=args.english_col,
+            xml_cdata_col=args.cdata_col, xml_key_col=args.key_col,
+            stop_on_err=args.stop_on_err, profiler=profiler
+        )
+
+        if args.level:
+            merge.set_log_level( args.level )
+
+        stats = merge.merge()
+    except Exception as e:
+        print(
+            'Processing failed. {}:{}'.format( e.__class__.__name__, e ),
+            file=sys.stderr
+        )
+        exit( EXIT_FAILURE_RUNTIME_ERROR )
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write_report( args.profile )
+
+    for lang, stat in stats.items():
+        print(
+            '{}: {} updated, {} unchanged, {} unknown keys, {} conflicts '
+            'not merged'.format(
+                lang, stat['updated'], stat['unchanged'], stat['unknown'],
+                stat['conflict']
+            )
+        )
+
+    exit( EXIT_SUCCESS )
+
+if __name__ == "__main__":
+    main()
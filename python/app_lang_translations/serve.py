@@ -0,0 +1,193 @@
+# Script to serve the iOS JSON, and Android XML language files of an XLSX
+# language translations file for HelpinOut over HTTP, e.g., to test devices,
+# and web clients, with no .zip files exported, and copied around
+#
+# Usage:
+#     python serve.py <langfile.xlsx>
+# where:
+#     lang_file.xlsx: language translations file in HelpinOut format, or a
+#          CSV, TSV, or JSON table with the same layout
+#
+# Files are served from memory, e.g., at:
+#     http://127.0.0.1:8000/ios/hi.json
+#     http://127.0.0.1:8000/android/values-hi/strings.xml
+# with an index of all files at http://127.0.0.1:8000/. The workbook is
+# loaded again whenever it changes. Stop with Ctrl-C
+#
+# Try:
+#     python serve.py --help
+# for a detailed help message
+import argparse
+import logging
+import sys
+
+from  constants import (
+    DEF_LOG_LEVEL, DEF_XLSX_ENGINE, ENGLISH_COL, IN_FMTS, JSON_LANG_ROW,
+    LOG_LEVELS, SERVE_HOST, SERVE_PORT, START_ROW, WATCH_INTERVAL,
+    XLSX_ENGINES, XML_CDATA_COL, XML_KEY_COL, XML_LANG_ROW, XML_TRANS_COL
+)
+from translation_server import TranslationServer
+from utils import AppLangTranslate
+
+LANG_ROWS = '{},{}'.format( JSON_LANG_ROW, XML_LANG_ROW )
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE_MISSING_ARG = 1
+EXIT_FAILURE_RUNTIME_ERROR = 2
+
+def _parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Serves the iOS JSON, and Android XML language files of '
+        'an XLSX language translations file over HTTP. Files are rendered, '
+        'and compressed in advance, have ETags, and are rendered again '
+        'when the workbook changes.'
+    )
+
+    parser.add_argument(
+        'path',
+        help='XLSX language translations file in HelpinOut format, or a '
+        'CSV, TSV, or JSON table with the same layout'
+    )
+
+    parser.add_argument(
+        '--host', default=SERVE_HOST,
+        help='Address to listen on. Default is "{}", which only accepts '
+        'clients on this machine'.format( SERVE_HOST )
+    )
+
+    parser.add_argument(
+        '-p', '--port', default=SERVE_PORT, type=int,
+        help='Port to listen on. Default is "{}"'.format( SERVE_PORT )
+    )
+
+    parser.add_argument(
+        '--interval', default=WATCH_INTERVAL, type=float,
+        help='Interval in seconds at which the workbook is polled for '
+        'changes. Default is "{}"'.format( WATCH_INTERVAL )
+    )
+
+    parser.add_argument(
+        '--start_row', default=START_ROW, type=int,
+        help='First row with keys. Default is "{}"'.format( START_ROW )
+    )
+
+    parser.add_argument(
+        '--lang_rows', default=LANG_ROWS,
+        help='Rows for language codes for JSON (iOS), and XML (Android). '
+        'Default is "{}"'.format( LANG_ROWS )
+    )
+
+    parser.add_argument(
+        '-e', '--english_col', type=int, default=ENGLISH_COL,
+        help='Column number for English. Default is "{}"'.format(
+            ENGLISH_COL
+        )
+    )
+
+    parser.add_argument(
+        '--cdata_col', default=XML_CDATA_COL, type=int,
+        help='Column for XML (Android) CDATA column. Default is "{}"'.format(
+            XML_CDATA_COL
+        )
+    )
+
+    parser.add_argument(
+        '--key_col', default=XML_KEY_COL, type=int,
+        help='Column for XML (Android) keys Default is "{}"'.format(
+            XML_KEY_COL
+        )
+    )
+
+    parser.add_argument(
+        '--trans_col', default=XML_TRANS_COL, type=int,
+        help='Column for XML (Android) translatable flag. Default is '
+        '"{}"'.format( XML_TRANS_COL )
+    )
+
+    parser.add_argument(
+        '--compact', default=False, action='store_true',
+        help='Serve iOS JSON files compactly, with no whitespace'
+    )
+
+    parser.add_argument(
+        '--omit_fallback', default=False, action='store_true',
+        help='Leave out entries of languages other than English that are '
+        'missing, or the same as English'
+    )
+
+    parser.add_argument(
+        '--engine', choices=XLSX_ENGINES, default=DEF_XLSX_ENGINE,
+        help='Engine to read .xlsx files with. Default is "{}"'.format(
+            DEF_XLSX_ENGINE
+        )
+    )
+
+    parser.add_argument(
+        '--input_fmt', choices=IN_FMTS,
+        help='Format of the input file. Default is the format for the file '
+        'extension, or .xlsx'
+    )
+
+    parser.add_argument(
+        '--level', choices=LOG_LEVELS,
+        help='Logging level in library. Default is "ERROR"'
+    )
+
+    return parser.parse_args()
+
+def main():
+    args = _parse_command_line()
+
+    # The library leaves the logging configuration to its caller
+    logging.basicConfig( level=DEF_LOG_LEVEL )
+
+    try:
+        json_lang_row, xml_lang_row = map( int, args.lang_rows.split( ',' ) )
+    except ValueError:
+        print(
+            'The argument to --lang_rows should be a comma-separated list: '
+            '<json_lang_row>,<xml_lang_row>. It is "{}"'.format(
+                args.lang_rows
+            ), file=sys.stderr
+        )
+        exit( EXIT_FAILURE_MISSING_ARG )
+
+    try:
+        translate = AppLangTranslate(
+            args.path, start_row=args.start_row, json_lang_row=json_lang_row,
+            xml_lang_row=xml_lang_row, english_col=args.english_col,
+            xml_cdata_col=args.cdata_col, xml_key_col=args.key_col,
+            xml_trans_col=args.trans_col, compact=args.compact,
+            omit_fallback=args.omit_fallback, engine=args.engine,
+            input_fmt=args.input_fmt
+        )
+
+        if args.level:
+            translate.set_log_level( args.level )
+
+        server = TranslationServer(
+            translate, host=args.host, port=args.port,
+            interval=args.interval
+        )
+    except Exception as e:
+        print(
+            'Processing failed. {}:{}'.format( e.__class__.__name__, e ),
+            file=sys.stderr
+        )
+        exit( EXIT_FAILURE_RUNTIME_ERROR )
+
+    host, port = server.address
+    print(
+        'Serving "{}" at http://{}:{}/'.format( args.path, host, port ),
+        file=sys.stderr
+    )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    exit( EXIT_SUCCESS )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Script to generate synthetic language translation files in the HelpinOut
+# XLSX format, of any size. Used for benchmarks
+#
+# Usage:
+#     python synth_workbook.py <langfile.xlsx>
+# where:
+#     lang_file.xlsx: output language translations file
+#
+# Try:
+#     python synth_workbook.py --help
+# for a detailed help message
+import argparse
+import random
+import sys
+
+import openpyxl
+
+from constants import (
+    ENGLISH_COL, JSON_LANG_ENGLISH_CODE, JSON_LANG_ROW, START_COL, START_ROW,
+    XML_CDATA_COL, XML_KEY_COL, XML_LANG_ENGLISH_CODE, XML_LANG_ROW,
+    XML_TRANS_COL
+)
+from utils import get_locale_registry
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE_RUNTIME_ERROR = 2
+
+# Row with English names of languages
+NAME_ROW = 1
+
+DEF_NLANGS = 10
+DEF_NKEYS = 1000
+DEF_CDATA_RATIO = 0.05
+DEF_NONTRANS_RATIO = 0.05
+DEF_MISSING_RATIO = 0.1
+DEF_BLANK_ROWS = 10
+DEF_SEED = 0
+
+# Words for synthetic strings
+WORDS = (
+    'help', 'request', 'offer', 'food', 'medicine', 'shelter', 'transport',
+    'people', 'volunteer', 'nearby', 'call', 'message', 'location', 'ask',
+    'for', 'the', 'your', 'with', 'and', 'now',
+)
+
+def _lang_codes(nlangs):
+    """
+    Returns JSON (iOS) language codes for English, and nlangs - 1 other
+    languages, from the locale data
+    """
+    codes = [
+        code for code in get_locale_registry().names
+        if '_' not in code and code != JSON_LANG_ENGLISH_CODE
+    ]
+    if nlangs - 1 > len( codes ):
+        raise ValueError(
+            'At most {} languages are available'.format( len( codes ) + 1 )
+        )
+
+    return [JSON_LANG_ENGLISH_CODE] + codes[:nlangs - 1]
+
+def _text(rnd, lang, irow, fmt_spec=False, markup=False):
+    words = rnd.choices( WORDS, k=rnd.randint( 2, 12 ) )
+    if fmt_spec:
+        words.insert( rnd.randint( 0, len( words ) ), '%1$s' )
+
+    txt = '{} {} {}'.format( lang, irow, ' '.join( words ) )
+    if markup:
+        txt = '<b>{}</b>\nmore {}'.format( txt, rnd.choice( WORDS ) )
+
+    return txt
+
+def make_workbook(
+        path, nlangs=DEF_NLANGS, nkeys=DEF_NKEYS, cdata_ratio=DEF_CDATA_RATIO,
+        nontrans_ratio=DEF_NONTRANS_RATIO, missing_ratio=DEF_MISSING_RATIO,
+        blank_rows=DEF_BLANK_ROWS, seed=DEF_SEED
+):
+    """
+    Writes a synthetic language translations file in the HelpinOut format,
+    with the default layout of rows, and columns in "constants.py"
+
+    path: output .xlsx file path
+    nlangs: no. of languages, including English
+    nkeys: no. of keys, i.e., data rows
+    cdata_ratio: fraction of keys with the CDATA flag set
+    nontrans_ratio: fraction of keys that are not translatable
+    missing_ratio: fraction of translations that are missing, and so fall
+         back to English
+    blank_rows: no. of blank rows after the data rows, as in the HelpinOut
+         file
+    seed: seed for random numbers. The same arguments give the same file
+    """
+    rnd = random.Random( seed )
+
+    codes = _lang_codes( nlangs )
+    names = get_locale_registry().names
+
+    wb = openpyxl.Workbook( write_only=True )
+    ws = wb.create_sheet()
+
+    ncols = START_COL + nlangs - 1
+    lang_cols = range( START_COL, START_COL + nlangs )
+    for irow in range( 1, START_ROW ):
+        row = [None] * ncols
+        for col, code in zip( lang_cols, codes ):
+            if irow == NAME_ROW:
+                row[col - 1] = names[code]
+            elif irow == JSON_LANG_ROW:
+                row[col - 1] = code
+            elif irow == XML_LANG_ROW:
+                row[col - 1] = XML_LANG_ENGLISH_CODE if code == JSON_LANG_ENGLISH_CODE else \
+                    '{}-{}'.format( XML_LANG_ENGLISH_CODE, code )
+
+        ws.append( row )
+
+    for irow in range( nkeys ):
+        row = [None] * ncols
+        row[XML_KEY_COL - 1] = 'key_{}'.format( irow )
+
+        cdata = rnd.random() < cdata_ratio
+        if cdata:
+            row[XML_CDATA_COL - 1] = 'yes'
+
+        if rnd.random() < nontrans_ratio:
+            row[XML_TRANS_COL - 1] = 0
+
+        fmt_spec = rnd.random() < 0.2
+        for col, code in zip( lang_cols, codes ):
+            if col == ENGLISH_COL or rnd.random() >= missing_ratio:
+                row[col - 1] = _text(
+                    rnd, code, irow, fmt_spec=fmt_spec, markup=cdata
+                )
+
+        ws.append( row )
+
+    for _ in range( blank_rows ):
+        ws.append( [''] * ncols )
+
+    wb.save( path )
+
+def _parse_command_line():
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic language translations file in the '
+        'HelpinOut XLSX format, e.g., for benchmarks'
+    )
+
+    parser.add_argument( 'path', help='Output .xlsx file' )
+
+    parser.add_argument(
+        '-l', '--langs', default=DEF_NLANGS, type=int,
+        help='No. of languages, including English. Default is "{}"'.format(
+            DEF_NLANGS
+        )
+    )
+
+    parser.add_argument(
+        '-k', '--keys', default=DEF_NKEYS, type=int,
+        help='No. of keys. Default is "{}"'.format( DEF_NKEYS )
+    )
+
+    parser.add_argument(
+        '--cdata_ratio', default=DEF_CDATA_RATIO, type=float,
+        help='Fraction of keys with CDATA. Default is "{}"'.format(
+            DEF_CDATA_RATIO
+        )
+    )
+
+    parser.add_argument(
+        '--nontrans_ratio', default=DEF_NONTRANS_RATIO, type=float,
+        help='Fraction of keys that are not translatable. Default is '
+        '"{}"'.format( DEF_NONTRANS_RATIO )
+    )
+
+    parser.add_argument(
+        '--missing_ratio', default=DEF_MISSING_RATIO, type=float,
+        help='Fraction of missing translations. Default is "{}"'.format(
+            DEF_MISSING_RATIO
+        )
+    )
+
+    parser.add_argument(
+        '--blank_rows', default=DEF_BLANK_ROWS, type=int,
+        help='No. of blank rows at the end. Default is "{}"'.format(
+            DEF_BLANK_ROWS
+        )
+    )
+
+    parser.add_argument(
+        '--seed', default=DEF_SEED, type=int,
+        help='Seed for random numbers. Default is "{}"'.format( DEF_SEED )
+    )
+
+    return parser.parse_args()
+
+def main():
+    args = _parse_command_line()
+
+    try:
+        make_workbook(
+            args.path, nlangs=args.langs, nkeys=args.keys,
+            cdata_ratio=args.cdata_ratio, nontrans_ratio=args.nontrans_ratio,
+            missing_ratio=args.missing_ratio, blank_rows=args.blank_rows,
+            seed=args.seed
+        )
+    except Exception as e:
+        print(
+            'Generation failed. {}:{}'.format( e.__class__.__name__, e ),
+            file=sys.stderr
+        )
+        exit( EXIT_FAILURE_RUNTIME_ERROR )
+
+    exit( EXIT_SUCCESS )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+# Tests of converting language translations files
+#
+# Usage:
+#     python tests/test_app_lang_translate.py
+import io
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+
+import lxml.etree
+import openpyxl
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import (
+    ALL_OUT_FMTS, ENGLISH_COL, JSON_ZIP_FILE_NAME, OUT_FMT_JSON, OUT_FMT_PACK,
+    OUT_FMT_XML, PACK_FILE_NAME, START_ROW, XLSX_ENGINES, XML_CDATA_COL,
+    XML_KEY_COL, XML_TAG_ROOT, XML_TRANS_COL, XML_ZIP_FILE_NAME
+)
+from synth_workbook import make_workbook
+from utils import AppLangTranslate, XML2JSON, export_batch, write_artifacts
+
+SCRIPT_DIR = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+def _read_zip(path):
+    """
+    Returns a dict of member names to contents of a .zip file
+    """
+    with zipfile.ZipFile( path ) as zinp:
+        return { name: zinp.read( name ) for name in zinp.namelist() }
+
+class TestFooterRows(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+        make_workbook( self.path, nlangs=3, nkeys=20, blank_rows=2 )
+
+        # A footer after the blank rows, e.g., notes, with cells that are
+        # not text
+        self.footer_path = os.path.join( self.tmp_dir.name, 'footer.xlsx' )
+        wb = openpyxl.load_workbook( self.path )
+        ws = wb.active
+        row = ws.max_row + 1
+        ws.cell( row=row, column=ENGLISH_COL, value=42 )
+        ws.cell( row=row + 1, column=XML_KEY_COL, value='total' )
+        ws.cell( row=row + 1, column=ENGLISH_COL, value=3.5 )
+        wb.save( self.footer_path )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_non_text_footer_ignored(self):
+        for engine in XLSX_ENGINES:
+            with self.subTest( engine=engine ):
+                expected = AppLangTranslate(
+                    self.path, engine=engine
+                ).render()
+                self.assertEqual(
+                    AppLangTranslate(
+                        self.footer_path, engine=engine
+                    ).render(), expected
+                )
+
+class TestJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for seed in range( 2 ):
+            path = os.path.join(
+                self.tmp_dir.name, 'app{}.xlsx'.format( seed )
+            )
+            make_workbook( path, nlangs=4, nkeys=30, seed=seed )
+            self.paths.append( path )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_render_in_workers(self):
+        for path in self.paths:
+            expected = AppLangTranslate( path ).render()
+            self.assertEqual(
+                AppLangTranslate( path, jobs=2 ).render(), expected
+            )
+
+    def test_batch_shares_workers(self):
+        # Workers convert one workbook after another, and must not render
+        # with the state of the previous one
+        out_dir = os.path.join( self.tmp_dir.name, 'out' )
+        self.assertEqual(
+            export_batch(
+                self.paths, out_dir=out_dir, jobs=2, filesystem=True
+            ), {}
+        )
+
+        for path in self.paths:
+            name = os.path.splitext( os.path.basename( path ) )[0]
+            for files in AppLangTranslate( path ).render().values():
+                for fname, buf in files.items():
+                    with open(
+                        os.path.join( out_dir, name, fname ), 'rb'
+                    ) as finp:
+                        self.assertEqual( finp.read(), buf )
+
+class TestXmlWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+        make_workbook(
+            self.path, nlangs=4, nkeys=200, cdata_ratio=0.2,
+            nontrans_ratio=0.2
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _tree_xml(self):
+        """
+        Returns a dict of paths to Android XML written from the whole tree,
+        as before streaming
+        """
+        translate = AppLangTranslate( self.path )
+        translate._load()
+
+        files = {}
+        for col in translate._data_cols():
+            root = lxml.etree.Element( XML_TAG_ROOT )
+            root.extend( translate._iter_xml_strings( col ) )
+            files[translate._xml_out_path( col )[0]] = lxml.etree.tostring(
+                root, pretty_print=True, encoding='utf-8'
+            )
+
+        return files
+
+    def test_same_as_tree(self):
+        expected = self._tree_xml()
+        self.assertIn( b'CDATA', b''.join( expected.values() ) )
+        self.assertIn(
+            b'translatable="False"', b''.join( expected.values() )
+        )
+
+        # Rendered in memory
+        self.assertEqual(
+            AppLangTranslate( self.path ).render(
+                [OUT_FMT_XML]
+            )[OUT_FMT_XML],
+            expected
+        )
+
+        # Streamed to members of the .zip file
+        zip_dir = os.path.join( self.tmp_dir.name, 'zip' )
+        AppLangTranslate( self.path, out_dir=zip_dir ).export( [OUT_FMT_XML] )
+        with zipfile.ZipFile(
+                os.path.join( zip_dir, XML_ZIP_FILE_NAME )
+        ) as zinp:
+            self.assertEqual(
+                { name: zinp.read( name ) for name in zinp.namelist() },
+                expected
+            )
+
+        # Streamed to files
+        fs_dir = os.path.join( self.tmp_dir.name, 'fs' )
+        AppLangTranslate(
+            self.path, out_dir=fs_dir, filesystem=True
+        ).export( [OUT_FMT_XML] )
+        for path, buf in expected.items():
+            with open( os.path.join( fs_dir, path ), 'rb' ) as finp:
+                self.assertEqual( finp.read(), buf )
+
+    def test_no_strings(self):
+        foutp = io.BytesIO()
+        AppLangTranslate( self.path )._write_xml( foutp, [] )
+
+        self.assertEqual(
+            foutp.getvalue(),
+            lxml.etree.tostring(
+                lxml.etree.Element( XML_TAG_ROOT ), pretty_print=True,
+                encoding='utf-8'
+            )
+        )
+
+class _ReuseTranslate(AppLangTranslate):
+    """
+    AppLangTranslate that records the output files it reuses
+    """
+    def _reuse_col(self, column, path, zoutp, zprev):
+        self.reused.add( path )
+        super()._reuse_col( column, path, zoutp, zprev )
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _export(self, out_dir, filesystem):
+        """
+        Exports the workbook incrementally. Returns a tuple of (dict of output
+        format to dict of paths to contents, set of paths reused)
+        """
+        translate = _ReuseTranslate(
+            self.path, out_dir=out_dir, filesystem=filesystem,
+            incremental=True
+        )
+        translate.reused = set()
+        translate.export()
+
+        expected = translate.render()
+        outputs = {}
+        for fmt, zip_name in (
+                (OUT_FMT_JSON, JSON_ZIP_FILE_NAME),
+                (OUT_FMT_XML, XML_ZIP_FILE_NAME),
+        ):
+            if filesystem:
+                outputs[fmt] = {}
+                for path in expected[fmt]:
+                    with open( os.path.join( out_dir, path ), 'rb' ) as finp:
+                        outputs[fmt][path] = finp.read()
+            else:
+                with zipfile.ZipFile(
+                        os.path.join( out_dir, zip_name )
+                ) as zinp:
+                    outputs[fmt] = {
+                        name: zinp.read( name ) for name in zinp.namelist()
+                    }
+
+        self.assertEqual( outputs, expected )
+
+        return outputs, translate.reused
+
+    def _edit(self):
+        """
+        Changes the translation of one plain translatable key in the first
+        language after English
+        """
+        wb = openpyxl.load_workbook( self.path )
+        ws = wb.active
+        for row in range( START_ROW, ws.max_row + 1 ):
+            if ws.cell( row=row, column=XML_KEY_COL ).value and \
+               ws.cell( row=row, column=XML_CDATA_COL ).value is None and \
+               ws.cell( row=row, column=XML_TRANS_COL ).value is None:
+                ws.cell( row=row, column=ENGLISH_COL + 1, value='edited' )
+                break
+        wb.save( self.path )
+
+    def test_rerun(self):
+        for filesystem in (False, True):
+            with self.subTest( filesystem=filesystem ):
+                out_dir = os.path.join(
+                    self.tmp_dir.name, 'fs' if filesystem else 'zip'
+                )
+                # The edit of the previous run is undone
+                make_workbook( self.path, nlangs=4, nkeys=50 )
+
+                first, reused = self._export( out_dir, filesystem )
+                self.assertEqual( reused, set() )
+
+                # Nothing changed: every file is reused
+                second, reused = self._export( out_dir, filesystem )
+                self.assertEqual( second, first )
+                self.assertEqual(
+                    reused,
+                    { path for files in first.values() for path in files }
+                )
+
+                # Only the files of the edited column are rendered again
+                self._edit()
+                third, reused = self._export( out_dir, filesystem )
+                changed = {
+                    path for fmt, files in third.items()
+                    for path, buf in files.items() if first[fmt][path] != buf
+                }
+                self.assertEqual( len( changed ), 2 )
+                self.assertEqual(
+                    reused,
+                    {
+                        path for files in third.values() for path in files
+                    } - changed
+                )
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+        make_workbook(
+            self.path, nlangs=3, nkeys=50, cdata_ratio=0.2,
+            nontrans_ratio=0.2
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _run(self, script, *args, cwd=None):
+        subprocess.run(
+            [sys.executable, os.path.join( SCRIPT_DIR, script )] +
+            list( args ),
+            check=True, cwd=cwd, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def test_same_as_cli(self):
+        cli_dir = os.path.join( self.tmp_dir.name, 'cli' )
+        self._run(
+            'app_lang_translate.py', '-o', ','.join( ALL_OUT_FMTS ),
+            '--out_dir', cli_dir, self.path
+        )
+
+        artifacts = AppLangTranslate( self.path ).render( ALL_OUT_FMTS )
+        self.assertEqual(
+            artifacts[OUT_FMT_JSON],
+            _read_zip( os.path.join( cli_dir, JSON_ZIP_FILE_NAME ) )
+        )
+        self.assertEqual(
+            artifacts[OUT_FMT_XML],
+            _read_zip( os.path.join( cli_dir, XML_ZIP_FILE_NAME ) )
+        )
+        with open( os.path.join( cli_dir, PACK_FILE_NAME ), 'rb' ) as finp:
+            self.assertEqual(
+                artifacts[OUT_FMT_PACK], { PACK_FILE_NAME: finp.read() }
+            )
+
+        # Written to .zip files, as by the CLI
+        api_dir = os.path.join( self.tmp_dir.name, 'api' )
+        for fmt, zip_name in (
+                (OUT_FMT_JSON, JSON_ZIP_FILE_NAME),
+                (OUT_FMT_XML, XML_ZIP_FILE_NAME),
+        ):
+            write_artifacts(
+                artifacts[fmt], out_dir=api_dir, zip_name=zip_name
+            )
+            self.assertEqual(
+                _read_zip( os.path.join( api_dir, zip_name ) ),
+                _read_zip( os.path.join( cli_dir, zip_name ) )
+            )
+
+        # Written to the filesystem, as by the CLI with --filesystem
+        fs_dir = os.path.join( self.tmp_dir.name, 'fs' )
+        self._run(
+            'app_lang_translate.py', '--filesystem', '--out_dir', fs_dir,
+            self.path
+        )
+        api_fs_dir = os.path.join( self.tmp_dir.name, 'api_fs' )
+        for fmt in (OUT_FMT_JSON, OUT_FMT_XML):
+            for path in write_artifacts(
+                    artifacts[fmt], out_dir=api_fs_dir
+            ):
+                rel = os.path.relpath( path, api_fs_dir )
+                with open( path, 'rb' ) as finp, \
+                     open( os.path.join( fs_dir, rel ), 'rb' ) as fcli:
+                    self.assertEqual( finp.read(), fcli.read() )
+
+    def test_xml2json_same_as_cli(self):
+        xml_zip = os.path.join( self.tmp_dir.name, XML_ZIP_FILE_NAME )
+        write_artifacts(
+            AppLangTranslate( self.path ).render( [OUT_FMT_XML] )[OUT_FMT_XML],
+            out_dir=self.tmp_dir.name, zip_name=XML_ZIP_FILE_NAME
+        )
+
+        cli_dir = os.path.join( self.tmp_dir.name, 'cli' )
+        os.makedirs( cli_dir )
+        self._run( 'xml2json.py', xml_zip, cwd=cli_dir )
+
+        self.assertEqual(
+            XML2JSON( [xml_zip] ).render(),
+            _read_zip( os.path.join( cli_dir, JSON_ZIP_FILE_NAME ) )
+        )
+
+class TestLogging(unittest.TestCase):
+    def test_root_level_kept(self):
+        root = logging.getLogger()
+        level = root.level
+        root.setLevel( logging.INFO )
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join( tmp_dir, 'langs.xlsx' )
+                make_workbook( path, nlangs=2, nkeys=10 )
+
+                AppLangTranslate( path ).render( ['xml'] )
+
+            self.assertEqual( root.level, logging.INFO )
+        finally:
+            root.setLevel( level )
+
+if __name__ == '__main__':
+    unittest.main()
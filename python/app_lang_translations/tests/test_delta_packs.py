@@ -0,0 +1,150 @@
+# Tests of delta language packs
+#
+# Usage:
+#     python tests/test_delta_packs.py
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import (
+    DELTA_DIR_NAME, DELTA_MANIFEST_FILE_NAME, DELTA_ZIP_FILE_NAME
+)
+from delta import DeltaPacks
+
+def _xml(strings):
+    """
+    Returns Android XML of a dict of keys to text, as bytes
+    """
+    return '<resources>\n{}</resources>\n'.format( ''.join(
+        '  <string name="{}">{}</string>\n'.format( key, txt )
+        for key, txt in strings.items()
+    ) ).encode( 'utf-8' )
+
+def _json(code, strings):
+    """
+    Returns iOS JSON of a dict of keys to text, as bytes
+    """
+    return json.dumps(
+        dict( strings, Locale_Code=code ), indent=4
+    ).encode( 'utf-8' )
+
+class TestDeltaPacks(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+        self.prev_files = {
+            'hi.json': _json( 'hi', { 'a': 'A', 'b': 'B', 'c': 'C' } ),
+            'mr.json': _json( 'mr', { 'a': 'A mr' } ),
+            'ta.json': _json( 'ta', { 'a': 'A ta' } ),
+            'values-hi/strings.xml': _xml( { 'a': 'A', 'b': 'B' } ),
+        }
+        self.current_files = {
+            'hi.json': _json( 'hi', { 'a': 'A', 'b': 'B 2', 'd': 'D' } ),
+            'mr.json': self.prev_files['mr.json'],
+            'values-hi/strings.xml': _xml( { 'a': 'A', 'b': 'B', 'e': 'E' } ),
+        }
+
+        self.prev = self._write_export( 'prev', self.prev_files )
+        self.current = self._write_export( 'current', self.current_files )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_export(self, name, files):
+        """
+        Writes files of an export to a directory. Returns its path
+        """
+        root = os.path.join( self.tmp_dir.name, name )
+        for path, buf in files.items():
+            path = os.path.join( root, path )
+            os.makedirs( os.path.dirname( path ), exist_ok=True )
+            with open( path, 'wb' ) as foutp:
+                foutp.write( buf )
+
+        return root
+
+    def _check(self, manifest, patches):
+        """
+        Checks the manifest, and the patches, given as a dict of patch path
+        to the patch as a dict
+        """
+        self.assertEqual( manifest['unchanged'], ['ios/mr.json'] )
+        self.assertEqual( manifest['removed'], ['ios/ta.json'] )
+        self.assertEqual(
+            sorted( manifest['patches'] ),
+            ['android/values-hi.json', 'ios/hi.json']
+        )
+
+        ios = manifest['patches']['ios/hi.json']
+        self.assertEqual(
+            (ios['added'], ios['changed'], ios['removed']), (1, 1, 1)
+        )
+        self.assertEqual(
+            ios['from'],
+            hashlib.sha256( self.prev_files['hi.json'] ).hexdigest()
+        )
+        self.assertEqual(
+            ios['to'],
+            hashlib.sha256( self.current_files['hi.json'] ).hexdigest()
+        )
+        self.assertEqual(
+            patches['ios/hi.json'],
+            { 'added': { 'd': 'D' }, 'changed': { 'b': 'B 2' },
+              'removed': ['c'] }
+        )
+
+        android = manifest['patches']['android/values-hi.json']
+        self.assertEqual(
+            (android['added'], android['changed'], android['removed']),
+            (1, 0, 0)
+        )
+        self.assertEqual(
+            patches['android/values-hi.json'],
+            { 'added': { 'e': 'E' }, 'changed': {}, 'removed': [] }
+        )
+
+    def test_zip(self):
+        out_dir = os.path.join( self.tmp_dir.name, 'out' )
+        manifest = DeltaPacks(
+            self.prev, self.current, out_dir=out_dir
+        ).write()
+
+        with zipfile.ZipFile(
+                os.path.join( out_dir, DELTA_ZIP_FILE_NAME )
+        ) as zinp:
+            self.assertEqual(
+                json.loads( zinp.read( DELTA_MANIFEST_FILE_NAME ) ), manifest
+            )
+            self._check(
+                manifest,
+                {
+                    path: json.loads( zinp.read( path ) )
+                    for path in manifest['patches']
+                }
+            )
+
+    def test_filesystem(self):
+        out_dir = os.path.join( self.tmp_dir.name, 'out' )
+        manifest = DeltaPacks(
+            self.prev, self.current, filesystem=True, out_dir=out_dir
+        ).write()
+
+        patches = {}
+        for path in manifest['patches']:
+            with open(
+                    os.path.join( out_dir, DELTA_DIR_NAME, path ), 'rb'
+            ) as finp:
+                patches[path] = json.loads( finp.read() )
+
+        self._check( manifest, patches )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# Tests of the binary language pack, and its reader
+#
+# Usage:
+#     python tests/test_lang_pack.py
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import OUT_FMT_PACK, PACK_FILE_NAME
+from synth_workbook import make_workbook
+from lang_pack import LangPack
+from utils import AppLangTranslate
+
+class TestLangPack(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+        make_workbook( path, nlangs=3, nkeys=20 )
+
+        self.path = os.path.join( self.tmp_dir.name, PACK_FILE_NAME )
+        AppLangTranslate( path, out_dir=self.tmp_dir.name ).export(
+            [OUT_FMT_PACK]
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lookup(self):
+        with LangPack( self.path ) as pack:
+            key = next( pack.keys() )
+            self.assertIn( key, pack )
+            self.assertNotIn( 'no such key', pack )
+            self.assertIsNone( pack.lookup( pack.langs[1], 'no such key' ) )
+
+            with pack.lookup( pack.langs[1], key ) as val:
+                self.assertEqual(
+                    bytes( val ).decode( 'utf-8' ),
+                    pack.get( pack.langs[1], key )
+                )
+
+    def test_close_with_view_held(self):
+        pack = LangPack( self.path )
+        key = next( pack.keys() )
+        text = pack.get( pack.langs[1], key )
+        val = pack.lookup( pack.langs[1], key )
+        part = val[:4]
+
+        # The file stays mapped until the views are released
+        pack.close()
+        self.assertEqual( bytes( val ), text.encode( 'utf-8' ) )
+        self.assertEqual( bytes( part ), text.encode( 'utf-8' )[:4] )
+        part.release()
+        val.release()
+
+        with self.assertRaises( ValueError ):
+            pack.lookup( pack.langs[1], key )
+
+        pack.close()
+
+    def test_exception_not_hidden_by_close(self):
+        with self.assertRaises( KeyError ):
+            with LangPack( self.path ) as pack:
+                val = pack.lookup( pack.langs[0], next( pack.keys() ) )
+                raise KeyError( 'raised in the block' )
+
+        val.release()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# Tests of merging translated language files back into the workbook
+#
+# Usage:
+#     python tests/test_merge_translations.py
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import openpyxl
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import ENGLISH_COL, JSON_LANG_ROW, START_ROW, XML_KEY_COL
+from synth_workbook import make_workbook
+from merge import MergeTranslations
+
+class TestMergeIosFormatSpecifiers(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+        make_workbook(
+            self.path, nlangs=3, nkeys=50, cdata_ratio=0, nontrans_ratio=0,
+            missing_ratio=0, blank_rows=0
+        )
+
+        ws = openpyxl.load_workbook( self.path ).active
+        self.col = ENGLISH_COL + 1
+        self.lang = ws.cell( row=JSON_LANG_ROW, column=self.col ).value
+
+        # Rows of a key whose English has format specifiers, and of one
+        # whose English has none
+        self.spec_row = self.plain_row = None
+        for irow in range( START_ROW, ws.max_row + 1 ):
+            english = ws.cell( row=irow, column=ENGLISH_COL ).value
+            if '%1$s' in english:
+                self.spec_row = self.spec_row or irow
+            else:
+                self.plain_row = self.plain_row or irow
+
+        self.key = lambda irow: ws.cell( row=irow, column=XML_KEY_COL ).value
+        self.value = lambda irow: ws.cell( row=irow, column=self.col ).value
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_specifiers_kept(self):
+        spec_value = self.value( self.spec_row )
+        self.assertIn( '%1$s', spec_value )
+
+        json_path = os.path.join( self.tmp_dir.name, self.lang + '.json' )
+        with open( json_path, 'w' ) as foutp:
+            json.dump(
+                {
+                    'Locale_Code': self.lang,
+                    self.key( self.spec_row ): 'EDITED with no specifier',
+                    self.key( self.plain_row ): 'EDITED plain',
+                }, foutp
+            )
+
+        stats = MergeTranslations( self.path, [json_path] ).merge()
+
+        self.assertEqual( stats[self.lang]['conflict'], 1 )
+        self.assertEqual( stats[self.lang]['updated'], 1 )
+
+        ws = openpyxl.load_workbook( self.path ).active
+        self.assertEqual(
+            ws.cell( row=self.spec_row, column=self.col ).value, spec_value
+        )
+        self.assertEqual(
+            ws.cell( row=self.plain_row, column=self.col ).value,
+            'EDITED plain'
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# Tests of converting plain-text translations tables
+#
+# Usage:
+#     python tests/test_table_sources.py
+import csv
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import lxml.etree
+import openpyxl
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import (
+    ALL_OUT_FMTS, ENGLISH_COL, JSON_LANG_ROW, OUT_FMT_XML, START_ROW,
+    XML_CDATA_COL, XML_KEY_COL, XML_LANG_ROW, XML_TRANS_COL
+)
+from synth_workbook import make_workbook
+from utils import AppLangTranslate
+
+def _write_rows(path, rows):
+    """
+    Writes rows of cell values to an .xlsx, CSV, TSV, or JSON file, as per
+    the extension
+    """
+    if path.endswith( '.xlsx' ):
+        wb = openpyxl.Workbook()
+        for row in rows:
+            wb.active.append( row )
+        wb.save( path )
+        return
+
+    with open( path, 'w', encoding='utf-8', newline='' ) as foutp:
+        if path.endswith( '.json' ):
+            json.dump( rows, foutp )
+            return
+
+        csv.writer(
+            foutp, delimiter='\t' if path.endswith( '.tsv' ) else ','
+        ).writerows(
+            ['' if val is None else val for val in row] for row in rows
+        )
+
+class TestSameOutput(unittest.TestCase):
+    def test_same_as_xlsx(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join( tmp_dir, 'langs.xlsx' )
+            make_workbook(
+                path, nlangs=4, nkeys=100, cdata_ratio=0.2,
+                nontrans_ratio=0.2
+            )
+            expected = AppLangTranslate( path ).render( ALL_OUT_FMTS )
+
+            wb = openpyxl.load_workbook( path )
+            rows = [list( row ) for row in wb.active.values]
+
+            for ext in ('.csv', '.tsv', '.json'):
+                with self.subTest( ext=ext ):
+                    table_path = os.path.join( tmp_dir, 'langs' + ext )
+                    _write_rows( table_path, rows )
+
+                    self.assertEqual(
+                        AppLangTranslate( table_path ).render( ALL_OUT_FMTS ),
+                        expected
+                    )
+
+class TestTextFlags(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+        ncols = ENGLISH_COL + 1
+        head = [[None] * ncols for _ in range( START_ROW - 1 )]
+        head[JSON_LANG_ROW - 1][ENGLISH_COL - 1:] = ['en', 'hi']
+        head[XML_LANG_ROW - 1][ENGLISH_COL - 1:] = ['values', 'values-hi']
+
+        # Flag cells as text
+        self.rows = head
+        for key, cdata, translatable in (
+                ('plain', None, None), ('trans_no', None, 'no'),
+                ('trans_false', None, 'false'), ('cdata_true', 'true', None),
+                ('cdata_yes', 'yes', None),
+        ):
+            row = [None] * ncols
+            row[XML_KEY_COL - 1] = key
+            row[XML_CDATA_COL - 1] = cdata
+            row[XML_TRANS_COL - 1] = translatable
+            row[ENGLISH_COL - 1:] = [key, key + ' hi']
+            self.rows.append( row )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _render(self, ext):
+        """
+        Returns a dict of keys to the lines of their Android XML in Hindi
+        """
+        path = os.path.join( self.tmp_dir.name, 'langs' + ext )
+        _write_rows( path, self.rows )
+
+        buf = AppLangTranslate( path ).render(
+            [OUT_FMT_XML]
+        )[OUT_FMT_XML]['values-hi/strings.xml']
+
+        return {
+            lxml.etree.fromstring( line ).get( 'name' ): line
+            for line in buf.decode( 'utf-8' ).split( '\n' )
+            if '<string ' in line
+        }
+
+    def test_xlsx_text_flags_unchanged(self):
+        # As before plain-text tables: any text marks a key as
+        # translatable, and only "yes" marks CDATA
+        strings = self._render( '.xlsx' )
+
+        self.assertEqual(
+            sorted( strings ),
+            ['cdata_true', 'cdata_yes', 'plain', 'trans_false', 'trans_no']
+        )
+        self.assertNotIn( 'CDATA', strings['cdata_true'] )
+        self.assertIn( 'CDATA', strings['cdata_yes'] )
+
+    def test_tsv_text_flags(self):
+        strings = self._render( '.tsv' )
+
+        self.assertEqual(
+            sorted( strings ), ['cdata_true', 'cdata_yes', 'plain']
+        )
+        self.assertIn( 'CDATA', strings['cdata_true'] )
+        self.assertIn( 'CDATA', strings['cdata_yes'] )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+# Tests of serving language files over HTTP
+#
+# Usage:
+#     python tests/test_translation_server.py
+import gzip
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import openpyxl
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import (
+    ENGLISH_COL, OUT_FMT_JSON, OUT_FMT_XML, SERVE_PREFIX_ANDROID,
+    SERVE_PREFIX_IOS, START_ROW, XML_CDATA_COL, XML_KEY_COL, XML_TRANS_COL
+)
+from synth_workbook import make_workbook
+from translation_server import TranslationServer
+from utils import AppLangTranslate
+
+# Seconds to wait for the workbook to be loaded again
+RELOAD_TIMEOUT = 10
+
+class TestTranslationServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+        make_workbook( self.path, nlangs=3, nkeys=50, cdata_ratio=0.2 )
+
+        self.server = TranslationServer(
+            AppLangTranslate( self.path ), port=0, interval=0.05
+        )
+        self.thread = threading.Thread( target=self.server.serve_forever )
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.tmp_dir.cleanup()
+
+    def _get(self, path, **headers):
+        """
+        Returns the response to a GET request, with its body read
+        """
+        conn = http.client.HTTPConnection( *self.server.address )
+        try:
+            conn.request( 'GET', path, headers=headers )
+            response = conn.getresponse()
+            response.body = response.read()
+        finally:
+            conn.close()
+
+        return response
+
+    def _expected(self):
+        """
+        Returns a dict of URL path to the contents of each file
+        """
+        artifacts = AppLangTranslate( self.path ).render()
+
+        files = {}
+        for fmt, prefix in (
+                (OUT_FMT_JSON, SERVE_PREFIX_IOS),
+                (OUT_FMT_XML, SERVE_PREFIX_ANDROID),
+        ):
+            for path, buf in artifacts[fmt].items():
+                files[prefix + path] = buf
+
+        return files
+
+    def test_files(self):
+        expected = self._expected()
+
+        index = json.loads( self._get( '/' ).body )
+        self.assertEqual( sorted( index['files'] ), sorted( expected ) )
+
+        for path, buf in expected.items():
+            response = self._get( path )
+            self.assertEqual( response.status, 200 )
+            self.assertEqual( response.body, buf )
+            self.assertEqual(
+                response.getheader( 'ETag' ), index['files'][path]
+            )
+
+        self.assertEqual( self._get( '/ios/none.json' ).status, 404 )
+
+    def test_not_modified(self):
+        path = sorted( self._expected() )[0]
+        etag = self._get( path ).getheader( 'ETag' )
+
+        response = self._get( path, **{ 'If-None-Match': etag } )
+        self.assertEqual( response.status, 304 )
+        self.assertEqual( response.body, b'' )
+        self.assertEqual( response.getheader( 'ETag' ), etag )
+
+        # The ETag of the compressed file also matches
+        gzip_etag = self._get(
+            path, **{ 'Accept-Encoding': 'gzip' }
+        ).getheader( 'ETag' )
+        self.assertNotEqual( gzip_etag, etag )
+        self.assertEqual(
+            self._get( path, **{ 'If-None-Match': gzip_etag } ).status, 304
+        )
+
+        self.assertEqual(
+            self._get( path, **{ 'If-None-Match': '"other"' } ).status, 200
+        )
+
+    def test_gzip(self):
+        for path, buf in self._expected().items():
+            response = self._get( path, **{ 'Accept-Encoding': 'gzip, br' } )
+            self.assertEqual(
+                response.getheader( 'Content-Encoding' ), 'gzip'
+            )
+            self.assertEqual( gzip.decompress( response.body ), buf )
+
+            # Not compressed unless asked for
+            response = self._get( path, **{ 'Accept-Encoding': 'br' } )
+            self.assertIsNone( response.getheader( 'Content-Encoding' ) )
+            self.assertEqual( response.body, buf )
+
+    def test_reload(self):
+        before = self._expected()
+        etags = json.loads( self._get( '/' ).body )['files']
+
+        # Change the translation of one plain translatable key in the first
+        # language after English
+        wb = openpyxl.load_workbook( self.path )
+        ws = wb.active
+        for row in range( START_ROW, ws.max_row + 1 ):
+            if ws.cell( row=row, column=XML_KEY_COL ).value and \
+               ws.cell( row=row, column=XML_CDATA_COL ).value is None and \
+               ws.cell( row=row, column=XML_TRANS_COL ).value is None:
+                ws.cell( row=row, column=ENGLISH_COL + 1, value='edited' )
+                break
+        wb.save( self.path )
+
+        after = self._expected()
+        changed = [path for path in after if after[path] != before[path]]
+        self.assertEqual( len( changed ), 2 )
+
+        deadline = time.monotonic() + RELOAD_TIMEOUT
+        while json.loads( self._get( '/' ).body )['files'] == etags:
+            self.assertLess( time.monotonic(), deadline )
+            time.sleep( 0.05 )
+
+        new_etags = json.loads( self._get( '/' ).body )['files']
+        for path, buf in after.items():
+            self.assertEqual( self._get( path ).body, buf )
+            if path in changed:
+                self.assertNotEqual( new_etags[path], etags[path] )
+            else:
+                self.assertEqual( new_etags[path], etags[path] )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Tests of validating translations while converting
+#
+# Usage:
+#     python tests/test_validator.py
+import os
+import sys
+import tempfile
+import unittest
+
+import openpyxl
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import (
+    ENGLISH_COL, ISSUE_CDATA_END, ISSUE_DUPLICATE_KEY, ISSUE_MARKUP,
+    ISSUE_PLACEHOLDERS, JSON_LANG_ROW, START_ROW, XML_CDATA_COL, XML_KEY_COL,
+    XML_LANG_ROW, XML_TRANS_COL
+)
+from utils import AppLangTranslate, Validator
+
+class TestValidator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join( self.tmp_dir.name, 'langs.xlsx' )
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        for col, json_lang, xml_lang in (
+                (ENGLISH_COL, 'en', 'values'),
+                (ENGLISH_COL + 1, 'hi', 'values-hi'),
+        ):
+            ws.cell( row=JSON_LANG_ROW, column=col, value=json_lang )
+            ws.cell( row=XML_LANG_ROW, column=col, value=xml_lang )
+
+        for irow, (key, cdata, translatable, english, hindi) in enumerate(
+                (
+                    ('ok', None, None, 'Hello %1$s', 'Namaste %1$s'),
+                    ('placeholders', None, None, 'Hi %1$s', 'Namaste'),
+                    ('markup', None, None, '<b>Bold</b>', '<b>Bold'),
+                    ('cdata_end', 'yes', None, '<b>A</b>', 'A ]]> B'),
+                    ('ok', None, None, 'Again', 'Again hi'),
+                    # Only English is output, so specifiers are not compared
+                    ('english_only', None, 0, 'Hi %1$s', 'Hi'),
+                    # Rows after the first blank key are not output
+                    (None, None, None, None, None),
+                    ('after_blank', None, None, 'Hi %1$s', 'Hi'),
+                ), START_ROW
+        ):
+            ws.cell( row=irow, column=XML_KEY_COL, value=key )
+            ws.cell( row=irow, column=XML_CDATA_COL, value=cdata )
+            ws.cell( row=irow, column=XML_TRANS_COL, value=translatable )
+            ws.cell( row=irow, column=ENGLISH_COL, value=english )
+            ws.cell( row=irow, column=ENGLISH_COL + 1, value=hindi )
+        wb.save( self.path )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_issues(self):
+        validator = Validator()
+        AppLangTranslate( self.path, validator=validator ).render()
+        report = validator.report()
+
+        self.assertEqual( report['rows'], { self.path: 6 } )
+        self.assertEqual(
+            report['counts'],
+            {
+                ISSUE_PLACEHOLDERS: 1, ISSUE_MARKUP: 1, ISSUE_CDATA_END: 1,
+                ISSUE_DUPLICATE_KEY: 1,
+            }
+        )
+
+        hindi_col = openpyxl.utils.cell.get_column_letter( ENGLISH_COL + 1 )
+        self.assertEqual(
+            sorted(
+                (issue['type'], issue['row'], issue['column'], issue['key'])
+                for issue in report['issues']
+            ),
+            sorted( [
+                (ISSUE_PLACEHOLDERS, START_ROW + 1, hindi_col, 'placeholders'),
+                (ISSUE_MARKUP, START_ROW + 2, hindi_col, 'markup'),
+                (ISSUE_CDATA_END, START_ROW + 3, hindi_col, 'cdata_end'),
+                (ISSUE_DUPLICATE_KEY, START_ROW + 4, None, 'ok'),
+            ] )
+        )
+
+    def test_rerun_replaces_issues(self):
+        # As in watch mode, issues of the previous load are dropped
+        validator = Validator()
+        translate = AppLangTranslate( self.path, validator=validator )
+        translate.render()
+        translate.render()
+
+        self.assertEqual( len( validator.report()['issues'] ), 4 )
+
+if __name__ == '__main__':
+    unittest.main()
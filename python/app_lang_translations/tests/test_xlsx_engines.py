@@ -0,0 +1,270 @@
+# Tests that the lxml .xlsx reader gives the same output as openpyxl
+#
+# Usage:
+#     python tests/test_xlsx_engines.py
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+import openpyxl
+
+sys.path.insert(
+    0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+)
+
+from constants import (
+    ALL_OUT_FMTS, JSON_ZIP_FILE_NAME, XLSX_ENGINE_LXML, XLSX_ENGINE_OPENPYXL,
+    XML_ZIP_FILE_NAME
+)
+from synth_workbook import make_workbook
+from utils import AppLangTranslate, XlsxReader
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.' \
+    'spreadsheetml.{}+xml'
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels"
+ ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="{}"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="{}"/>
+<Override PartName="/xl/sharedStrings.xml" ContentType="{}"/>
+<Override PartName="/xl/styles.xml" ContentType="{}"/>
+</Types>'''.format(
+    CONTENT_TYPE.format( 'sheet.main' ), CONTENT_TYPE.format( 'worksheet' ),
+    CONTENT_TYPE.format( 'sharedStrings' ), CONTENT_TYPE.format( 'styles' )
+)
+
+RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="{0}">
+<Relationship Id="rId1" Type="{1}/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''.format( NS_PKG_REL, NS_REL )
+
+WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="{0}" xmlns:r="{1}">
+<bookViews><workbookView activeTab="0"/></bookViews>
+<sheets><sheet name="Strings" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''.format( NS_MAIN, NS_REL )
+
+WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="{0}">
+<Relationship Id="rId1" Type="{1}/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="{1}/sharedStrings" Target="sharedStrings.xml"/>
+<Relationship Id="rId3" Type="{1}/styles" Target="styles.xml"/>
+</Relationships>'''.format( NS_PKG_REL, NS_REL )
+
+# Cell styles: 0 general, 1 date, 2 custom date, and time, 3 elapsed time
+STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="{}">
+<numFmts count="1">
+<numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/>
+</numFmts>
+<fonts count="1"><font/></fonts>
+<fills count="1"><fill><patternFill patternType="none"/></fill></fills>
+<borders count="1"><border/></borders>
+<cellStyleXfs count="1"><xf numFmtId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0"/><xf numFmtId="14" applyNumberFormat="1"/>
+<xf numFmtId="164" applyNumberFormat="1"/>
+<xf numFmtId="46" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/>
+</cellStyles>
+</styleSheet>'''.format( NS_MAIN )
+
+# Shared strings, with rich text, and phonetic runs
+SHARED_STRINGS = [
+    '<si><t>en</t></si>',
+    '<si><t>hi</t></si>',
+    '<si><t>values-hi</t></si>',
+    '<si><t>greeting</t></si>',
+    '<si><r><t xml:space="preserve">Hello </t></r>'
+    '<r><rPr><b/></rPr><t>world</t></r></si>',
+    '<si><t>नमस्ते दुनिया</t><rPh sb="0" eb="1"><t>phonetic</t></rPh></si>',
+    '<si><t>Count %1$s of %2$d</t></si>',
+    '<si><t>&lt;b&gt;Bold&lt;/b&gt; text</t></si>',
+    '<si><t>&lt;i&gt;तिरछा&lt;/i&gt;</t></si>',
+    '<si><t>Brand</t></si>',
+]
+
+def _inline(ref, text):
+    return '<c r="{}" t="inlineStr"><is><t>{}</t></is></c>'.format(
+        ref, text
+    )
+
+# Rows of (row no., cells). Row 4, and some cells are missing. Rows after
+# the blank key at row 13 are not output, but are read
+ROWS = [
+    (1, [_inline( 'H1', 'English' ), _inline( 'I1', 'Hindi' ),
+         _inline( 'J1', 'Marathi' )]),
+    (2, ['<c r="H2" t="s"><v>0</v></c>', '<c r="I2" t="s"><v>1</v></c>',
+         _inline( 'J2', 'mr' )]),
+    (3, [_inline( 'H3', 'values' ), '<c r="I3" t="s"><v>2</v></c>',
+         _inline( 'J3', 'values-mr' )]),
+    (5, ['<c r="A5" t="s"><v>3</v></c>', '<c r="H5" t="s"><v>4</v></c>',
+         '<c r="I5" t="s"><v>5</v></c>',
+         '<c r="J5" t="inlineStr"><is><r><t xml:space="preserve">नमस्कार '
+         '</t></r><r><rPr><i/></rPr><t>जग</t></r></is></c>']),
+    # Flags as booleans, and a formula with a cached value
+    (6, [_inline( 'A6', 'count' ), '<c r="B6" t="b"><v>0</v></c>',
+         '<c r="C6" t="b"><v>1</v></c>', '<c r="H6" t="s"><v>6</v></c>',
+         '<c r="I6" t="str"><f>"गिनती "&amp;H6</f><v>गिनती</v></c>']),
+    # Not translatable, as a number
+    (7, [_inline( 'A7', 'brand' ), '<c r="C7"><v>0</v></c>',
+         '<c r="H7" t="s"><v>9</v></c>', _inline( 'I7', 'ब्रांड' )]),
+    # CDATA, as a number, with a missing translation
+    (8, [_inline( 'A8', 'bold' ), '<c r="B8"><v>1</v></c>',
+         '<c r="H8" t="s"><v>7</v></c>', '<c r="I8" t="s"><v>8</v></c>']),
+    # Cells with no "r" attribute, from column A, and empty cells
+    (9, [_inline( None, 'no_refs' ), '<c/>', '<c/>', '<c/>', '<c/>', '<c/>',
+         '<c/>', _inline( None, 'No refs' ), _inline( None, 'कोई नहीं' )]),
+    # Shared formulas, with cached values
+    (10, [_inline( 'A10', 'shared_formula' ),
+          '<c r="H10" t="str"><f t="shared" ref="H10:H11" si="0">'
+          'UPPER(A10)</f><v>SHARED_FORMULA</v></c>']),
+    (11, [_inline( 'A11', 'shared_formula_2' ),
+          '<c r="H11" t="str"><f t="shared" si="0"/>'
+          '<v>SHARED_FORMULA_2</v></c>',
+          '<c r="J11" t="str"><f>LOWER(A11)</f><v>shared_formula_2</v></c>']),
+    (12, [_inline( 'A12', 'last' ), _inline( 'H12', 'Last' )]),
+    (13, [_inline( 'H13', 'Below the blank key' )]),
+    # Footer of numbers, dates, booleans, and errors, after a missing row
+    (15, ['<c r="H15"><v>42</v></c>', '<c r="I15"><v>3.5</v></c>',
+          '<c r="J15"><v>1E3</v></c>']),
+    (16, ['<c r="H16" s="1"><v>45000</v></c>',
+          '<c r="I16" s="2"><v>45000.5</v></c>',
+          '<c r="J16" t="d"><v>2024-01-02T03:04:05</v></c>']),
+    (17, ['<c r="H17" t="b"><v>1</v></c>', '<c r="I17" s="3"><v>1.25</v></c>',
+          '<c r="J17" t="e"><v>#N/A</v></c>']),
+]
+
+def _sheet(dimension=True):
+    rows = []
+    for irow, cells in ROWS:
+        cells = [
+            cell.replace( ' r="None"', '' ) for cell in cells
+        ]
+        rows.append( '<row r="{}">{}</row>'.format( irow, ''.join( cells ) ) )
+
+    return '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="{}">{}<sheetData>{}</sheetData></worksheet>'''.format(
+        NS_MAIN, '<dimension ref="A1:J17"/>' if dimension else '',
+        ''.join( rows )
+    )
+
+def make_xlsx(path, dimension=True):
+    """
+    Writes a workbook by hand, with cells of all types, in ways that
+    openpyxl does not write them
+    """
+    with zipfile.ZipFile( path, 'w' ) as zoutp:
+        zoutp.writestr( '[Content_Types].xml', CONTENT_TYPES )
+        zoutp.writestr( '_rels/.rels', RELS )
+        zoutp.writestr( 'xl/workbook.xml', WORKBOOK )
+        zoutp.writestr( 'xl/_rels/workbook.xml.rels', WORKBOOK_RELS )
+        zoutp.writestr( 'xl/styles.xml', STYLES )
+        zoutp.writestr(
+            'xl/sharedStrings.xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<sst xmlns="{}" count="{}" uniqueCount="{}">{}</sst>'.format(
+                NS_MAIN, len( SHARED_STRINGS ), len( SHARED_STRINGS ),
+                ''.join( SHARED_STRINGS )
+            )
+        )
+        zoutp.writestr( 'xl/worksheets/sheet1.xml', _sheet( dimension ) )
+
+class TestXlsxEngines(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+        self.paths = []
+        for dimension in True, False:
+            path = os.path.join(
+                self.tmp_dir.name, 'hand{}.xlsx'.format( int( dimension ) )
+            )
+            make_xlsx( path, dimension=dimension )
+            self.paths.append( path )
+
+        path = os.path.join( self.tmp_dir.name, 'synth.xlsx' )
+        make_workbook( path, nlangs=5, nkeys=200, seed=1 )
+        self.paths.append( path )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _rows(self, wb):
+        ws = wb.active
+        if ws.max_row is None or ws.max_column is None:
+            ws.calculate_dimension( force=True )
+
+        return list(
+            ws.iter_rows(
+                min_row=1, max_row=ws.max_row, max_col=ws.max_column,
+                values_only=True
+            )
+        )
+
+    def test_cell_values(self):
+        for path in self.paths:
+            with self.subTest( path=os.path.basename( path ) ):
+                wb = openpyxl.load_workbook( path, read_only=True )
+                try:
+                    expected = self._rows( wb )
+                finally:
+                    wb.close()
+
+                reader = XlsxReader( path )
+                try:
+                    self.assertEqual( self._rows( reader ), expected )
+                finally:
+                    reader.close()
+
+    def test_render(self):
+        for path in self.paths:
+            with self.subTest( path=os.path.basename( path ) ):
+                expected = AppLangTranslate(
+                    path, engine=XLSX_ENGINE_OPENPYXL
+                ).render( ALL_OUT_FMTS )
+                self.assertEqual(
+                    AppLangTranslate(
+                        path, engine=XLSX_ENGINE_LXML
+                    ).render( ALL_OUT_FMTS ), expected
+                )
+
+    def test_export(self):
+        for path in self.paths:
+            name = os.path.basename( path )
+            out_dirs = {}
+            for engine in XLSX_ENGINE_OPENPYXL, XLSX_ENGINE_LXML:
+                out_dirs[engine] = os.path.join(
+                    self.tmp_dir.name, engine, name
+                )
+                AppLangTranslate(
+                    path, engine=engine, out_dir=out_dirs[engine]
+                ).export()
+
+            for zip_name in JSON_ZIP_FILE_NAME, XML_ZIP_FILE_NAME:
+                with self.subTest( path=name, zip_name=zip_name ):
+                    members = []
+                    for out_dir in out_dirs.values():
+                        with zipfile.ZipFile(
+                            os.path.join( out_dir, zip_name )
+                        ) as zinp:
+                            members.append(
+                                {
+                                    fname: zinp.read( fname )
+                                    for fname in zinp.namelist()
+                                }
+                            )
+
+                    self.assertTrue( members[0] )
+                    self.assertEqual( members[1], members[0] )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+# Local HTTP server of the language files of a workbook, for serve.py
+import hashlib
+import http.server
+import json
+import logging
+import openpyxl
+import os
+import threading
+try:
+    import zlib
+except ImportError:
+    # Files are served uncompressed
+    zlib = None
+
+from  constants import (
+    JSON_INDENT, SERVE_HOST, SERVE_PORT, SERVE_PREFIX_ANDROID,
+    SERVE_PREFIX_IOS, SERVE_TYPE_JSON, SERVE_TYPE_XML, WATCH_INTERVAL
+)
+
+class _Artifact:
+    """
+    A file served by TranslationServer, rendered in advance: its body, the
+    body compressed with gzip, if zlib is available, and their ETags
+    """
+    def __init__(self, body, content_type, digest=None):
+        """
+        body: contents, as bytes
+        content_type: value of the Content-Type header
+        digest: either None, or the input digest of the column rendered
+        """
+        self.body = body
+        self.content_type = content_type
+        self.digest = digest
+
+        tag = hashlib.sha256( body ).hexdigest()[:32]
+        self.etag = '"{}"'.format( tag )
+        self.gzip_etag = '"{}-gzip"'.format( tag )
+
+        self.gzip_body = None
+        if zlib is not None:
+            # wbits of 31 is the gzip format, with no timestamp
+            compressor = zlib.compressobj( 9, zlib.DEFLATED, 31 )
+            self.gzip_body = compressor.compress( body ) + compressor.flush()
+
+class _TranslationRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Request handler of TranslationServer: responds from the files rendered
+    in advance
+    """
+    def do_GET(self):
+        self._respond( True )
+
+    def do_HEAD(self):
+        self._respond( False )
+
+    def _respond(self, send_body):
+        artifacts = self.server.translation_server.artifacts
+        artifact = artifacts.get( self.path.split( '?', 1 )[0] )
+        if artifact is None:
+            self.send_error( 404 )
+            return
+
+        encodings = [
+            part.split( ';' )[0].strip()
+            for part in self.headers.get( 'Accept-Encoding', '' ).split( ',' )
+        ]
+        compressed = artifact.gzip_body is not None and 'gzip' in encodings
+        etag, body = (artifact.gzip_etag, artifact.gzip_body) \
+            if compressed else (artifact.etag, artifact.body)
+
+        # Both representations have the same contents, so either ETag
+        # matches
+        tags = [
+            tag.strip()[2:] if tag.strip().startswith( 'W/' ) else tag.strip()
+            for tag in self.headers.get( 'If-None-Match', '' ).split( ',' )
+        ]
+        not_modified = '*' in tags or artifact.etag in tags or \
+            artifact.gzip_etag in tags
+
+        self.send_response( 304 if not_modified else 200 )
+        self.send_header( 'ETag', etag )
+        self.send_header( 'Cache-Control', 'no-cache' )
+        self.send_header( 'Vary', 'Accept-Encoding' )
+        if not_modified:
+            self.end_headers()
+            return
+
+        self.send_header( 'Content-Type', artifact.content_type )
+        self.send_header( 'Content-Length', str( len( body ) ) )
+        if compressed:
+            self.send_header( 'Content-Encoding', 'gzip' )
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write( body )
+
+    def log_message(self, format, *args):
+        logging.info(
+            '{} - {}'.format( self.address_string(), format % args )
+        )
+
+class TranslationServer:
+    """
+    Local HTTP server of the iOS JSON, and Android XML language files of one
+    workbook, e.g., for test devices, and web clients, with no .zip files
+    exported. The workbook is loaded with an AppLangTranslate, and each file
+    is rendered, and compressed once, in advance. Responses have ETags, and
+    requests with a matching If-None-Match get "304 Not Modified"
+
+    The workbook is polled for changes, as in AppLangTranslate.watch(), and
+    loaded again. Only the files of columns whose input changed are rendered
+    again, and all files are then replaced at once
+
+    Paths are:
+        /: index of the files, and their ETags, as JSON
+        /ios/<lang>.json: iOS JSON, e.g., /ios/hi.json
+        /android/<dir>/strings.xml: Android XML, e.g.,
+             /android/values-hi/strings.xml
+    """
+    def __init__(
+            self, translate, host=SERVE_HOST, port=SERVE_PORT,
+            interval=WATCH_INTERVAL
+    ):
+        """
+        translate: AppLangTranslate for the workbook, with the settings for
+             the files
+        host: address to listen on. The default only accepts local clients
+        port: port to listen on. Zero means any free port
+        interval: polling interval in seconds for changes of the workbook
+        """
+        self.translate = translate
+        self.interval = interval
+
+        # URL path to _Artifact. Replaced as a whole on each load
+        self.artifacts = {}
+
+        # Limits of zero mean the last row, and column, which may change
+        self._limits = translate.end_col, translate.end_row
+
+        self._last = self._stat()
+        self.reload()
+
+        self.httpd = http.server.ThreadingHTTPServer(
+            (host, port), _TranslationRequestHandler
+        )
+        self.httpd.daemon_threads = True
+        self.httpd.translation_server = self
+
+        self._stop = threading.Event()
+
+    @property
+    def address(self):
+        """
+        Tuple of (host, port) that the server listens on
+        """
+        return self.httpd.server_address[:2]
+
+    def _stat(self):
+        try:
+            st = os.stat( self.translate.path )
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            # The file may be briefly missing while it is being saved
+            return None
+
+    def reload(self):
+        """
+        Loads the workbook, renders the files of columns whose input changed
+        since the last load, and replaces the files served
+        """
+        t = self.translate
+        t.end_col, t.end_row = self._limits
+        t._load()
+        t._locale_data = t._read_locale_data()
+
+        reuse = {
+            artifact.digest: (path, artifact)
+            for path, artifact in self.artifacts.items()
+            if artifact.digest is not None
+        }
+
+        artifacts = {}
+        nrendered = 0
+        for xml, prefix, content_type in (
+                (False, SERVE_PREFIX_IOS, SERVE_TYPE_JSON),
+                (True, SERVE_PREFIX_ANDROID, SERVE_TYPE_XML),
+        ):
+            for col in t._data_cols():
+                try:
+                    digest = t._input_digest( xml, col )
+                    if digest in reuse:
+                        path, artifact = reuse[digest]
+                    else:
+                        path, buf, _, _ = t._render_col( xml, col )
+                        path = prefix + path.replace( os.sep, '/' )
+                        artifact = _Artifact( buf, content_type, digest )
+                        nrendered += 1
+                except (OSError, ValueError) as e:
+                    logging.error(
+                        'Exception in processing. col {}  {}:{}'.format(
+                            openpyxl.utils.cell.get_column_letter( col ),
+                            e.__class__.__name__, e
+                        )
+                    )
+                    if t.stop_on_err:
+                        raise
+
+                    continue
+
+                artifacts[path] = artifact
+
+        index = {
+            'path': t.path,
+            'files': {
+                path: artifact.etag for path, artifact in artifacts.items()
+            },
+        }
+        artifacts['/'] = _Artifact(
+            json.dumps( index, indent=JSON_INDENT ).encode( 'utf-8' ),
+            SERVE_TYPE_JSON
+        )
+
+        self.artifacts = artifacts
+
+        logging.info(
+            'Loaded "{}": rendered {} of {} files'.format(
+                t.path, nrendered, len( artifacts ) - 1
+            )
+        )
+
+    def _poll(self):
+        """
+        Reloads the workbook whenever it changes, until the server stops
+        """
+        while not self._stop.wait( self.interval ):
+            current = self._stat()
+            if current is None or current == self._last:
+                continue
+
+            self._last = current
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the previous files, e.g., after a partial save
+                logging.error(
+                    'Processing failed for "{}". {}:{}'.format(
+                        self.translate.path, e.__class__.__name__, e
+                    )
+                )
+
+    def serve_forever(self):
+        """
+        Serves requests, and reloads the workbook when it changes, until
+        shutdown() is called, or interrupted, e.g., by KeyboardInterrupt
+        """
+        poller = threading.Thread( target=self._poll, daemon=True )
+        poller.start()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self._stop.set()
+            poller.join()
+            self.httpd.server_close()
+
+    def shutdown(self):
+        """
+        Stops serve_forever(), from another thread
+        """
+        self.httpd.shutdown()
@@ -1,10 +1,29 @@
+import array
+import concurrent.futures
+import contextlib
+import copy
+import cProfile
+import csv
+import hashlib
+import io
+import itertools
 import json
 import logging
-import lxml
+import lxml.etree
 import openpyxl
+import openpyxl.formula.translate
+import openpyxl.styles.numbers
+import openpyxl.utils.datetime
+import openpyxl.worksheet.formula
+import operator
 import os
+import pickle
+import posixpath
 import re
-import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
 import zipfile
 try:
     import zlib
@@ -12,13 +31,33 @@ try:
 except:
     COMPRESSION = zipfile.ZIP_STORED
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+try:
+    # Faster serializer for compact JSON, if installed
+    import orjson
+except ImportError:
+    orjson = None
+
 from  constants import (
-    DEF_LOG_LEVEL, DEF_SFX, ENGLISH_COL, FMT_SPEC_STR, JSON_LANG_ROW,
-    JSON_LOCALE_FILE_NAME, JSON_ZIP_FILE_NAME, NROWS_CHECK, START_COL,
-    START_ROW, XML_ATTR_STR_NAME, XML_CDATA_COL, XML_KEY_COL,
-    XML_LANG_FILE_NAME, XML_LANG_ROW, XML_LANG_ENGLISH_CODE, XML_TAG_ROOT,
-    XML_TAG_STR, XML_TRANS_COL, XML_ZIP_FILE_NAME
+    ALL_OUT_FMTS, DEF_SFX, DEF_XLSX_ENGINE, ENGLISH_COL, FLAG_TEXT_SET,
+    FLAG_TEXT_UNSET, FMT_SPEC_STR, IN_FMTS, IN_FMT_CSV, IN_FMT_EXTS,
+    IN_FMT_JSON, IN_FMT_TSV, IN_FMT_XLSX, ISSUE_CDATA_END, ISSUE_DUPLICATE_KEY,
+    ISSUE_MARKUP, ISSUE_PLACEHOLDERS, JSON_INDENT, JSON_LANG_ENGLISH_CODE,
+    JSON_LANG_ROW, JSON_LOCALE_FILE_NAME, JSON_ZIP_FILE_NAME,
+    MANIFEST_FILE_NAME, MANIFEST_VERSION, MARKUP_TAG_STR, MARKUP_VOID_TAGS,
+    MEMORY_SPILL_FRACTION, NROWS_CHECK, OUT_FMTS, OUT_FMT_JSON, OUT_FMT_PACK,
+    OUT_FMT_XML, PACK_FILE_NAME, PACK_MAGIC, PACK_VERSION, PREV_ZIP_SFX,
+    PROFILE_VERSION, START_COL, START_ROW, VALIDATION_VERSION, WATCH_INTERVAL,
+    XLSX_ENGINES, XLSX_ENGINE_LXML, XML_ATTR_STR_NAME, XML_CDATA_COL,
+    XML_KEY_COL, XML_LANG_ENGLISH_CODE, XML_LANG_FILE_NAME, XML_LANG_ROW,
+    XML_TAG_ROOT, XML_TAG_STR, XML_TRANS_COL, XML_ZIP_FILE_NAME
 )
+from lang_pack import PACK_HEADER, pack_table, pack_uint32s
 
 ZIPFIle_MODES = {
     zipfile.ZIP_DEFLATED: 'deflated',
@@ -26,436 +65,2805 @@ ZIPFIle_MODES = {
 }
 
 RE_FMT_SPEC = re.compile( FMT_SPEC_STR )
+RE_MARKUP_TAG = re.compile( MARKUP_TAG_STR )
 
-class _BaseLangTranslate:
-    def _is_readable_file(self, path):
-        return os.path.isfile( path ) and os.access( path, os.R_OK )
+CDATA_START = '<![CDATA['
+CDATA_END = ']]>'
 
-    def _out_json_file_name(self, lang):
-        return lang.lower() + '.json'
+def _is_cdata(val, text_flags=False):
+    """
+    Returns True if the value of a CDATA flag cell is set, i.e., is 1, or
+    "yes". With text_flags, "true", and "1" as text are also set
+    """
+    if not isinstance( val, str ):
+        return val == 1
 
-    def _out_xml_file_name(self, lang):
-        return lang.lower(), XML_LANG_FILE_NAME
+    return val.lower() in FLAG_TEXT_SET if text_flags else \
+        val.lower() == 'yes'
 
-    def set_log_level(self, level):
+def _is_translatable(val, text_flags=False):
+    """
+    Returns True if the value of a translatable flag cell is set. A blank
+    cell means translatable. With text_flags, "no", "false", or "0" as text
+    means not
+    """
+    if val is None:
+        return True
+
+    if text_flags and isinstance( val, str ) and \
+       val.lower() in FLAG_TEXT_UNSET:
+        return False
+
+    return bool( val )
+
+def get_peak_memory():
+    """
+    Returns the peak resident set size of this process in bytes, or None if
+    it is not available
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+
+    # Kilobytes on Linux, but bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def get_executor(jobs=1):
+    """
+    Returns a process pool in which language columns, or .zip members are
+    converted in parallel, or None if they are to be converted one by one in
+    this process. Workers load the state of each workbook when they first
+    need it, so one pool can be shared by many workbooks
+
+    jobs: no. of worker processes. Zero means the no. of CPUs
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        return None
+
+    return concurrent.futures.ProcessPoolExecutor( max_workers=jobs )
+
+# Tuple of (path of the file it was loaded from, AppLangTranslate) of the
+# workbook being converted in a worker process, without its language
+# columns. Loaded once per worker, and workbook, by _render_col_in_worker()
+_worker_translate = (None, None)
+
+def _render_col_in_worker(path, xml, column, values):
+    global _worker_translate
+
+    if _worker_translate[0] != path:
+        with open( path, 'rb' ) as finp:
+            _worker_translate = path, pickle.load( finp )
+
+    translate = _worker_translate[1]
+    translate.table.langs = { column: values }
+    return translate._render_col( xml, column )
+
+def _convert_zip_member_in_worker(translate, zpath, fname, locales):
+    return translate._zip_member_to_json( zpath, fname, locales )
+
+class TranslationTable:
+    """
+    Column-major, in-memory model of the translations in a workbook. Built
+    once per workbook from its data rows, and shared by all emitters. The
+    columns shared by all languages are read, and parsed only once:
+
+    keys: keys for each row. Blank keys are ''
+    cdata: CDATA flag for each row
+    translatable: translatable flag for each row
+    english: English for each row, as in the workbook
+    english_ios: English for each row with format specifiers stripped, for
+         iOS. None if there is no English, and other values than text are
+         as in the workbook
+    langs: dict of language column index to translations for each row
+    """
+    def __init__(
+            self, columns, english_col=ENGLISH_COL, xml_key_col=XML_KEY_COL,
+            xml_cdata_col=XML_CDATA_COL, xml_trans_col=XML_TRANS_COL,
+            text_flags=False
+    ):
         """
-        Public method to sey logging level.
+        columns: indices of language columns
+        english_col: column index for English
+        xml_key_col: column index for keys
+        xml_cdata_col: column index for the CDATA flag
+        xml_trans_col: column index for the translatable flag
+        text_flags: if True, flag cells are text, as in plain-text tables,
+             and "true", "false", etc. are parsed, as for _is_cdata(), and
+             _is_translatable()
+        """
+        self.keys = []
+        self.cdata = []
+        self.translatable = []
+        self.english = []
+        self.english_ios = []
+        self.langs = {col: [] for col in columns}
 
-        level: string defining level as per the "logging" module. One of
-               "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"
+        self._shared_digest = None
+
+        self.text_flags = text_flags
+
+        self._get_shared = operator.itemgetter(
+            xml_key_col - 1, xml_cdata_col - 1, xml_trans_col - 1,
+            english_col - 1
+        )
+
+    def append(self, row):
         """
-        self._set_log_level( level )
+        Appends one data row
 
-    def _get_zip_outfile(self, xml=False):
-        if not self.filesystem:
-            return zipfile.ZipFile(
-                XML_ZIP_FILE_NAME if xml else JSON_ZIP_FILE_NAME, mode='w'
-            )
+        row: tuple of cell values for the row, starting at column 1
+        """
+        key, cdata, translatable, english = self._get_shared( row )
 
-    def _read_locale_data(self):
+        self.keys.append( key or '' )
+        self.cdata.append( _is_cdata( cdata, self.text_flags ) )
+        self.translatable.append(
+            _is_translatable( translatable, self.text_flags )
+        )
+        self.english.append( english )
+        # Footer rows after a blank key, e.g., notes, may hold numbers
+        self.english_ios.append(
+            RE_FMT_SPEC.sub( '', english ) if isinstance( english, str )
+            else english
+        )
+        self._shared_digest = None
+
+        for col, vals in self.langs.items():
+            vals.append( row[col - 1] )
+
+    def finish(self):
         """
-        Read locale data: codes, and names
+        Called once all rows are appended
         """
-        if not self._is_readable_file( JSON_LOCALE_FILE_NAME ):
-            msg = '"{} is not a readable file'.format(
-                JSON_LOCALE_FILE_NAME
-            )
-            logging.error( msg )
-            raise ValueError( msg )
+        pass
 
-        with open( JSON_LOCALE_FILE_NAME, 'r' ) as finp:
-            try:
-                vals = json.loads( finp.read() )
+    def last_langs(self):
+        """
+        Returns a list of (column index, translation) of the last row, for
+        each language column
+        """
+        return [(col, vals[-1]) for col, vals in self.langs.items()]
 
-                locale_codes = [d['code'] for d in vals]
-                locale_names = [d['name'] for d in vals]
-                return locale_codes, locale_names
-            except ValueError:
-                raise
+    def __len__(self):
+        return len( self.keys )
 
-    def _get_locale_name(self, lang, locale_codes, locale_names):
+    def view(self, columns):
         """
-        Returns locale_name corresponding to language
+        Returns a shallow copy with only some language columns. The shared
+        columns are not copied
 
-        lang: two-character language name
-        locale_codes: locale codes from "locale.json"
-        locale_names: locale names from "locale.json". Matchs one-to-one with
-               locale_codes
+        columns: indices of language columns to keep
         """
-        if lang:
-            try:
-                idx = locale_codes.index( lang )
-                return locale_names[idx]
-            except ValueError as e:
-                msg - 'Unable to find "{}" in locale code, or an issue in '
-                'finding the locale name in locale file "{}"'.format(
-                    lang, JSON_LOCALE_FILE_NAME
-                )
-        else:
-            msg = 'Missing language name at col. "{} ({})", row "{}"'.format(
-                openpyxl.utils.cell.get_column_letter( column ), column,
-                self.json_lang_row
+        view = copy.copy( self )
+        view.langs = {col: self.langs[col] for col in columns}
+        return view
+
+    def _digest(self, *cols):
+        h = hashlib.sha256()
+        for vals in cols:
+            h.update( repr( vals ).encode( 'utf-8' ) )
+
+        return h.hexdigest()
+
+    def shared_digest(self):
+        """
+        Returns a digest of the columns shared by all languages. Computed
+        once
+        """
+        if self._shared_digest is None:
+            self._shared_digest = self._digest(
+                self.keys, self.cdata, self.translatable, self.english
             )
-            raise ValueError( msg )
 
-    def _write_json_out_file(
-            self, data, path, zoutp, lang, irow=None, column=None
-    ):
+        return self._shared_digest
+
+    def lang_digest(self, column):
         """
-        Writes the iOS JSON output file
+        Returns a digest of the translations in one language column
+        """
+        return self._digest( self.langs[column] )
 
-        path: path to output file. If zoutp is not None, this is added to the
-              .zip file, and thn deleted
-        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
-               written directly to the file system
-        lang: Language name
-        irow: Row number. Can be None, in which case it is not used in info
-              message
-        column: numeric index of column. Can be None, in which case it is not
-              used in info message
+def _fmt_specs(txt):
+    """
+    Returns the sorted list of format specifiers, e.g., "%1$s", in text
+    """
+    if not isinstance( txt, str ) or '%' not in txt:
+        return []
+
+    return sorted( spec.strip() for spec in RE_FMT_SPEC.findall( txt ) )
+
+def _markup_balanced(txt):
+    """
+    Returns True if every markup tag in text, e.g., <b>, is closed, in order
+    """
+    if '<' not in txt:
+        return True
+
+    tags = []
+    for closing, name, empty in RE_MARKUP_TAG.findall( txt ):
+        name = name.lower()
+        if empty or name in MARKUP_VOID_TAGS:
+            continue
+
+        if not closing:
+            tags.append( name )
+        elif not tags or tags.pop() != name:
+            return False
+
+    return not tags
+
+class Validator:
+    """
+    Checks translations while they are extracted, in the same pass over the
+    rows: format specifiers in each translation are the same as in English,
+    markup is balanced, text of CDATA entries does not end CDATA, and keys
+    are unique. Issues in all workbooks are collected in one report
+    """
+    def __init__(self):
+        self.issues = []
+        self.nrows = {}
+
+    def begin(self, path, table, english_col=ENGLISH_COL, stop_on_null=True):
         """
-        with open( path, 'wb' ) as foutp:
-            foutp.write(
-                json.dumps( data, indent=4, ensure_ascii=False ).encode(
-                    'utf-8'
-                )
+        Starts checking a workbook. Issues found earlier in the same
+        workbook, e.g., in watch mode, are dropped
+
+        path: path of the workbook
+        table: TranslationTable to which rows of the workbook are added
+        english_col: column index for English
+        stop_on_null: if True, rows after the first blank key are not
+             checked, as they are not output
+        """
+        self.issues = [
+            issue for issue in self.issues if issue['path'] != path
+        ]
+        self.nrows[path] = 0
+
+        self._path = path
+        self._table = table
+        self._english_col = english_col
+        self._stop_on_null = stop_on_null
+        self._stopped = False
+        self._key_rows = {}
+        self._first_issue = len( self.issues )
+
+    def check_row(self, irow):
+        """
+        Checks the row last added to the table
+
+        irow: row no. in the workbook
+        """
+        if self._stopped:
+            return
+
+        table = self._table
+        i = len( table ) - 1
+
+        key = table.keys[i].strip()
+        if not key:
+            self._stopped = self._stop_on_null
+            return
+
+        self.nrows[self._path] += 1
+
+        first_row = self._key_rows.setdefault( key, irow )
+        if first_row != irow:
+            self._add(
+                ISSUE_DUPLICATE_KEY, irow, None, key,
+                'Key is also in row {}'.format( first_row )
             )
 
-        col_letter = '' if column is None else \
-            openpyxl.utils.cell.get_column_letter( column )
-        logging.info(
-            'Wrote {} strings in col. {} to JSON for "{}" for language '
-            '"{}"'.format( irow or '', col_letter, path, lang )
-        )
+        cdata, translatable = table.cdata[i], table.translatable[i]
+        specs = _fmt_specs( table.english[i] )
+        for col, value in table.last_langs():
+            if not value or value.__class__ is not str:
+                continue
 
-        if zoutp is not None:
-            zoutp.write( path )
+            if col != self._english_col:
+                if not translatable:
+                    # Output only for English
+                    continue
+
+                # Most text has no format specifiers, so the regular
+                # expression is skipped
+                found = _fmt_specs( value ) if specs or '%' in value else []
+                if found != specs:
+                    self._add(
+                        ISSUE_PLACEHOLDERS, irow, col, key,
+                        'Format specifiers {} differ from {} in '
+                        'English'.format( found, specs )
+                    )
 
-            try:
-                os.unlink( path )
-            except OSError as e:
-                logger.warn(
-                    'Error in deleting JSON file, "{}", after adding it to '
-                    ''.format( path, zoutp.filename )
+            if cdata and CDATA_END in value:
+                self._add(
+                    ISSUE_CDATA_END, irow, col, key,
+                    'Text of CDATA entry contains "{}"'.format( CDATA_END )
                 )
 
-class AppLangTranslate(_BaseLangTranslate):
-    suffix = DEF_SFX
-
-    def _is_writable_dir(self, path):
-        return os.path.isdir( path ) and os.access( path, os.W_OK )
+            if '<' in value and not _markup_balanced( value ):
+                self._add(
+                    ISSUE_MARKUP, irow, col, key, 'Markup tags are not balanced'
+                )
 
-    def __init__(
-            self, path, start_col=START_COL, end_col=0, start_row=START_ROW,
-            end_row=0, json_lang_row=JSON_LANG_ROW, xml_lang_row=XML_LANG_ROW,
-            english_col=ENGLISH_COL, xml_cdata_col=XML_CDATA_COL,
-            xml_key_col=XML_KEY_COL, xml_trans_col=XML_TRANS_COL,
-            stop_on_null=True, stop_on_err=False, filesystem=False
-    ):
+    def end(self, langs):
         """
-        path: .xlsx file path. Input file in HelpinOut format
-        start_col: starting column
-        end_col: Ending column. Zero means last column
-        start_row: starting row
-        end_row: Ending row. Zero means last row
-        stop_on_bn_null: if True, output stops at first cellentry that is None.
-             This is needef because the HelpinOut Excel has blankrows at the
-             end.
-        stop_on_err: if True,processing stops if there is an error in any col.
-        filesystem: if True, individual output files are written directly to
-             the filesystem, else they are written to a .zip file
+        Ends checking a workbook
+
+        langs: dict of column index to language, for the report
         """
-        if not self._is_readable_file( path ):
-            msg = '"{} is not a readable file'.format( path )
-            logging.error( msg )
-            raise ValueError( msg )
+        for issue in self.issues[self._first_issue:]:
+            col = issue.pop( '_col' )
+            if col is not None:
+                issue['lang'] = langs.get( col )
+
+        self._table = None
+
+    def _add(self, kind, irow, col, key, msg):
+        issue = {
+            'path': self._path, 'type': kind, 'row': irow,
+            'column': None if col is None else \
+                openpyxl.utils.cell.get_column_letter( col ),
+            'key': key, 'message': msg, '_col': col,
+        }
+        self.issues.append( issue )
+
+        logging.warning(
+            '{}: row {}, col. {}, key "{}": {}'.format(
+                self._path, irow, issue['column'], key, msg
+            )
+        )
 
-        self.path = path
+    def report(self):
+        """
+        Returns the report as a dict
+        """
+        counts = {}
+        for issue in self.issues:
+            counts[issue['type']] = counts.get( issue['type'], 0 ) + 1
+
+        return {
+            'version': VALIDATION_VERSION,
+            'rows': self.nrows,
+            'counts': counts,
+            # Without column indices of workbooks that failed to load
+            'issues': [
+                {k: v for k, v in issue.items() if k != '_col'}
+                for issue in self.issues
+            ],
+        }
+
+    def write_report(self, path):
+        """
+        Writes the report as JSON
+        """
+        with open( path, 'w' ) as foutp:
+            foutp.write( json.dumps( self.report(), indent=4 ) )
 
-        self.start_col = start_col
-        self.end_col = end_col
+class _SpilledColumn:
+    """
+    Translations in one language column of a SpillTable. Iterating reads
+    them from the temporary file one chunk of rows at a time
+    """
+    def __init__(self, spill, offsets, tail):
+        self._spill = spill
+        self._offsets = offsets
+        self._tail = tail
 
-        self.start_row = start_row
-        self.end_row = end_row
+    def __iter__(self):
+        for offset in self._offsets:
+            self._spill.seek( offset )
+            yield from pickle.load( self._spill )
 
-        self.json_lang_row = json_lang_row
-        self.xml_lang_row = xml_lang_row
+        yield from self._tail
 
-        self.english_col = english_col
+class SpillTable(TranslationTable):
+    """
+    TranslationTable for memory-bounded mode. Translations are kept in
+    memory in chunks of rows up to a budget, and each full chunk is spilled
+    to a temporary file. Language columns are then iterables that read one
+    chunk at a time, so that only the working set of one language is in
+    memory when it is converted. The columns shared by all languages stay in
+    memory
+    """
+    def __init__(self, columns, budget, **kwargs):
+        """
+        columns: indices of language columns
+        budget: size in bytes of translations kept in memory
+        kwargs: other keyword arguments for TranslationTable
+        """
+        super().__init__( columns, **kwargs )
 
-        self.xml_key_col = xml_key_col
-        self.xml_cdata_col = xml_cdata_col
-        self.xml_trans_col = xml_trans_col
+        self.budget = budget
 
-        self.stop_on_null = stop_on_null
-        self.stop_on_err = stop_on_err
+        self._spill = None
+        self._offsets = {col: [] for col in columns}
+        self._size = 0
 
-        self.filesystem = filesystem
+    def append(self, row):
+        # Spilled before the row is added, so that the last row is always
+        # in memory
+        if self._size > self.budget:
+            self._spill_chunk()
 
-        self._set_log_level( DEF_LOG_LEVEL  )
+        super().append( row )
 
-        msg = 'Reading from: "{}". Settings are:\n'
-        '\tCols={}.{}'
-        '\tRows={},{},\n'
-        '\tJSON lang. rows={}\n'
-        '\tXML lang. rows={}\n'.format(
-            self.path, self.start_col, self.end_col, self.start_row,
-            self.end_row, self.json_lang_row, self.xml_lang_row
+        self._size += sum(
+            sys.getsizeof( row[col - 1] ) for col in self._offsets
         )
-        logging.info( msg )
 
-    def _set_log_level(self, level):
+    def _spill_chunk(self):
         """
-        sets the log levelin the configuration for the "logging" module.
+        Writes the translations in memory to the temporary file, and frees
+        them
         """
-        val = getattr( logging, level.upper(), None )
-        if val is None:
-            raise ValueError( 'Invalid log level "{}"'.format( level ) )
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile()
 
-        logging.info( 'Setting log. level to: "{}" ({})'.format( level, val ) )
-        logging.basicConfig( level=val )
+        for col, vals in self.langs.items():
+            self._offsets[col].append( self._spill.tell() )
+            pickle.dump( vals, self._spill, protocol=pickle.HIGHEST_PROTOCOL )
+            self.langs[col] = []
 
-    def _cdata(self, txt):
-        """
-        Wraps text in CDATA tags
+        self._size = 0
 
-        txtL text of entry
+    def finish(self):
         """
-        return '<![CDATA[{}]]>'.format( txt.replace( '\n', '<br/>' ) )
+        Makes language columns iterables over the spilled chunks, if any, and
+        the rows still in memory
+        """
+        if self._spill is None:
+            return
 
-    def _col_to_json(self, column, locale_codes, locale_names, zoutp=None):
+        self.langs = {
+            col: _SpilledColumn( self._spill, self._offsets[col], vals )
+            for col, vals in self.langs.items()
+        }
+
+    def lang_digest(self, column):
         """
-        Writes translated strings from one column to JSON
+        Returns a digest of the translations in one language column, the
+        same as that of TranslationTable, without reading the whole column
+        into memory
+        """
+        h = hashlib.sha256( b'[' )
+        for i, val in enumerate( self.langs[column] ):
+            if i:
+                h.update( b', ' )
+            h.update( repr( val ).encode( 'utf-8' ) )
 
-        column: numeric index of column
-        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
-               written directly to the file system
-        locale_codes: locale codes from "locale.json"
-        locale_names: locale names from "locale.json". Matchs one-to-one with
-               locale_codes
+        h.update( b']' )
+        return h.hexdigest()
+
+class SpilledStrings:
+    """
+    List of strings kept in a temporary file, for memory-bounded mode. Only
+    the offset of each string is in memory. All strings are appended before
+    any is read
+    """
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._offsets = array.array( 'q', [0] )
+
+    def append(self, txt):
+        self._offsets.append(
+            self._offsets[-1] + self._file.write( txt.encode( 'utf-8' ) )
+        )
+
+    def __getitem__(self, i):
+        start = self._offsets[i]
+        self._file.seek( start )
+        return self._file.read( self._offsets[i + 1] - start ).decode(
+            'utf-8'
+        )
+
+    def __len__(self):
+        return len( self._offsets ) - 1
+
+    def close(self):
+        self._file.close()
+
+# Namespaces, and names of parts in .xlsx files
+XLSX_NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XLSX_NS_REL = \
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XLSX_NS_PKG_REL = \
+    'http://schemas.openxmlformats.org/package/2006/relationships'
+XLSX_NS_CONTENT_TYPES = \
+    'http://schemas.openxmlformats.org/package/2006/content-types'
+XLSX_CONTENT_TYPE_STRINGS = 'application/vnd.openxmlformats-officedocument.' \
+    'spreadsheetml.sharedStrings+xml'
+XLSX_REL_OFFICE_DOC = XLSX_NS_REL + '/officeDocument'
+XLSX_PART_CONTENT_TYPES = '[Content_Types].xml'
+XLSX_PART_RELS = '_rels/.rels'
+XLSX_PART_WORKBOOK = 'xl/workbook.xml'
+XLSX_PART_STYLES = 'xl/styles.xml'
+
+def _xlsx_tag(name, ns=XLSX_NS_MAIN):
+    return '{{{}}}{}'.format( ns, name )
+
+XLSX_TAG_C = _xlsx_tag( 'c' )
+XLSX_TAG_F = _xlsx_tag( 'f' )
+XLSX_TAG_IS = _xlsx_tag( 'is' )
+XLSX_TAG_R = _xlsx_tag( 'r' )
+XLSX_TAG_ROW = _xlsx_tag( 'row' )
+XLSX_TAG_SI = _xlsx_tag( 'si' )
+XLSX_TAG_T = _xlsx_tag( 't' )
+XLSX_TAG_V = _xlsx_tag( 'v' )
+
+def _xlsx_text(elem):
+    """
+    Returns the text of a shared, or inline string, stripped of formatting,
+    and of phonetic runs
+    """
+    parts = []
+    for child in elem:
+        if child.tag == XLSX_TAG_T:
+            if child.text is not None:
+                parts.append( child.text )
+        elif child.tag == XLSX_TAG_R:
+            t = child.find( XLSX_TAG_T )
+            if t is not None and t.text is not None:
+                parts.append( t.text )
+
+    return ''.join( parts )
+
+def _xlsx_number(val):
+    if '.' in val or 'E' in val or 'e' in val:
+        return float( val )
+
+    return int( val )
+
+class XlsxReader:
+    """
+    Reads cell values from an .xlsx file directly, without the object model
+    of openpyxl. The workbook, and shared strings are read when opened, and
+    the active sheet is stream-parsed with lxml whenever its rows are
+    iterated. Has the subset of the interface of a read-only
+    openpyxl.Workbook used here, and gives the same cell values, including
+    for dates, and formulas
+    """
+    def __init__(self, path, budget=None):
         """
-        lang = self.ws.cell( column=column, row=self.json_lang_row )
+        path: path to the .xlsx file
+        budget: either None, or the memory budget in bytes, in
+             memory-bounded mode. Shared strings are then kept in a
+             temporary file if they are larger
+        """
+        self.path = path
+        self.budget = budget
+        self.archive = zipfile.ZipFile( path, 'r' )
 
         try:
-            locale_name = self._get_locale_name(
-                lang.value, locale_codes, locale_names
-            )
-        except ValueError:
+            self._read_workbook()
+            self._read_shared_strings()
+            self._read_styles()
+
+            self.active = XlsxSheet( self )
+        except:
+            self.archive.close()
             raise
 
-        data = { 'Locale_Code': locale_name } 
+    def _read_xml(self, name):
+        return lxml.etree.fromstring( self.archive.read( name ) )
 
-        for i, row in enumerate(
-                range( self.start_row, self.ws.max_row + 1 ), 1
+    def _read_workbook(self):
+        """
+        Finds the active sheet, and the date system, in the workbook part
+        """
+        wb_part = XLSX_PART_WORKBOOK
+        if XLSX_PART_RELS in self.archive.NameToInfo:
+            for rel in self._read_xml( XLSX_PART_RELS ):
+                if rel.get( 'Type' ) == XLSX_REL_OFFICE_DOC:
+                    wb_part = rel.get( 'Target' ).lstrip( '/' )
+                    break
+
+        root = self._read_xml( wb_part )
+
+        pr = root.find( _xlsx_tag( 'workbookPr' ) )
+        self.epoch = openpyxl.utils.datetime.WINDOWS_EPOCH
+        if pr is not None and \
+           pr.get( 'date1904', '' ).lower() in ('1', 'true'):
+            self.epoch = openpyxl.utils.datetime.CALENDAR_MAC_1904
+
+        active = 0
+        for view in root.iterfind(
+                '{}/{}'.format(
+                    _xlsx_tag( 'bookViews' ), _xlsx_tag( 'workbookView' )
+                )
         ):
-            name = self.ws.cell(
-                column=self.xml_key_col, row=row
-            ).value or ''
-            if self.stop_on_null and not name:
+            if view.get( 'activeTab' ) is not None:
+                active = int( view.get( 'activeTab' ) )
+                break
+
+        # Sheets without a relationship are ignored, as by openpyxl
+        rel_ids = [
+            sheet.get( _xlsx_tag( 'id', XLSX_NS_REL ) ) for sheet in
+            root.iterfind(
+                '{}/{}'.format( _xlsx_tag( 'sheets' ), _xlsx_tag( 'sheet' ) )
+            )
+        ]
+        rel_ids = [rel_id for rel_id in rel_ids if rel_id]
+        if active >= len( rel_ids ):
+            raise ValueError(
+                'No active sheet in "{}"'.format( self.path )
+            )
+
+        folder = posixpath.dirname( wb_part )
+        rels_part = posixpath.join(
+            folder, '_rels', posixpath.basename( wb_part ) + '.rels'
+        )
+        for rel in self._read_xml( rels_part ):
+            if rel.get( 'Id' ) != rel_ids[active]:
+                continue
+
+            if 'chartsheet' in rel.get( 'Type', '' ):
+                raise ValueError(
+                    'The active sheet in "{}" is a chart sheet'.format(
+                        self.path
+                    )
+                )
+
+            target = rel.get( 'Target' )
+            if target.startswith( '/' ):
+                self.sheet_part = target[1:]
+            else:
+                self.sheet_part = posixpath.normpath(
+                    posixpath.join( folder, target )
+                )
+            break
+        else:
+            raise ValueError(
+                'Missing active sheet in "{}"'.format( self.path )
+            )
+
+    def _read_shared_strings(self):
+        """
+        Reads the shared strings table, if any, stream-parsing it. In
+        memory-bounded mode, a large table is kept in a temporary file
+        """
+        self.shared_strings = []
+
+        ct = self._read_xml( XLSX_PART_CONTENT_TYPES )
+        for override in ct.iterfind(
+                _xlsx_tag( 'Override', XLSX_NS_CONTENT_TYPES )
+        ):
+            if override.get( 'ContentType' ) == XLSX_CONTENT_TYPE_STRINGS:
+                part = override.get( 'PartName' )[1:]
                 break
+        else:
+            return
+
+        if self.budget is not None and self.archive.getinfo( part ).file_size \
+           > self.budget * MEMORY_SPILL_FRACTION:
+            self.shared_strings = SpilledStrings()
+
+        with self.archive.open( part ) as finp:
+            for _, si in lxml.etree.iterparse(
+                    finp, events=('end',), tag=XLSX_TAG_SI
+            ):
+                # As openpyxl does
+                self.shared_strings.append(
+                    _xlsx_text( si ).replace( 'x005F_', '' )
+                )
+
+                si.clear( keep_tail=True )
+                while si.getprevious() is not None:
+                    del si.getparent()[0]
+
+    def _read_styles(self):
+        """
+        Finds the cell styles with date, and time number formats, in which
+        numbers are dates, and times
+        """
+        self.date_formats = set()
+        self.timedelta_formats = set()
+
+        if XLSX_PART_STYLES not in self.archive.NameToInfo:
+            return
+
+        root = self._read_xml( XLSX_PART_STYLES )
+
+        custom = {
+            int( fmt.get( 'numFmtId' ) ): fmt.get( 'formatCode' )
+            for fmt in root.iterfind(
+                '{}/{}'.format( _xlsx_tag( 'numFmts' ), _xlsx_tag( 'numFmt' ) )
+            )
+        }
+
+        for idx, xf in enumerate(
+                root.iterfind(
+                    '{}/{}'.format( _xlsx_tag( 'cellXfs' ), _xlsx_tag( 'xf' ) )
+                )
+        ):
+            fmt_id = int( xf.get( 'numFmtId', 0 ) )
+            fmt = custom[fmt_id] if fmt_id in custom else \
+                openpyxl.styles.numbers.builtin_format_code( fmt_id )
+
+            if openpyxl.styles.numbers.is_date_format( fmt ):
+                self.date_formats.add( idx )
+
+            if openpyxl.styles.numbers.is_timedelta_format( fmt ):
+                self.timedelta_formats.add( idx )
+
+    def close(self):
+        self.archive.close()
+
+        if isinstance( self.shared_strings, SpilledStrings ):
+            self.shared_strings.close()
+
+class XlsxSheet:
+    """
+    The active sheet of an XlsxReader. Has the subset of the interface of
+    openpyxl's ReadOnlyWorksheet used here: the dimensions, and iter_rows()
+    for values only
+    """
+    min_row = min_column = 1
+    max_row = max_column = None
+
+    def __init__(self, reader):
+        self.reader = reader
+
+        self._read_dimensions()
+
+    def _read_dimensions(self):
+        """
+        Reads the dimensions recorded in the sheet, if any, which come before
+        the cells
+        """
+        with self.reader.archive.open( self.reader.sheet_part ) as finp:
+            for _, elem in lxml.etree.iterparse( finp, events=('start',) ):
+                if elem.tag == _xlsx_tag( 'dimension' ):
+                    ref = elem.get( 'ref' )
+                    if ref:
+                        self.min_column, self.min_row, self.max_column, \
+                            self.max_row = \
+                                openpyxl.utils.cell.range_boundaries( ref )
+                    break
+
+                if elem.tag == _xlsx_tag( 'sheetData' ):
+                    break
+
+    def calculate_dimension(self, force=False):
+        """
+        Calculates the dimensions, if they are not recorded in the sheet,
+        from the last row with cells, and the last cell in any row
+        """
+        if self.max_row and self.max_column:
+            return
+
+        if not force:
+            raise ValueError(
+                'Worksheet is unsized, use calculate_dimension(force=True)'
+            )
+
+        max_row = max_col = 0
+        for irow, cells in self._iter_cells( values=False ):
+            if cells:
+                max_row = irow
+                max_col = max( max_col, cells[-1][0] )
+
+        self.max_row, self.max_column = max_row, max_col
+
+    def _iter_cells(self, values=True):
+        """
+        Generator over the rows of the sheet, in a single streaming pass.
+        Yields tuples of (row no., list of (column no., value)) for rows in
+        the sheet, which may have gaps
+
+        values: if False, values are not read, and are all None
+        """
+        reader = self.reader
+        shared_strings = reader.shared_strings
+        date_formats = reader.date_formats
+        shared_formulae = {}
+
+        # Column numbers for column letters seen so far
+        col_nums = {}
+
+        irow = 0
+        with reader.archive.open( reader.sheet_part ) as finp:
+            for _, row in lxml.etree.iterparse(
+                    finp, events=('end',), tag=XLSX_TAG_ROW
+            ):
+                r = row.get( 'r' )
+                irow = irow + 1 if r is None else int( float( r ) )
+
+                cells = []
+                icol = 0
+                for c in row.iterchildren( XLSX_TAG_C ):
+                    ref = c.get( 'r' )
+                    if ref is None:
+                        icol += 1
+                    else:
+                        letters = ref.rstrip( '0123456789' )
+                        icol = col_nums.get( letters )
+                        if icol is None:
+                            icol = col_nums[letters] = openpyxl.utils.cell.\
+                                column_index_from_string( letters )
+
+                    # Cells with no children have no value
+                    cells.append(
+                        (
+                            icol,
+                            self._cell_value(
+                                c, ref, shared_strings, date_formats,
+                                shared_formulae
+                            ) if values and len( c ) else None
+                        )
+                    )
+
+                yield irow, cells
+
+                row.clear( keep_tail=True )
+                while row.getprevious() is not None:
+                    del row.getparent()[0]
+
+    def _cell_value(self, c, ref, shared_strings, date_formats, shared_formulae):
+        """
+        Returns the value of a cell, as openpyxl does when formulas are not
+        replaced by their values
+        """
+        data_type = c.get( 't', 'n' )
+
+        # Children are visited directly, as find() is much slower
+        f = inline = None
+        value = ''
+        for child in c:
+            tag = child.tag
+            if tag == XLSX_TAG_V:
+                value = child.text
+            elif tag == XLSX_TAG_F:
+                f = child
+            elif tag == XLSX_TAG_IS:
+                inline = child
+
+        if f is not None:
+            return self._formula( f, ref, shared_formulae )
+
+        if data_type == 'inlineStr':
+            return None if inline is None else _xlsx_text( inline )
+
+        if not value:
+            return None
+
+        if data_type == 'n':
+            value = _xlsx_number( value )
+
+            style_id = int( c.get( 's', 0 ) )
+            if style_id in date_formats:
+                try:
+                    return openpyxl.utils.datetime.from_excel(
+                        value, self.reader.epoch,
+                        timedelta=style_id in self.reader.timedelta_formats
+                    )
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+
+            return value
+
+        if data_type == 's':
+            return shared_strings[int( value )]
+
+        if data_type == 'b':
+            return bool( int( value ) )
+
+        if data_type == 'd':
+            return openpyxl.utils.datetime.from_ISO8601( value )
+
+        return value
+
+    def _formula(self, f, ref, shared_formulae):
+        """
+        Returns a formula, as openpyxl does
+        """
+        value = '=' + (f.text or '')
+
+        formula_type = f.get( 't' )
+        if formula_type == 'array':
+            return openpyxl.worksheet.formula.ArrayFormula(
+                ref=f.get( 'ref' ), text=value
+            )
+
+        if formula_type == 'shared':
+            idx = f.get( 'si' )
+            if idx in shared_formulae:
+                return shared_formulae[idx].translate_formula( ref )
+
+            if value != '=':
+                shared_formulae[idx] = openpyxl.formula.translate.Translator(
+                    value, ref
+                )
+
+        elif formula_type == 'dataTable':
+            return openpyxl.worksheet.formula.DataTableFormula( **f.attrib )
+
+        return value
+
+    def iter_rows(
+            self, min_row=None, max_row=None, min_col=None, max_col=None,
+            values_only=True
+    ):
+        """
+        Generator over rows of cell values from min_row to max_row, as
+        tuples of values from min_col to max_col, as for openpyxl's
+        ReadOnlyWorksheet. Missing cells, and rows are None. Only values are
+        supported
+        """
+        if not values_only:
+            raise ValueError( 'Only values of cells can be read' )
+
+        min_col = min_col or 1
+        min_row = min_row or 1
+        max_col = max_col or self.max_column
+        max_row = max_row or self.max_row
+
+        empty_row = ()
+        if max_col is not None:
+            empty_row = (None,) * (max_col + 1 - min_col)
+
+        counter = min_row
+        irow = 1
+        for irow, cells in self._iter_cells():
+            if max_row is not None and irow > max_row:
+                break
+
+            # Some rows are missing
+            for _ in range( counter, irow ):
+                counter += 1
+                yield empty_row
+
+            if counter <= irow:
+                counter += 1
+                yield self._row_values( cells, min_col, max_col )
+
+        if max_row is not None and max_row < irow:
+            for _ in range( counter, max_row + 1 ):
+                yield empty_row
+
+    def _row_values(self, cells, min_col, max_col):
+        if not cells and not max_col:
+            return ()
+
+        max_col = max_col or cells[-1][0]
+
+        values = [None] * (max_col + 1 - min_col)
+        for icol, value in cells:
+            if min_col <= icol <= max_col:
+                values[icol - min_col] = value
+
+        return tuple( values )
+
+class TableReader:
+    """
+    Reads a plain-text translations table with the same layout of rows, and
+    columns as the .xlsx file. Has the subset of the interface of openpyxl's
+    read-only Workbook used here: the active sheet, and close(). Blank cells
+    are None, as in a workbook. Subclasses implement _read_rows()
+    """
+    # Flag cells are text, e.g., "true", or "no", and are parsed as such.
+    # They are not in .xlsx files, where existing text flags keep their
+    # meaning
+    text_flags = True
+
+    def __init__(self, path, budget=None):
+        """
+        path: path to the file
+        budget: either None, or the memory budget in bytes, in
+             memory-bounded mode. Readers that can stream larger files then
+             read rows whenever they are iterated, instead of keeping them
+        """
+        self.path = path
+        self.budget = budget
+
+        self.active = self._read_sheet()
+
+    def _read_sheet(self):
+        """
+        Returns the TableSheet
+        """
+        return TableSheet( self._read_rows() )
+
+    def _read_rows(self):
+        """
+        Returns the rows of the table as a list of tuples of cell values
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class CsvTableReader(TableReader):
+    """
+    Reads a CSV file. All values are text, as exported from a spreadsheet
+    """
+    delimiter = ','
+
+    def _read_sheet(self):
+        if self.budget is None or \
+           os.path.getsize( self.path ) <= self.budget * MEMORY_SPILL_FRACTION:
+            return super()._read_sheet()
+
+        # Streamed: the dimensions are found in a first pass
+        max_row = max_col = 0
+        for max_row, row in enumerate( self._iter_rows(), 1 ):
+            max_col = max( max_col, len( row ) )
+
+        return TableSheet( self._iter_rows, max_row=max_row, max_col=max_col )
+
+    def _iter_rows(self):
+        """
+        Generator over the rows of the file, as tuples of cell values
+        """
+        # "utf-8-sig" skips the byte order mark written by some spreadsheets
+        with open( self.path, 'r', encoding='utf-8-sig', newline='' ) as finp:
+            for row in csv.reader( finp, delimiter=self.delimiter ):
+                yield tuple( val or None for val in row )
+
+    def _read_rows(self):
+        return list( self._iter_rows() )
+
+class TsvTableReader(CsvTableReader):
+    """
+    Reads a TSV file, i.e., a CSV file with tabs as delimiters
+    """
+    delimiter = '\t'
+
+class JsonTableReader(TableReader):
+    """
+    Reads a JSON file containing a list of rows, each a list of cell values.
+    Blank cells are either null, or "". The whole file is read into
+    memory, even in memory-bounded mode
+    """
+    def _read_rows(self):
+        with open( self.path, 'rb' ) as finp:
+            data = json.load( finp )
+
+        if not isinstance( data, list ) or \
+           not all( isinstance( row, list ) for row in data ):
+            raise ValueError(
+                '"{}" is not a list of rows, each a list of cell '
+                'values'.format( self.path )
+            )
+
+        return [
+            tuple( None if val == '' else val for val in row )
+            for row in data
+        ]
+
+class TableSheet:
+    """
+    The rows of a TableReader. Has the subset of the interface of openpyxl's
+    ReadOnlyWorksheet used here: the dimensions, and iter_rows() for values
+    only
+    """
+    min_row = min_column = 1
+
+    def __init__(self, rows, max_row=None, max_col=None):
+        """
+        rows: either a list of tuples of cell values, or a function that
+             returns an iterator over them, called whenever rows are
+             iterated
+        max_row, max_col: dimensions of the rows, if rows is a function.
+             Found from the list otherwise
+        """
+        self.rows = rows
+
+        if not callable( rows ):
+            max_row = len( rows )
+            max_col = max( map( len, rows ), default=1 )
+
+        self.max_row = max_row or 1
+        self.max_column = max_col or 1
+
+    def calculate_dimension(self, force=False):
+        pass
+
+    def iter_rows(
+            self, min_row=None, max_row=None, min_col=None, max_col=None,
+            values_only=True
+    ):
+        """
+        Generator over rows of cell values from min_row to max_row, as
+        tuples of values from min_col to max_col, as for openpyxl's
+        ReadOnlyWorksheet. Missing cells, and rows are None
+        """
+        if not values_only:
+            raise ValueError( 'Only values of cells can be read' )
+
+        min_col = min_col or 1
+        min_row = min_row or 1
+        max_col = max_col or self.max_column
+        max_row = max_row or self.max_row
+
+        ncols = max_col + 1 - min_col
+        empty_row = (None,) * ncols
+
+        rows = self.rows() if callable( self.rows ) else iter( self.rows )
+
+        irow = min_row - 1
+        for irow, row in enumerate(
+                itertools.islice( rows, min_row - 1, max_row ), min_row
+        ):
+            row = row[min_col - 1:max_col]
+            if len( row ) < ncols:
+                row += empty_row[len( row ):]
+
+            yield row
+
+        # Missing rows
+        for _ in range( irow, max_row ):
+            yield empty_row
+
+# Readers of plain-text input formats. Add a TableReader subclass here to
+# support another format
+INPUT_SOURCES = {
+    IN_FMT_CSV: CsvTableReader,
+    IN_FMT_TSV: TsvTableReader,
+    IN_FMT_JSON: JsonTableReader,
+}
+
+class LocaleRegistry:
+    """
+    Locale codes, and names from a locale file, e.g., "locale.json", indexed
+    by code. Lookups fall back from more specific to less specific codes in
+    the BCP-47 style, e.g., "hi_IN" to "hi", or "zh-Hant-XX" to "zh_Hant"
+    """
+    def __init__(self, path):
+        """
+        path: path to the locale file: a JSON list of objects with "code",
+             and "name" keys
+        """
+        self.path = path
+
+        with open( path, 'r' ) as finp:
+            vals = json.loads( finp.read() )
+
+        self.names = {}
+        for d in vals:
+            self.names.setdefault( d['code'], d['name'] )
+
+        # Case-insensitive index, for codes such as "zh-hans"
+        self._lower_codes = {}
+        for code in self.names:
+            self._lower_codes.setdefault( code.lower(), code )
+
+    def resolve(self, lang):
+        """
+        Returns the code in the registry for a language code, falling back to
+        less specific codes, or None if there is no match
+
+        lang: language code, e.g., "hi", "hi_IN", "hi-IN", or "zh-Hans"
+        """
+        if lang in self.names:
+            return lang
+
+        subtags = lang.replace( '-', '_' ).split( '_' )
+        while subtags:
+            code = self._lower_codes.get( '_'.join( subtags ).lower() )
+            if code is not None:
+                return code
+
+            subtags.pop()
+
+        return None
+
+    def get_name(self, lang):
+        """
+        Returns the locale name for a language code, or None if there is no
+        match even after fallback
+        """
+        code = self.resolve( lang )
+        return None if code is None else self.names[code]
+
+    def __contains__(self, lang):
+        return self.resolve( lang ) is not None
+
+    def __len__(self):
+        return len( self.names )
+
+# Locale registries read so far, by path
+_locale_registries = {}
+
+def get_locale_registry(path=None):
+    """
+    Returns the LocaleRegistry for a locale file. Each file is read only once
+    per process
+
+    path: path to the locale file. Default is "locale.json" in this package,
+         whatever the current directory
+    """
+    if path is None:
+        path = os.path.join(
+            os.path.dirname( os.path.abspath( __file__ ) ),
+            JSON_LOCALE_FILE_NAME
+        )
+
+    registry = _locale_registries.get( path )
+    if registry is None:
+        if not os.path.isfile( path ) or not os.access( path, os.R_OK ):
+            msg = '"{} is not a readable file'.format( path )
+            logging.error( msg )
+            raise ValueError( msg )
+
+        registry = _locale_registries[path] = LocaleRegistry( path )
+
+    return registry
+
+class Profiler:
+    """
+    Records wall time, CPU time, and the peak memory allocated, as traced by
+    tracemalloc, for each stage of a conversion, in total, and for each item,
+    i.e., language column, or language. Optionally also collects cProfile
+    statistics. Stages are timed in this process only, so conversions being
+    profiled do not use worker processes. Memory is traced only between
+    start(), and stop(), so stages are timed with less overhead otherwise
+    """
+    def __init__(self, stats=False):
+        """
+        stats: if True, cProfile statistics are also collected between
+             start(), and stop()
+        """
+        self.stages = {}
+        self.items = {}
+        self.total = None
+
+        self._cprofile = cProfile.Profile() if stats else None
+        self._frames = []
+        self._start = None
+        self._own_tracing = False
+
+    def start(self):
+        """
+        Starts tracing memory allocations, and the cProfile statistics, if
+        any
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracing = True
+
+        self._start = time.perf_counter(), time.process_time()
+        self._frames.append( self._new_frame() )
+
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop(self):
+        """
+        Stops tracing, and records the total for the run
+        """
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+        self.total = self._end_frame( self._frames.pop() )
+
+        if self._own_tracing:
+            tracemalloc.stop()
+            self._own_tracing = False
+
+    def _new_frame(self):
+        """
+        Returns a record of the start of a stage: the wall time, CPU time,
+        memory allocated, and the peak memory allocated so far in the stage
+        """
+        current = tracemalloc.get_traced_memory()[0]
+        return [time.perf_counter(), time.process_time(), current, current]
+
+    def _end_frame(self, frame):
+        """
+        Returns a tuple of (wall time, CPU time, peak memory) of a stage that
+        just ended, whose start was recorded by _new_frame()
+        """
+        wall, cpu, current, peak = frame
+        peak = max( peak, tracemalloc.get_traced_memory()[1] )
+
+        if self._frames:
+            # The peak of an enclosing stage includes that of this one
+            self._frames[-1][3] = max( self._frames[-1][3], peak )
+
+        return (
+            time.perf_counter() - wall, time.process_time() - cpu,
+            peak - current
+        )
+
+    @contextlib.contextmanager
+    def stage(self, name, item=None):
+        """
+        Context manager that records one stage. Stages may be nested
+
+        name: name of the stage, e.g., "json_serialize"
+        item: either None, or the item, e.g., column letter, or language
+             that the stage is for
+        """
+        if self._frames:
+            # Peak so far in the enclosing stage, as the peak is reset below
+            self._frames[-1][3] = max(
+                self._frames[-1][3], tracemalloc.get_traced_memory()[1]
+            )
+
+        tracemalloc.reset_peak()
+        self._frames.append( self._new_frame() )
+        try:
+            yield
+        finally:
+            wall, cpu, peak = self._end_frame( self._frames.pop() )
+
+            records = [self.stages]
+            if item is not None:
+                records.append( self.items.setdefault( item, {} ) )
+
+            for record in records:
+                stat = record.setdefault(
+                    name, { 'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_mem': 0 }
+                )
+                stat['calls'] += 1
+                stat['wall'] += wall
+                stat['cpu'] += cpu
+                stat['peak_mem'] = max( stat['peak_mem'], peak )
+
+    def report(self):
+        """
+        Returns the report as a dict. Times are in seconds, and memory in
+        bytes
+        """
+        report = { 'version': PROFILE_VERSION }
+        if self.total is not None:
+            wall, cpu, peak = self.total
+            report['total'] = { 'wall': wall, 'cpu': cpu, 'peak_mem': peak }
+
+        report['stages'] = self.stages
+        report['items'] = self.items
+
+        return report
+
+    def write_report(self, path):
+        """
+        Writes the report as JSON
+        """
+        with open( path, 'w' ) as foutp:
+            foutp.write( json.dumps( self.report(), indent=4 ) )
+
+    def dump_stats(self, path):
+        """
+        Writes the cProfile statistics, if any, to a file that can be read
+        with the "pstats" module, or tools such as snakeviz
+        """
+        if self._cprofile is None:
+            raise ValueError( 'cProfile statistics were not collected' )
+
+        self._cprofile.dump_stats( path )
+
+class _BaseLangTranslate:
+    # Directory in which output files are written. '' is the current
+    # directory
+    out_dir = ''
+
+    # Either None, or a Profiler recording the stages of conversions
+    profiler = None
+
+    # If True, iOS JSON is written compactly, with no whitespace
+    compact = False
+
+    def _is_readable_file(self, path):
+        return os.path.isfile( path ) and os.access( path, os.R_OK )
+
+    def _is_writable_dir(self, path):
+        return os.path.isdir( path ) and os.access( path, os.W_OK )
+
+    def _out_json_file_name(self, lang):
+        return lang.lower() + '.json'
+
+    def _out_xml_file_name(self, lang):
+        return lang.lower(), XML_LANG_FILE_NAME
+
+    def set_log_level(self, level):
+        """
+        Public method to sey logging level.
+
+        level: string defining level as per the "logging" module. One of
+               "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"
+        """
+        self._set_log_level( level )
+
+    def _set_log_level(self, level):
+        """
+        sets the log levelin the configuration for the "logging" module.
+        """
+        val = getattr( logging, level.upper(), None )
+        if val is None:
+            raise ValueError( 'Invalid log level "{}"'.format( level ) )
+
+        logging.info( 'Setting log. level to: "{}" ({})'.format( level, val ) )
+        logging.basicConfig( level=val )
+        # basicConfig() does nothing if logging is already configured
+        logging.getLogger().setLevel( val )
+
+    def _stage(self, name, item=None):
+        """
+        Returns a context manager that records a stage in the profiler, if
+        any. Arguments are as for Profiler.stage()
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+
+        return self.profiler.stage( name, item=item )
+
+    def _out_path(self, path):
+        """
+        Returns the location in the filesystem of an output path, which is
+        relative to the output directory
+        """
+        return os.path.join( self.out_dir, path )
+
+    def _get_zip_outfile(self, xml=False):
+        if not self.filesystem:
+            return zipfile.ZipFile(
+                self._out_path(
+                    XML_ZIP_FILE_NAME if xml else JSON_ZIP_FILE_NAME
+                ), mode='w'
+            )
+
+    def _read_locale_data(self):
+        """
+        Returns the locale registry, read from "locale.json" in this package
+        only once per process
+        """
+        return get_locale_registry()
+
+    def _get_locale_name(self, lang, locales):
+        """
+        Returns locale_name corresponding to language
+
+        lang: language code, e.g., "hi", or "hi_IN"
+        locales: LocaleRegistry from "locale.json"
+        """
+        if not lang:
+            raise ValueError( 'Missing language name' )
+
+        name = locales.get_name( lang )
+        if name is None:
+            msg = (
+                'Unable to find "{}" in locale codes in locale file '
+                '"{}"'.format( lang, locales.path )
+            )
+            raise ValueError( msg )
+
+        return name
+
+    def _json_dumps(self, data):
+        """
+        Returns iOS JSON for data, as UTF-8 encoded bytes. Compact JSON is
+        serialized with orjson, if installed
+        """
+        if not self.compact:
+            return json.dumps(
+                data, indent=JSON_INDENT, ensure_ascii=False
+            ).encode( 'utf-8' )
+
+        if orjson is not None:
+            return orjson.dumps( data )
+
+        return json.dumps(
+            data, separators=(',', ':'), ensure_ascii=False
+        ).encode( 'utf-8' )
+
+    def _json_dump(self, data, foutp):
+        """
+        Writes iOS JSON for data to a file-like object opened for writing
+        bytes. The output is the same as that of _json_dumps(), but indented
+        JSON is encoded, and written piece by piece, with no copy of the
+        whole of it
+        """
+        if self.compact:
+            # orjson returns bytes directly, and the standard library encoder
+            # is fastest for the whole string at once
+            foutp.write( self._json_dumps( data ) )
+            return
+
+        wrapper = io.TextIOWrapper( foutp, encoding='utf-8', newline='' )
+        try:
+            json.dump( data, wrapper, indent=JSON_INDENT, ensure_ascii=False )
+            wrapper.flush()
+        finally:
+            # Leave foutp open for the caller
+            wrapper.detach()
+
+    def _write_json_out_file(
+            self, data, path, zoutp, lang, irow=None, column=None
+    ):
+        """
+        Writes the iOS JSON output file, streamed to the file, or to the
+        member of the .zip file
+
+        data: dict of keys to translated strings
+        path: path to output file. If zoutp is not None, this is the name of
+              the member in the .zip file
+        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
+               written directly to the file system
+        lang: Language name
+        irow: Row number. Can be None, in which case it is not used in info
+              message
+        column: numeric index of column. Can be None, in which case it is not
+              used in info message
+        """
+        with self._open_out_file( path, zoutp ) as foutp:
+            self._json_dump( data, foutp )
+
+        self._log_json_written( path, lang, irow=irow, column=column )
+
+    def _write_json_out_bytes(
+            self, buf, path, zoutp, lang, irow=None, column=None
+    ):
+        """
+        Writes the iOS JSON output file from already serialized JSON
+
+        buf: JSON as UTF-8 encoded bytes
+        Other arguments are as for _write_json_out_file()
+        """
+        self._write_out_file( path, buf, zoutp )
+
+        self._log_json_written( path, lang, irow=irow, column=column )
+
+    def _log_json_written(self, path, lang, irow=None, column=None):
+        col_letter = '' if column is None else \
+            openpyxl.utils.cell.get_column_letter( column )
+        logging.info(
+            'Wrote {} strings in col. {} to JSON for "{}" for language '
+            '"{}"'.format( irow or '', col_letter, path, lang )
+        )
+
+    def _open_out_file(self, path, zoutp):
+        """
+        Opens one output file for writing bytes. Arguments are as for
+        _write_out_file(). If zoutp is not None, the file is a member of the
+        .zip file, written to as a stream
+        """
+        if zoutp is not None:
+            return zoutp.open( path, mode='w' )
+
+        path = self._out_path( path )
+
+        try:
+            dir = os.path.dirname( path )
+
+            if dir and not self._is_writable_dir( dir ):
+                os.makedirs( dir, exist_ok=True )
+        except OSError:
+            raise
+
+        return open( path, 'wb' )
+
+    def _write_out_file(self, path, buf, zoutp):
+        """
+        Writes one output file
+
+        path: path to output file, which may be inside a sub-directory. If
+              zoutp is not None, this is the name of the member in the .zip
+              file
+        buf: contents of the file as bytes
+        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
+               written directly to the file system, else buf is written
+               directly to the .zip file, with no intermediate file
+        """
+        if zoutp is not None:
+            zoutp.writestr( path, buf )
+            return
+
+        with self._open_out_file( path, zoutp ) as foutp:
+            foutp.write( buf )
+
+class AppLangTranslate(_BaseLangTranslate):
+    suffix = DEF_SFX
+
+    def __init__(
+            self, path, start_col=START_COL, end_col=0, start_row=START_ROW,
+            end_row=0, json_lang_row=JSON_LANG_ROW, xml_lang_row=XML_LANG_ROW,
+            english_col=ENGLISH_COL, xml_cdata_col=XML_CDATA_COL,
+            xml_key_col=XML_KEY_COL, xml_trans_col=XML_TRANS_COL,
+            stop_on_null=True, stop_on_err=False, filesystem=False, jobs=1,
+            incremental=False, out_dir='', profiler=None, compact=False,
+            engine=DEF_XLSX_ENGINE, input_fmt=None, validator=None,
+            memory_budget=None, omit_fallback=False
+    ):
+        """
+        path: input file path. Either an .xlsx file in HelpinOut format, or
+             a CSV, TSV, or JSON table with the same layout
+
+        start_col: starting column
+        end_col: Ending column. Zero means last column
+        start_row: starting row
+        end_row: Ending row. Zero means last row
+        stop_on_bn_null: if True, output stops at first cellentry that is None.
+             This is needef because the HelpinOut Excel has blankrows at the
+             end.
+        stop_on_err: if True,processing stops if there is an error in any col.
+        filesystem: if True, individual output files are written directly to
+             the filesystem, else they are written to a .zip file
+        jobs: no. of worker processes in which language columns are rendered.
+             Zero means the no. of CPUs. Output files are written in column
+             order in any case
+        incremental: if True, only columns whose input changed since the
+             previous incremental run are converted. The previous output of
+             the others is reused. Input digests are kept in a manifest file
+        out_dir: directory in which output files, and .zip files are
+             written. Created if needed. '' is the current directory
+        profiler: either None, or a Profiler in which the stages of each
+             export are recorded, for each language column. Columns are
+             then converted in this process, whatever the "jobs" setting
+        compact: if True, iOS JSON is written compactly, with no whitespace,
+             else it is indented
+        engine: engine to read the .xlsx file with, from XLSX_ENGINES:
+             "openpyxl", or "lxml", which reads the sheet XML directly, and
+             is faster. Both give the same output
+        input_fmt: format of the input file, from IN_FMTS. None means the
+             format for the file extension, or .xlsx for unknown extensions
+        validator: either None, or a Validator with which translations are
+             checked while they are read
+        memory_budget: either None, or the memory budget in bytes for
+             memory-bounded mode. Translations beyond the budget are then
+             spilled to a temporary file, and read back one language at a
+             time, and columns are converted in this process, whatever the
+             "jobs" setting. Large shared strings of .xlsx files read with
+             the "lxml" engine, and large CSV, and TSV files are not kept in
+             memory either
+        omit_fallback: if True, entries of languages other than English
+             that are missing, or the same as English are left out, and the
+             apps rely on the platform fallback to English instead. The
+             bytes saved for each output file are in "fallback_savings"
+        """
+        if not self._is_readable_file( path ):
+            msg = '"{} is not a readable file'.format( path )
+            logging.error( msg )
+            raise ValueError( msg )
+
+        if engine not in XLSX_ENGINES:
+            raise ValueError(
+                'Unknown engine "{}". Should be one of "{}"'.format(
+                    engine, XLSX_ENGINES
+                )
+            )
+
+        if input_fmt is None:
+            input_fmt = IN_FMT_EXTS.get(
+                os.path.splitext( path )[1].lower(), IN_FMT_XLSX
+            )
+        elif input_fmt not in IN_FMTS:
+            raise ValueError(
+                'Unknown input format "{}". Should be one of "{}"'.format(
+                    input_fmt, IN_FMTS
+                )
+            )
+
+        self.path = path
+
+        self.start_col = start_col
+        self.end_col = end_col
+
+        self.start_row = start_row
+        self.end_row = end_row
+
+        self.json_lang_row = json_lang_row
+        self.xml_lang_row = xml_lang_row
+
+        self.english_col = english_col
+
+        self.xml_key_col = xml_key_col
+        self.xml_cdata_col = xml_cdata_col
+        self.xml_trans_col = xml_trans_col
+
+        self.stop_on_null = stop_on_null
+        self.stop_on_err = stop_on_err
+
+        self.filesystem = filesystem
+
+        self.jobs = jobs
+
+        self.incremental = incremental
+        self._manifest = {}
+
+        self.out_dir = out_dir
+
+        self.profiler = profiler
+
+        self.compact = compact
+
+        self.engine = engine
+
+        self.input_fmt = input_fmt
+
+        self.validator = validator
+
+        self.memory_budget = memory_budget
+
+        self.omit_fallback = omit_fallback
+        # Output file paths to bytes saved with omit_fallback in the last
+        # export
+        self.fallback_savings = {}
+
+        # Temporary file of the state loaded by worker processes in an
+        # export
+        self._worker_file = None
+
+        msg = 'Reading from: "{}". Settings are:\n'
+        '\tCols={}.{}'
+        '\tRows={},{},\n'
+        '\tJSON lang. rows={}\n'
+        '\tXML lang. rows={}\n'.format(
+            self.path, self.start_col, self.end_col, self.start_row,
+            self.end_row, self.json_lang_row, self.xml_lang_row
+        )
+        logging.info( msg )
+
+    def _omits_fallback(self, column):
+        """
+        Returns True if English fallbacks are left out of the output for one
+        column
+        """
+        return self.omit_fallback and column != self.english_col
+
+    def _fallback_saving(self, xml, column):
+        """
+        Returns the no. of bytes by which the output for one column is
+        smaller with omit_fallback: the size of the entries left out
+        """
+        if xml:
+            # Each element is written on its own line, indented
+            return sum(
+                len( '\n  ' ) + len(
+                    lxml.etree.tostring( child, encoding='utf-8' )
+                ) for child in self._iter_xml_strings( column, fallbacks=True )
+            )
+
+        data = self._json_data( column, self._locale_data, fallbacks=True )[1]
+        del data['Locale_Code']
+
+        # Each entry, after "Locale_Code", adds a separator, and "key": value
+        sep = ',:' if self.compact else ',\n{}: '.format( ' ' * JSON_INDENT )
+        return sum(
+            len( sep ) + len( self._json_text( key ) ) +
+            len( self._json_text( value ) ) for key, value in data.items()
+        )
+
+    def _json_text(self, txt):
+        """
+        Returns text as a JSON string, as UTF-8 encoded bytes
+        """
+        return json.dumps( txt, ensure_ascii=False ).encode( 'utf-8' )
+
+    def _cdata(self, txt):
+        """
+        Wraps text in CDATA tags
+
+        txtL text of entry
+        """
+        return '<![CDATA[{}]]>'.format( txt.replace( '\n', '<br/>' ) )
+
+    def _col_to_json(self, column, locales, zoutp=None):
+        """
+        Writes translated strings from one column to JSON
+
+        column: numeric index of column
+        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
+               written directly to the file system
+        locales: LocaleRegistry from "locale.json"
+        """
+        path, data, nrows, lang = self._json_data( column, locales )
+
+        # Streamed to the file, without serializing to bytes first
+        self._write_json_out_file(
+            data, path, zoutp, lang, irow=nrows, column=column
+        )
+
+    def _render_json(self, column, locales):
+        """
+        Renders translated strings from one column to JSON. Nothing is
+        written
+
+        Arguments are as for _col_to_json(). Returns a tuple of (path, JSON as
+        bytes, no. of rows, language)
+        """
+        path, data, nrows, lang = self._json_data( column, locales )
+
+        with self._stage(
+                'json_serialize', openpyxl.utils.cell.get_column_letter( column )
+        ):
+            buf = self._json_dumps( data )
+
+        return path, buf, nrows, lang
+
+    def _json_data(self, column, locales, fallbacks=False):
+        """
+        Returns a tuple of (path, dict of keys to translated strings, no. of
+        rows, language) for the JSON of one column. Arguments are as for
+        _col_to_json()
+
+        fallbacks: if True, the dict has only the entries that are left out
+             as English fallbacks with "omit_fallback", to measure them
+        """
+        lang = self._head_value( self.json_lang_row, column )
+        if not lang:
+            msg = 'Missing language name at col. "{} ({})", row "{}"'.format(
+                openpyxl.utils.cell.get_column_letter( column ), column,
+                self.json_lang_row
+            )
+            raise ValueError( msg )
+
+        try:
+            locale_name = self._get_locale_name( lang, locales )
+        except ValueError:
+            raise
+
+        data = { 'Locale_Code': locale_name }
+
+        table = self.table
+        item = openpyxl.utils.cell.get_column_letter( column )
+        omit = self._omits_fallback( column )
+
+        i = 0
+        with self._stage( 'json_strings', item ):
+            for i, (name, english, value) in enumerate(
+                    zip( table.keys, table.english_ios, table.langs[column] ),
+                    1
+            ):
+                if self.stop_on_null and not name:
+                    break
+
+                if english is None:
+                    continue
+
+                if not omit:
+                    data[name.strip()] = RE_FMT_SPEC.sub( '', value ) \
+                        if value else english
+                    continue
+
+                # English fallbacks are left out, or, to measure them, the only
+                # ones kept
+                value = RE_FMT_SPEC.sub( '', value ) if value else english
+                if ( value == english ) == fallbacks:
+                    data[name.strip()] = value
+
+        try:
+            path = self._out_json_file_name( lang )
+        except OSError:
+            raise
+
+        return path, data, i, lang
+
+    def _col_to_xml(self, column, zoutp=None):
+        """
+        Writes translated strings from one column to XML
+
+        column: numeric index ofcolumn
+        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
+               written directly to the file system
+        """
+        path, lang = self._xml_out_path( column )
+
+        with self._open_out_file( path, zoutp ) as foutp:
+            nstrs = self._write_xml( foutp, self._iter_xml_strings( column ) )
+
+        self._log_xml_written( column, path, nstrs, lang )
+
+    def _render_xml(self, column):
+        """
+        Renders translated strings from one column to XML. Nothing is
+        written
+
+        column: numeric index of column
+        Returns a tuple of (path, XML as bytes, no. of strings, language)
+        """
+        path, lang = self._xml_out_path( column )
+        item = openpyxl.utils.cell.get_column_letter( column )
+
+        strings = self._iter_xml_strings( column )
+        if self.profiler is not None:
+            # Build all elements first, so that building, and serializing
+            # them are timed separately
+            with self._stage( 'xml_strings', item ):
+                strings = list( strings )
+
+        foutp = io.BytesIO()
+        with self._stage( 'xml_serialize', item ):
+            nstrs = self._write_xml( foutp, strings )
+
+        return path, foutp.getvalue(), nstrs, lang
+
+    def _xml_out_path(self, column):
+        """
+        Returns a tuple of (path to output XML file, language) for one column
+
+        column: numeric index of column
+        """
+        lang = self._head_value( self.xml_lang_row, column )
+        if not lang:
+            msg = 'Missing language name at col. "{} ({})", row "{}"'.format(
+                openpyxl.utils.cell.get_column_letter( column ), column,
+                self.xml_lang_row
+            )
+            raise ValueError( msg )
+
+        dir, fname = self._out_xml_file_name( lang )
+
+        return os.path.join( dir, fname ), lang
+
+    def _iter_xml_strings(self, column, fallbacks=False):
+        """
+        Generator of <string> elements for translated strings in one column
+
+        column: numeric index of column
+        fallbacks: if True, only the elements that are left out as English
+             fallbacks with "omit_fallback" are generated, to measure them
+        """
+        dir = self._out_xml_file_name(
+            self._head_value( self.xml_lang_row, column )
+        )[0]
+
+        table = self.table
+        omit = self._omits_fallback( column )
+
+        for name, cdata, translatable, english, value in zip(
+                table.keys, table.cdata, table.translatable, table.english,
+                table.langs[column]
+        ):
+            if not translatable and dir != XML_LANG_ENGLISH_CODE:
+                # Non-translatable strings are output only for Englis
+                continue
+
+            if self.stop_on_null and not name:
+                break
+
+            if cdata and not value:
+                # Skip CDATA entries altogether if the language translation is
+                # missing
+                continue
+
+            if omit and ( not value or value == english ) != fallbacks:
+                # Missing translations, and those the same as English are
+                # left to the platform fallback to English
+                continue
+
+            if translatable:
+                child = lxml.etree.Element( XML_TAG_STR, name=name )
+            else:
+                # This will be written only for English: we check
+                # "translayable" above, and for non-English languages,
+                # continue if it is False 
+                child = lxml.etree.Element(
+                    XML_TAG_STR, name=name, translatable='False'
+                )
+
+            if cdata:
+                if value:
+                    child.text = self._cdata( value )
+            else:
+                if value:
+                   child.text = value
+                else:
+                    child.text = english or ''
+
+            yield child
+
+    def _write_xml(self, foutp, strings):
+        """
+        Writes Android XML to a file-like object incrementally: each <string>
+        element is written as soon as it is generated. The output is the same
+        as that of lxml.etree.tostring( ..., pretty_print=True ) for the
+        whole tree
+
+        foutp: file-like object opened for writing bytes
+        strings: iterable of <string> elements
+        Returns the no. of strings written
+        """
+        strings = iter( strings )
+
+        first = next( strings, None )
+        if first is None:
+            foutp.write(
+                lxml.etree.tostring(
+                    lxml.etree.Element( XML_TAG_ROOT ), pretty_print=True,
+                    encoding='utf-8'
+                )
+            )
+            return 0
+
+        nstrs = 0
+        with lxml.etree.xmlfile( foutp, encoding='utf-8' ) as xf:
+            with xf.element( XML_TAG_ROOT ):
+                for child in itertools.chain( (first,), strings ):
+                    xf.write( '\n  ', child )
+                    nstrs += 1
+
+                xf.write( '\n' )
+
+        foutp.write( b'\n' )
+
+        return nstrs
+
+    def _log_xml_written(self, column, path, nstrs, lang):
+        logging.info(
+            'Wrote {} strings in col. {} to XML for "{}" for language '
+            '"{}"'.format(
+                nstrs, openpyxl.utils.cell.get_column_letter( column ), path,
+                lang
+            )
+        )
+
+    def _render_col(self, xml, column):
+        """
+        Renders translated strings from one column. The locale data for JSON
+        is from the ongoing export
+
+        xml: if True, XML output is produced. else JSON
+        column: numeric index of column
+        """
+        if xml:
+            return self._render_xml( column )
+
+        return self._render_json( column, self._locale_data )
+
+    def _write_col(self, xml, column, rendered, zoutp=None):
+        """
+        Writes translated strings from one column, rendered by
+        _render_col()
+
+        xml: if True, rendered is XML. else JSON
+        column: numeric index of column
+        rendered: tuple of (path, bytes, no. of rows or strings, language)
+        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
+               written directly to the file system
+        """
+        path, buf, nrows, lang = rendered
+
+        with self._stage(
+                'write', openpyxl.utils.cell.get_column_letter( column )
+        ):
+            if not xml:
+                self._write_json_out_bytes(
+                    buf, path, zoutp, lang, irow=nrows, column=column
+                )
+                return
+
+            self._write_out_file( path, buf, zoutp )
+
+        self._log_xml_written( column, path, nrows, lang )
+
+    def _check_limits(self):
+        """
+        Sanity check for specified rows and columns
+        """
+        if self.start_col < self.ws.min_column:
+            msg = 'Start column "{}" is less than min. col "{}"'.format(
+                self.start_col, self.ws.min_column
+            )
+            raise ValueError( msg )
+
+        if self.end_col == 0:
+            self.end_col = self.ws.max_column
+        else:
+            if self.end_col > self.ws.max_column:
+                msg = 'End column "{}" is greater than min. col "{}"'.format(
+                    self.end_col, self.ws.max_column
+                )
+                raise ValueError( msg )
+
+        if self.start_row < self.ws.min_row:
+            msg = 'Start row "{}" is less than min. row "{}"'.format(
+                self.start_row, self.ws.min_row
+            )
+            raise ValueError( msg )
+
+        if self.end_row == 0:
+            self.end_row = self.ws.max_row
+        else:
+            if self.end_row > self.ws.max_row:
+                msg = 'End row "{}" is greater than min. row "{}"'.format(
+                    self.end_row, self.ws.max_row
+                )
+                raise ValueError( msg )
+
+    def _col_has_data(self, col):
+        rng = range( 1, NROWS_CHECK + 1 )
+        return bool(
+            list(
+                filter(
+                    None,
+                    [self._head_value( row, col ) for row in rng]
+                )
+            )
+        )
+
+    def _iter_rows(self):
+        """
+        Generator over the rows of the active sheet, from the first row to
+        the ending row. Each row is a tuple of cell values, read in a single
+        streaming pass over the read-only worksheet: no cell objects are
+        created
+        """
+        max_col = max(
+            self.end_col, self.english_col, self.xml_key_col,
+            self.xml_cdata_col, self.xml_trans_col
+        )
+
+        for row in self.ws.iter_rows(
+                min_row=1, max_row=self.end_row, min_col=1, max_col=max_col,
+                values_only=True
+        ):
+            yield row
+
+    def _read_rows(self):
+        """
+        Reads the active sheet in one pass. The first few rows, containing
+        language names, are kept in self._head. Rows from the starting row
+        onwards are added to the column-major model, self.table, and are
+        checked by the validator, if any
+        """
+        nhead = max(
+            self.start_row - 1, NROWS_CHECK, self.json_lang_row,
+            self.xml_lang_row
+        )
+
+        self._head = []
+
+        columns = range( self.start_col, self.end_col + 1 )
+        kwargs = dict(
+            english_col=self.english_col, xml_key_col=self.xml_key_col,
+            xml_cdata_col=self.xml_cdata_col, xml_trans_col=self.xml_trans_col,
+            text_flags=getattr( self.wb, 'text_flags', False )
+        )
+        if self.memory_budget is None:
+            self.table = TranslationTable( columns, **kwargs )
+        else:
+            self.table = SpillTable(
+                columns, self.memory_budget * MEMORY_SPILL_FRACTION,
+                **kwargs
+            )
+        validator = self.validator
+        if validator is not None:
+            validator.begin(
+                self.path, self.table, english_col=self.english_col,
+                stop_on_null=self.stop_on_null
+            )
+
+        for irow, row in enumerate( self._iter_rows(), 1 ):
+            if irow <= nhead:
+                self._head.append( row )
+
+            if irow >= self.start_row:
+                self.table.append( row )
+
+                if validator is not None:
+                    validator.check_row( irow )
+
+        self.table.finish()
+
+        if validator is not None:
+            validator.end(
+                {
+                    col: self._head_value( self.json_lang_row, col )
+                    for col in self.table.langs
+                }
+            )
+
+    def _head_value(self, row, column):
+        """
+        Returns the value of the cell at the given row, and column in the
+        first few rows of the sheet, or None if there is no such cell
+        """
+        try:
+            return self._head[row - 1][column - 1]
+        except IndexError:
+            return None
+
+    def _load(self):
+        """
+        Loads the workbook read-only, with the engine in the settings, or
+        the plain-text table, checks the row, and column limits, and reads
+        the cell values. Called once per export, however many output formats
+        are produced
+        """
+        with self._stage( 'load_workbook' ):
+            self.wb = self._open_source()
+
+        try:
+            with self._stage( 'extract' ):
+                self.ws = self.wb.active
+
+                if self.ws.max_row is None or self.ws.max_column is None:
+                    # No dimensions in the worksheet source
+                    self.ws.calculate_dimension( force=True )
+
+                self._check_limits()
+                self._read_rows()
+        except:
+            raise
+        finally:
+            # Read-only workbooks keep the source file open
+            self.wb.close()
+
+    def _open_source(self):
+        """
+        Opens the input file with the reader for the input format. Plain-text
+        tables are read with a TableReader from INPUT_SOURCES, with no
+        spreadsheet decoding
+        """
+        if self.input_fmt != IN_FMT_XLSX:
+            return INPUT_SOURCES[self.input_fmt](
+                self.path, budget=self.memory_budget
+            )
+
+        if self.engine == XLSX_ENGINE_LXML:
+            return XlsxReader( self.path, budget=self.memory_budget )
+
+        return openpyxl.load_workbook( self.path, read_only=True )
+
+    def _data_cols(self):
+        """
+        Returns the list of language columns with data in the first few
+        rows, which are converted
+        """
+        cols = []
+        for col in range( self.start_col, self.end_col + 1 ):
+            if not self._col_has_data( col ):
+                logging.info(
+                    'Skipping col. "{} ({}" which has no data in first '
+                    '{} rows'.format(
+                        openpyxl.utils.cell.get_column_letter( col ), col,
+                        NROWS_CHECK
+                    )
+                )
+                continue
+
+            cols.append( col )
+
+        return cols
+
+    def _to_target(self, xml, executor=None):
+        """
+        Writes output language files for one output format from the loaded
+        workbook. Columns are rendered in the executor, if any, and written
+        in column order. In incremental mode, the previous output of columns
+        whose input is unchanged is reused instead
+
+        xml: if True, XML output is produced. else JSON
+        executor: either None, or a concurrent.futures.Executor. If None,
+             columns are rendered one by one in this process
+        """
+        cols = self._data_cols()
+
+        fmt = OUT_FMT_XML if xml else OUT_FMT_JSON
+
+        # Output path, and input digest of each column in incremental mode
+        digests = {}
+        reuse = set()
+        zprev = None
+        if self.incremental:
+            prev = self._manifest.get( fmt, {} )
+            prev_artifacts = prev.get( 'artifacts', {} ) \
+                if prev.get( 'filesystem' ) == self.filesystem else {}
+
+            if not self.filesystem:
+                zprev = self._get_prev_zip_file( xml=xml )
+
+            for col in cols:
+                path = self._artifact_path( xml, col )
+                digest = self._input_digest( xml, col )
+                digests[col] = path, digest
+
+                if path is None or prev_artifacts.get( path ) != digest:
+                    continue
+
+                if self.filesystem:
+                    if os.path.isfile( self._out_path( path ) ):
+                        reuse.add( col )
+                elif zprev is not None and path in zprev.NameToInfo:
+                    reuse.add( col )
+
+        futures = self._submit_cols(
+            executor, xml, [col for col in cols if col not in reuse]
+        )
+
+        zoutp = self._get_zip_outfile( xml=xml )
+
+        artifacts = {}
+        try:
+            for col in cols:
+                try:
+                    if col in reuse:
+                        self._reuse_col( col, digests[col][0], zoutp, zprev )
+                    elif self.profiler is not None:
+                        # Rendered, and written as separate stages
+                        self._write_col(
+                            xml, col, self._render_col( xml, col ),
+                            zoutp=zoutp
+                        )
+                    elif col not in futures:
+                        # Written directly, without rendering to bytes first
+                        if xml:
+                            self._col_to_xml( col, zoutp=zoutp )
+                        else:
+                            self._col_to_json(
+                                col, self._locale_data, zoutp=zoutp
+                            )
+                    else:
+                        self._write_col(
+                            xml, col, futures[col].result(), zoutp=zoutp
+                        )
+
+                    if col in digests and digests[col][0] is not None:
+                        artifacts[digests[col][0]] = digests[col][1]
+
+                    if col not in reuse and self._omits_fallback( col ):
+                        self._log_fallback_saving( xml, col )
+                except (OSError, ValueError) as e:
+                    logging.error(
+                        'Exception in processing. col {}  {}:{}'.format(
+                            openpyxl.utils.cell.get_column_letter( col ),
+                            e.__class__.__name__, e
+                        )
+                    )
+                    if self.stop_on_err:
+                        for f in futures.values():
+                            f.cancel()
+                        raise
+        finally:
+            if not self.filesystem:
+                zoutp.close()
+
+            if zprev is not None:
+                zprev.close()
+                self._remove_prev_zip_file( xml=xml )
+
+        if self.incremental:
+            self._manifest[fmt] = {
+                'filesystem': self.filesystem,
+                'artifacts': artifacts,
+            }
+
+    def _log_fallback_saving(self, xml, column):
+        """
+        Records, and logs the bytes saved with omit_fallback for one column
+        """
+        path = self._artifact_path( xml, column )
+        with self._stage(
+                'fallback_saving',
+                openpyxl.utils.cell.get_column_letter( column )
+        ):
+            saved = self.fallback_savings[path] = self._fallback_saving(
+                xml, column
+            )
+
+        logging.info(
+            'Left out English fallbacks of "{}": {} bytes saved'.format(
+                path, saved
+            )
+        )
+
+    def _to_pack(self):
+        """
+        Writes the binary language pack of all language columns with data to
+        PACK_FILE_NAME in the output directory. See lang_pack.LangPack for
+        the format. Languages are named by their code in the JSON language
+        row. Missing translations are English, as in iOS JSON, but format
+        specifiers are kept, as in Android XML, for servers to fill in. The
+        pack is written to a temporary file first, and replaces the previous
+        one at once, as readers may have it mapped
+        """
+        path = self._out_path( PACK_FILE_NAME )
+        tmp_path = path + '.tmp'
+        with self._stage( 'write_pack' ), open( tmp_path, 'wb' ) as foutp:
+            nkeys, nlangs = self._write_pack( foutp )
+
+        os.replace( tmp_path, path )
+
+        logging.info(
+            'Wrote {} keys in {} languages to "{}"'.format(
+                nkeys, nlangs, path
+            )
+        )
+
+    def _write_pack(self, foutp):
+        """
+        Writes the binary language pack to a file-like object opened for
+        writing bytes, which can seek. Returns a tuple of (no. of keys, no.
+        of languages)
+        """
+        table = self.table
+
+        cols, langs = [], []
+        for col in self._data_cols():
+            lang = self._head_value( self.json_lang_row, col )
+            if not lang:
+                msg = 'Missing language name at col. "{} ({})", row ' \
+                    '"{}"'.format(
+                        openpyxl.utils.cell.get_column_letter( col ), col,
+                        self.json_lang_row
+                    )
+                logging.error( msg )
+                if self.stop_on_err:
+                    raise ValueError( msg )
+
+                continue
+
+            cols.append( col )
+            langs.append( lang.lower() )
+
+        # Row of each key: the last one for repeated keys, as in iOS JSON
+        rows = {}
+        for irow, (name, english) in enumerate(
+                zip( table.keys, table.english )
+        ):
+            if self.stop_on_null and not name:
+                break
+
+            if english is not None:
+                rows[name.strip()] = irow
+
+        # The order of code points is that of UTF-8 bytes
+        keys = sorted( rows )
+        slots = {rows[key]: i for i, key in enumerate( keys )}
+
+        start = foutp.tell()
+        foutp.write(
+            PACK_HEADER.pack(
+                PACK_MAGIC, PACK_VERSION, len( keys ), len( langs )
+            )
+        )
+        # Offsets of the tables, written once they are known
+        foutp.write( bytes( 4 * ( 2 + len( cols ) ) ) )
+
+        offsets = []
+        for strings in itertools.chain(
+                (keys, langs), ( self._pack_strings( col, slots )
+                                 for col in cols )
+        ):
+            offsets.append( foutp.tell() - start )
+            foutp.write( pack_table( strings ) )
+
+        end = foutp.tell()
+        foutp.seek( start + PACK_HEADER.size )
+        foutp.write( pack_uint32s( offsets ) )
+        foutp.seek( end )
+
+        return len( keys ), len( langs )
+
+    def _pack_strings(self, column, slots):
+        """
+        Returns the list of strings of one column for a binary language pack,
+        in the order of the keys
+
+        column: numeric index of column
+        slots: dict of row index to position of its key in the pack
+        """
+        english = self.table.english
+        strings = [None] * len( slots )
+        with self._stage(
+                'pack_strings', openpyxl.utils.cell.get_column_letter( column )
+        ):
+            for irow, value in enumerate( self.table.langs[column] ):
+                i = slots.get( irow )
+                if i is not None:
+                    strings[i] = str( value or english[irow] )
+
+        return strings
+
+    def _artifact_path(self, xml, column):
+        """
+        Returns the path of the output file for one column, or None if it
+        cannot be determined, e.g., as the language name is missing
+        """
+        try:
+            if xml:
+                return self._xml_out_path( column )[0]
+
+            return self._out_json_file_name(
+                self._head_value( self.json_lang_row, column )
+            )
+        except (AttributeError, ValueError):
+            return None
+
+    def _digest_settings(self):
+        """
+        Returns the settings, other than the workbook contents, that affect
+        the output for a column. Part of the input digest of each column
+        """
+        return (
+            MANIFEST_VERSION, self.stop_on_null, self.compact,
+            self.omit_fallback
+        )
+
+    def _input_digest(self, xml, column):
+        """
+        Returns a digest of everything that the output for one column
+        depends on: the shared columns, the language column, its language
+        names, and the settings
+        """
+        json_lang = self._head_value( self.json_lang_row, column )
+        xml_lang = self._head_value( self.xml_lang_row, column )
+
+        locale_name = None
+        if not xml and isinstance( json_lang, str ):
+            locale_name = self._locale_data.get_name( json_lang )
+
+        h = hashlib.sha256()
+        for part in (
+                self._digest_settings(), xml, json_lang, xml_lang, locale_name,
+                self.table.shared_digest(), self.table.lang_digest( column )
+        ):
+            h.update( repr( part ).encode( 'utf-8' ) )
+
+        return h.hexdigest()
+
+    def _reuse_col(self, column, path, zoutp, zprev):
+        """
+        Reuses the previous output file for one column, whose input is
+        unchanged
+
+        path: path of the output file
+        zoutp: either None, or a zipfile.ZipFile object being written. If
+               None, the file is already in the file system
+        zprev: either None, or the previous zipfile.ZipFile, being read
+        """
+        if zoutp is not None:
+            zoutp.writestr( path, zprev.read( path ) )
+
+        logging.info(
+            'Reused unchanged "{}" for col. {}'.format(
+                path, openpyxl.utils.cell.get_column_letter( column )
+            )
+        )
+
+    def _get_prev_zip_file(self, xml=False):
+        """
+        Moves the previous output .zip file, if any, aside, and returns it
+        opened for reading. Returns None if there is none
+        """
+        name = self._out_path(
+            XML_ZIP_FILE_NAME if xml else JSON_ZIP_FILE_NAME
+        )
+
+        if not zipfile.is_zipfile( name ):
+            return None
+
+        os.replace( name, name + PREV_ZIP_SFX )
+
+        return zipfile.ZipFile( name + PREV_ZIP_SFX, 'r' )
+
+    def _remove_prev_zip_file(self, xml=False):
+        """
+        Removes the previous output .zip file moved aside by
+        _get_prev_zip_file()
+        """
+        path = self._out_path(
+            XML_ZIP_FILE_NAME if xml else JSON_ZIP_FILE_NAME
+        ) + PREV_ZIP_SFX
+
+        try:
+            os.unlink( path )
+        except OSError as e:
+            logging.warning(
+                'Error in deleting previous .zip file "{}". {}:{}'.format(
+                    path, e.__class__.__name__, e
+                )
+            )
+
+    def _read_manifest(self):
+        """
+        Reads the manifest of input digests written by the previous
+        incremental run, and removes it, so that an interrupted run leads to
+        a full rebuild. Returns an empty manifest if there is none, or if it
+        is unusable
+        """
+        path = self._out_path( MANIFEST_FILE_NAME )
 
-            english =  self.ws.cell( column=self.english_col, row=row )
-            if english.value is not None:
-                cell = self.ws.cell( column=column, row=row )
+        try:
+            with open( path, 'r' ) as finp:
+                manifest = json.loads( finp.read() )
 
-                cdata = self.ws.cell(
-                    column=self.xml_cdata_col, row=row
-                ).value or ''
+            os.unlink( path )
+        except (OSError, ValueError):
+            return {}
 
-                data[name.strip()] = re.sub(
-                    RE_FMT_SPEC, '', cell.value or english.value
-                )
+        if not isinstance( manifest, dict ) or \
+           manifest.get( 'version' ) != MANIFEST_VERSION:
+            return {}
 
+        return manifest
 
-        try:
-            path = self._out_json_file_name( lang.value )
-        except OSError:
-            raise
+    def _write_manifest(self):
+        """
+        Writes the manifest of input digests for the next incremental run
+        """
+        self._manifest['version'] = MANIFEST_VERSION
 
-        self._write_json_out_file(
-            data, path, zoutp, lang.value, irow=i, column=column
-        )
+        with open( self._out_path( MANIFEST_FILE_NAME ), 'w' ) as foutp:
+            foutp.write( json.dumps( self._manifest, indent=4 ) )
 
-    def _col_to_xml(self, column, zoutp=None):
+    def _submit_cols(self, executor, xml, cols):
         """
-        Writes translated strings from one column to XML
+        Returns a dict of column index to the future of rendering it in the
+        executor, which is empty if the executor is None. A copy of this
+        object with no language columns is written to a temporary file once
+        per export, and loaded once by each worker. Each task carries only
+        the translations of its column
 
-        column: numeric index ofcolumn
-        zoutp: either None, or a zipfile.ZipFile object. If None, the file is
-               written directly to the file system
+        executor: either None, or a concurrent.futures.Executor
+        xml: if True, XML output is produced. else JSON
+        cols: indices of language columns to render
         """
-        cell = self.ws.cell( column=column, row=self.xml_lang_row )
-        if not cell.value:
-            msg = 'Missing language name at col. "{} ({})", row "{}"'.format(
-                openpyxl.utils.cell.get_column_letter( column ), column,
-                self.xml_lang_row
-            )
-            raise ValueError( msg )
+        if executor is None or not cols:
+            return {}
 
-        try:
-            dir, fname = self._out_xml_file_name( cell.value )
+        if self._worker_file is None:
+            view = copy.copy( self )
+            view.table = self.table.view( [] )
 
-            if not self._is_writable_dir( dir ):
-                os.mkdir( dir )
+            fd, self._worker_file = tempfile.mkstemp( suffix='.pickle' )
+            with os.fdopen( fd, 'wb' ) as foutp:
+                pickle.dump( view, foutp, protocol=pickle.HIGHEST_PROTOCOL )
 
-            path = os.path.join( dir, fname )
-        except OSError:
-            raise
+        return {
+            col: executor.submit(
+                _render_col_in_worker, self._worker_file, xml, col,
+                self.table.langs[col]
+            ) for col in cols
+        }
 
-        root = lxml.etree.Element( XML_TAG_ROOT )
-        for i, row in enumerate(
-                range( self.start_row, self.ws.max_row + 1 ), 1
-        ):
-            translatable = self.ws.cell(
-                column=self.xml_trans_col, row=row
-            ).value
-            translatable = True if translatable is None else \
-                           bool( translatable )
+    def _remove_worker_file(self):
+        """
+        Removes the temporary file of the state loaded by workers, if any
+        """
+        if self._worker_file is not None:
+            try:
+                os.unlink( self._worker_file )
+            except OSError as e:
+                logging.warning(
+                    'Error in deleting temporary file "{}". {}:{}'.format(
+                        self._worker_file, e.__class__.__name__, e
+                    )
+                )
+            self._worker_file = None
+
+    def __getstate__(self):
+        # The read-only workbook is closed after loading, and cannot be
+        # pickled for worker processes, which also do not need the manifest,
+        # the profiler, or the validator
+        state = self.__dict__.copy()
+        state.pop( 'wb', None )
+        state.pop( 'ws', None )
+        state.pop( '_manifest', None )
+        state.pop( 'profiler', None )
+        state.pop( 'validator', None )
+        state.pop( '_worker_file', None )
+        return state
+
+    def export(self, targets=OUT_FMTS, executor=None):
+        """
+        Writes output language files for one or more output formats. The
+        workbook is loaded only once, however many formats are produced
+
+        targets: iterable of output formats from ALL_OUT_FMTS, i.e., "json"
+             for iOS, "xml" for Android, and "pack" for the binary language
+             pack
+        executor: either None, or a process pool from get_executor() to
+             render columns in, which is left running. If None, one is
+             created as per the "jobs" setting, and shut down at the end
+        """
+        self._check_targets( targets )
 
-            if not translatable and dir != XML_LANG_ENGLISH_CODE:
-                # Non-translatable strings are output only for Englis
-                continue
+        self._load()
 
-            name = self.ws.cell(
-                column=self.xml_key_col, row=row
-            ).value or ''
-            if self.stop_on_null and not name:
-                break
+        if OUT_FMT_JSON in targets:
+            try:
+                with self._stage( 'read_locale' ):
+                    self._locale_data = self._read_locale_data()
+            except ValueError:
+                raise
 
-            cell = self.ws.cell( column=column, row=row )
-            cdata = self.ws.cell(
-                column=self.xml_cdata_col, row=row
-            ).value or ''
-            if (cdata == 1 or cdata.lower() == 'yes') and not cell.value:
-                # Skip CDATA entries altogether if the language translation is
-                # missing
-                continue
+        if self.out_dir:
+            os.makedirs( self.out_dir, exist_ok=True )
 
-            if translatable:
-                child = lxml.etree.SubElement( root, XML_TAG_STR, name=name )
-            else:
-                # This will be written only for English: we check
-                # "translayable" above, and for non-English languages,
-                # continue if it is False 
-                child = lxml.etree.SubElement(
-                    root, XML_TAG_STR, name=name, translatable='False'
-                )
+        if self.incremental:
+            self._manifest = self._read_manifest()
 
-            if cdata == 1 or cdata.lower() == 'yes':
-                if cell.value:
-                    child.text = self._cdata( cell.value )
-            else:
-                if cell.value:
-                   child.text = cell.value
-                else:
-                    english =  self.ws.cell( column=self.english_col, row=row )
-                    child.text = english.value or ''
- 
-        with open( path, 'wb' ) as foutp:
-            foutp.write(
-                lxml.etree.tostring(
-                    root, pretty_print=True, encoding='utf-8'
-                )
-            )
+        self.fallback_savings = {}
 
-        logging.info(
-            'Wrote {} strings in col. {} to XML for "{}" for language '
-            '"{}"'.format(
-                i, openpyxl.utils.cell.get_column_letter( column ), path,
-                cell.value
-            )
-        )
+        executor, own_executor = self._executor( executor )
+        try:
+            if OUT_FMT_JSON in targets:
+                self._to_target( False, executor=executor )
 
-        if zoutp is not None:
-            zoutp.write( path )
+            if OUT_FMT_XML in targets:
+                self._to_target( True, executor=executor )
 
-            shutil.rmtree( dir )
+            if OUT_FMT_PACK in targets:
+                self._to_pack()
+        finally:
+            if own_executor and executor is not None:
+                executor.shutdown()
+            self._remove_worker_file()
 
-    def _check_limits(self):
-        """
-        Sanity check for specified rows and columns
-        """
-        if self.start_col < self.ws.min_column:
-            msg = 'Start column "{}" is less than min. col "{}"'.format(
-                self.start_col, self.ws.min_column
-            )
-            raise ValueError( msg )
+        if self.incremental:
+            self._write_manifest()
 
-        if self.end_col == 0:
-            self.end_col = self.ws.max_column
-        else:
-            if self.end_col > self.ws.max_column:
-                msg = 'End column "{}" is greater than min. col "{}"'.format(
-                    self.end_col, self.ws.max_column
-                )
-                raise ValueError( msg )
+        if self.memory_budget is not None:
+            self._log_peak_memory()
 
-        if self.start_row < self.ws.min_row:
-            msg = 'Start row "{}" is less than min. row "{}"'.format(
-                self.start_row, self.ws.min_row
-            )
-            raise ValueError( msg )
+    to_all = export
 
-        if self.end_row == 0:
-            self.end_row = self.ws.max_row
-        else:
-            if self.end_row > self.ws.max_row:
-                msg = 'End row "{}" is greater than min. row "{}"'.format(
-                    self.end_row, self.ws.max_row
-                )
-                raise ValueError( msg )
+    def render(self, targets=OUT_FMTS, parse=False, executor=None):
+        """
+        Returns the output language files for one or more output formats in
+        memory, with nothing written: a dict of output format to a dict of
+        the paths of its files, as in the .zip files, to their contents as
+        bytes. The workbook is loaded only once. The files can be written
+        with write_artifacts()
+
+        targets: iterable of output formats from ALL_OUT_FMTS
+        parse: if True, iOS JSON, and Android XML files are dicts of keys to
+             strings, as read by the apps, instead of bytes. The language
+             pack is bytes in any case
+        executor: as for export()
+        """
+        self._check_targets( targets )
 
-    def _col_has_data(self, col):
-        rng = range( 1, NROWS_CHECK + 1 )
-        return bool(
-            list(
-                filter(
-                    None,
-                    [self.ws.cell( column=col, row=row ).value for row in rng]
-                )
-            )
-        )
+        self._load()
 
-    def to_out(self, xml=True):
-        """
-        Writes output language files
+        if OUT_FMT_JSON in targets:
+            with self._stage( 'read_locale' ):
+                self._locale_data = self._read_locale_data()
 
-        xml: if True, XML output is produced. else JSON
-        """
+        executor, own_executor = self._executor( executor )
         try:
-            self.wb = openpyxl.load_workbook( self.path )
-            self.ws = self.wb.active
+            artifacts = {}
+            for target in targets:
+                if target == OUT_FMT_PACK:
+                    with self._stage( 'write_pack' ):
+                        foutp = io.BytesIO()
+                        self._write_pack( foutp )
+
+                    artifacts[target] = { PACK_FILE_NAME: foutp.getvalue() }
+                else:
+                    artifacts[target] = self._render_target(
+                        target == OUT_FMT_XML, parse=parse, executor=executor
+                    )
+        finally:
+            if own_executor and executor is not None:
+                executor.shutdown()
+            self._remove_worker_file()
 
-            self._check_limits()
-        except:
-            raise
+        return artifacts
 
-        if not xml:
-            try:
-                locale_codes, locale_names = self._read_locale_data()
-            except ValueError:
-                raise
+    def _render_target(self, xml, parse=False, executor=None):
+        """
+        Returns a dict of output paths to the contents of the files for one
+        output format from the loaded workbook. Arguments are as for
+        render(), and _to_target()
+        """
+        cols = self._data_cols()
 
-        zoutp = self._get_zip_outfile()
+        futures = {} if parse else self._submit_cols( executor, xml, cols )
 
-        for col in range( self.start_col, self.end_col + 1 ):
-            if not self._col_has_data( col ):
-                logging.info(
-                    'Skipping col. "{} ({}" which has no data in first '
-                    '{} rows'.format(
-                        openpyxl.utils.cell.get_column_letter( col ), col,
-                        NROWS_CHECK
-                    )
-                )
-                continue
+        # Android XML is parsed as it is when converted to iOS JSON
+        xml2json = XML2JSON( [] )
 
+        files = {}
+        for col in cols:
             try:
-                if xml:
-                    self._col_to_xml( col, zoutp=zoutp )
+                if not parse:
+                    path, buf, _, _ = futures[col].result() \
+                        if col in futures else self._render_col( xml, col )
+                    files[path] = buf
+                elif xml:
+                    path, buf, _, _ = self._render_xml( col )
+                    files[path] = dict(
+                        xml2json._iter_strings( io.BytesIO( buf ), path )
+                    )
                 else:
-                    self._col_to_json(
-                        col, locale_codes, locale_names, zoutp=zoutp
+                    path, data, _, _ = self._json_data(
+                        col, self._locale_data
                     )
+                    files[path] = data
             except (OSError, ValueError) as e:
                 logging.error(
                     'Exception in processing. col {}  {}:{}'.format(
@@ -464,12 +2872,108 @@ class AppLangTranslate(_BaseLangTranslate):
                     )
                 )
                 if self.stop_on_err:
-                    if not self.filesystem:
-                        zoutp.close()
+                    for f in futures.values():
+                        f.cancel()
                     raise
 
-        if not self.filesystem:
-            zoutp.close()
+        return files
+
+    def _check_targets(self, targets):
+        for target in targets:
+            if target not in ALL_OUT_FMTS:
+                raise ValueError(
+                    'Unknown output format "{}". Should be one of "{}"'.format(
+                        target, ALL_OUT_FMTS
+                    )
+                )
+
+    def _executor(self, executor):
+        """
+        Returns a tuple of (executor to render columns in, or None to render
+        them in this process, True if it is to be shut down at the end)
+
+        executor: either None, or a process pool from get_executor(). If
+             None, one is created as per the "jobs" setting
+        """
+        if self.profiler is not None or self.memory_budget is not None:
+            # Stages are timed in this process only, and memory-bounded mode
+            # converts one language at a time
+            return None, False
+
+        if executor is None:
+            return get_executor( self.jobs ), True
+
+        return executor, False
+
+    def to_pack(self):
+        """
+        Writes the binary language pack of all languages, for servers
+        """
+        self.export( [OUT_FMT_PACK] )
+
+    def _log_peak_memory(self):
+        peak = get_peak_memory()
+        if peak is None:
+            return
+
+        logging.info(
+            'Peak memory {:.1f} MiB, with a budget of {:.1f} MiB'.format(
+                peak / 2**20, self.memory_budget / 2**20
+            )
+        )
+
+    def watch(self, targets=OUT_FMTS, interval=WATCH_INTERVAL):
+        """
+        Writes output language files for one or more output formats, and then
+        again whenever the workbook changes, until interrupted, e.g., by
+        KeyboardInterrupt. Changes are detected by polling the modification
+        time, and size of the workbook. Runs are incremental, so only
+        languages whose column changed are converted again. Imports, and the
+        locale data stay loaded between runs
+
+        targets: iterable of output formats from ALL_OUT_FMTS
+        interval: polling interval in seconds
+        """
+        self.incremental = True
+
+        # Limits of zero mean the last row, and column, which may change
+        end_col, end_row = self.end_col, self.end_row
+
+        last = None
+        while True:
+            try:
+                st = os.stat( self.path )
+                current = st.st_mtime_ns, st.st_size
+            except OSError:
+                # The file may be briefly missing while it is being saved
+                current = None
+
+            if current is not None and current != last:
+                last = current
+
+                self.end_col, self.end_row = end_col, end_row
+                try:
+                    self.export( targets )
+                    logging.info(
+                        'Converted "{}" after a change'.format( self.path )
+                    )
+                except Exception as e:
+                    # Wait for the next change, e.g., after a partial save
+                    logging.error(
+                        'Processing failed for "{}". {}:{}'.format(
+                            self.path, e.__class__.__name__, e
+                        )
+                    )
+
+            time.sleep( interval )
+
+    def to_out(self, xml=True):
+        """
+        Writes output language files
+
+        xml: if True, XML output is produced. else JSON
+        """
+        self.export( [OUT_FMT_XML if xml else OUT_FMT_JSON] )
 
     to_xml = to_out
 
@@ -484,7 +2988,10 @@ class XML2JSON(_BaseLangTranslate):
     Converts Android XML language files (either single files, or a .zip of
     multiple XML files) to the corresponding JSON format for iOS.
     """
-    def __init__(self, files, stop_on_err=False, filesystem=False):
+    def __init__(
+            self, files, stop_on_err=False, filesystem=False, jobs=1,
+            out_dir='', profiler=None, compact=False
+    ):
         """
         files: list of input files. Each is either a path to an Android XML
                language file, named as per convention:
@@ -499,10 +3006,23 @@ class XML2JSON(_BaseLangTranslate):
         stop_on_err: if True,processing stops if there is an error in any col.
         filesystem: if True, individual output files are written directly to
              the filesystem, else they are written to a .zip file
+        jobs: no. of worker processes in which members of .zip input files
+             are converted concurrently. Zero means the no. of CPUs
+        out_dir: directory in which output files, and the .zip file are
+             written. '' is the current directory
+        profiler: either None, or a Profiler in which the stages of the
+             conversion are recorded, for each language. Files are then
+             converted in this process, whatever the "jobs" setting
+        compact: if True, iOS JSON is written compactly, with no whitespace,
+             else it is indented
         """
         self.files = files
         self.filesystem = filesystem
         self.stop_on_err = stop_on_err
+        self.jobs = jobs
+        self.out_dir = out_dir
+        self.profiler = profiler
+        self.compact = compact
 
     def _get_lang_from_file(self, fname):
         vals = os.path.splitext( fname )
@@ -519,9 +3039,13 @@ class XML2JSON(_BaseLangTranslate):
         return vals[0]
 
     def _get_lang_from_dir(self, dir):
+        if dir == XML_LANG_ENGLISH_CODE:
+            # Default resources, which are in English
+            return JSON_LANG_ENGLISH_CODE
+
         vals = dir.rsplit( '-', maxsplit=1 )
         if vals[0] != 'values':
-            logger.warn(
+            logging.warning(
                 f'Directory "{dir}" does not have the expected format, '
                 f'"values-<lang>"'
             )
@@ -537,68 +3061,383 @@ class XML2JSON(_BaseLangTranslate):
             return self._get_lang_from_dir( vals[0] )
 
     def _get_text(self, elem):
-        txt = elem.text
+        txt = elem.text or ''
 
-        if 'CDATA' in txt:
-            return txt[9:-2]  # Stripped of CDATA tags
+        if txt.startswith( CDATA_START ) and txt.endswith( CDATA_END ):
+            # Stripped of CDATA tags
+            return txt[len( CDATA_START ):-len( CDATA_END )]
 
         return txt
 
-    def _proc_xml_file(self, zoutp, locale_codes, locale_names, path=None):
-        path = path or self.infile
+    def _iter_strings(self, finp, path):
+        """
+        Generator of (key, text) for the <string> elements of one Android
+        XML language file. Arguments are as for _xml_to_json()
+        """
+        # Stream through the file: each <string> element is cleared once it
+        # is handled, so that memory use does not grow with the file size
+        context = lxml.etree.iterparse(
+            finp, events=('end',), tag=XML_TAG_STR
+        )
+        for _, elem in context:
+            yield elem.attrib[XML_ATTR_STR_NAME].strip(), self._get_text( elem )
+
+            elem.clear( keep_tail=True )
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+        if context.root.tag != XML_TAG_ROOT:
+            logging.warning(
+                f'Root element in XML file "{path}" is "{context.root.tag}" '
+                f'instead of "{XML_TAG_ROOT}"'
+            )
+
+    def _xml_to_json(self, finp, path, locales):
+        """
+        Converts one Android XML language file to iOS JSON. Nothing is
+        written
+
+        finp: path to the XML file, or a file-like object opened for reading
+              bytes
+        path: path to the XML file, or name of its member in a .zip file.
+              The language is from this
+        locales: LocaleRegistry from "locale.json"
+        Returns a tuple of (output path, JSON as bytes, no. of strings,
+        language)
+        """
+        outname, data, nstrs, lang = self._xml_to_data( finp, path, locales )
+
+        with self._stage( 'json_serialize', lang ):
+            buf = self._json_dumps( data )
 
+        return outname, buf, nstrs, lang
+
+    def _xml_to_data(self, finp, path, locales):
+        """
+        Reads one Android XML language file. Arguments are as for
+        _xml_to_json(). Returns a tuple of (output path, dict of keys to
+        translated strings, no. of strings, language)
+        """
         lang = self._get_lang( path )
 
         outname = lang + '.json'
 
-        doc = lxml.etree.parse( path )
+        locale_name = self._get_locale_name( lang, locales )
+        data = { 'Locale_Code': locale_name } 
 
-        root = doc.getroot()
-        if root.tag != 'resources':
-            logger.warn(
-                f'Root element in XML file "{path}" is "{root_tag}" instead '
-                f'of "resources"'
-            )
+        with self._stage( 'xml_parse', lang ):
+            for name, txt in self._iter_strings( finp, path ):
+                data[name] = txt
 
-        locale_name = self._get_locale_name( lang, locale_codes, locale_names )
-        data = { 'Locale_Code': locale_name } 
+        return outname, data, len( data ) - 1, lang
+
+    def _zip_member_to_json(self, zpath, fname, locales):
+        """
+        Converts one Android XML language file in a .zip file to iOS JSON,
+        reading it directly from the .zip file. Returns as for
+        _xml_to_json()
+
+        zpath: path to the .zip file
+        fname: name of the member in the .zip file
+        """
+        with zipfile.ZipFile( zpath, 'r' ) as zinp:
+            with zinp.open( fname ) as finp:
+                return self._xml_to_json(
+                    finp, fname, locales
+                )
+
+    def _write_json(self, converted, zoutp):
+        """
+        Writes an iOS JSON file converted by _xml_to_json()
+        """
+        outname, buf, nstrs, lang = converted
 
-        for elem in root.xpath( '//string' ):
-            name = elem.attrib['name']
-            data[name.strip()] = self._get_text( elem )
+        with self._stage( 'write', lang ):
+            self._write_json_out_bytes( buf, outname, zoutp, lang, irow=nstrs )
 
-        self._write_json_out_file( data, outname, zoutp, lang )
+    def _proc_xml_file(
+            self, zoutp, locales, path=None, finp=None
+    ):
+        """
+        Converts one Android XML language file to iOS JSON, and writes it
+
+        path: path to the XML file, or name of its member in a .zip file.
+              Default is the current input file
+        finp: either None, or a file-like object to read the XML from. If
+              None, the XML is read from path
+        """
+        path = path or self.infile
+        finp = path if finp is None else finp
+
+        if self.profiler is not None:
+            # Serialized, and written as separate stages
+            self._write_json( self._xml_to_json( finp, path, locales ), zoutp )
+            return
 
-    def _proc_zip_file(self, zoutp, locale_codes, locale_names, path=None):
+        # Streamed to the file, without serializing to bytes first
+        outname, data, nstrs, lang = self._xml_to_data( finp, path, locales )
+        self._write_json_out_file( data, outname, zoutp, lang, irow=nstrs )
+
+    def _proc_zip_file(
+            self, zoutp, locales, path=None, executor=None
+    ):
+        """
+        Converts all Android XML language files in a .zip file to iOS JSON,
+        and writes them. Members are read directly from the .zip file, and
+        are not extracted
+
+        path: path to the .zip file. Default is the current input file
+        executor: either None, or a concurrent.futures.Executor in which
+             members are converted concurrently. They are written in the
+             order in the .zip file in any case
+        """
         path = path or self.infile
 
         with zipfile.ZipFile( path, 'r' ) as zinp:
-            for fname in zinp.namelist():
-                with zinp.open( fname ) as finp:
-                    self._proc_xml_file(
-                        zoutp, locale_codes, locale_names, path=fname
-                    )
+            fnames = [
+                fname for fname in zinp.namelist() if not fname.endswith( '/' )
+            ]
+
+            if executor is None:
+                for fname in fnames:
+                    with zinp.open( fname ) as finp:
+                        self._proc_xml_file(
+                            zoutp, locales, path=fname,
+                            finp=finp
+                        )
+                return
+
+        futures = [
+            executor.submit(
+                _convert_zip_member_in_worker, self, path, fname, locales
+            ) for fname in fnames
+        ]
+
+        try:
+            for future in futures:
+                self._write_json( future.result(), zoutp )
+        except:
+            for future in futures:
+                future.cancel()
+            raise
 
     def to_json(self):
         """
         Writes output JSON files in iOS language format
         """
         try:
-            locale_codes, locale_names = self._read_locale_data()
+            with self._stage( 'read_locale' ):
+                locales = self._read_locale_data()
         except ValueError:
             raise
 
+        if self.out_dir:
+            os.makedirs( self.out_dir, exist_ok=True )
+
         zoutp = self._get_zip_outfile()
 
+        # Stages are timed in this process only
+        executor = None if self.profiler is not None else \
+            get_executor( self.jobs )
+
+        try:
+            for f in self.files:
+                try:
+                    self.infile = f
+
+                    if zipfile.is_zipfile( self.infile ):
+                        self._proc_zip_file(
+                            zoutp, locales,
+                            executor=executor
+                        )
+                    else:
+                        # Assume XML file
+                        self._proc_xml_file(
+                            zoutp, locales
+                        )
+                except Exception as e:
+                    logging.error(
+                        'Exception in processing "{}". {}:{}'.format(
+                            f, e.__class__.__name__, e
+                        )
+                    )
+                    if self.stop_on_err:
+                        raise
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+            if not self.filesystem:
+                zoutp.close()
+
+    def render(self, parse=False):
+        """
+        Returns the iOS JSON files converted from the input files in memory,
+        with nothing written: a dict of output paths, as in the .zip file,
+        to their contents as bytes. Files are converted in this process. They
+        can be written with write_artifacts()
+
+        parse: if True, files are dicts of keys to strings, as read by the
+             apps, instead of bytes
+        """
+        with self._stage( 'read_locale' ):
+            locales = self._read_locale_data()
+
+        convert = self._xml_to_data if parse else self._xml_to_json
+
+        files = {}
         for f in self.files:
             try:
-                self.infile = f
-
-                if zipfile.is_zipfile( self.infile ):
-                    self._proc_zip_file( zoutp, locale_codes, locale_names )
-                else:
+                if not zipfile.is_zipfile( f ):
                     # Assume XML file
-                    self._proc_xml_file( zoutp, locale_codes, locale_names )
+                    outname, out, _, _ = convert( f, f, locales )
+                    files[outname] = out
+                    continue
+
+                with zipfile.ZipFile( f, 'r' ) as zinp:
+                    for fname in zinp.namelist():
+                        if fname.endswith( '/' ):
+                            continue
+
+                        with zinp.open( fname ) as finp:
+                            outname, out, _, _ = convert(
+                                finp, fname, locales
+                            )
+                            files[outname] = out
             except Exception as e:
-                if stop_on_err:
+                logging.error(
+                    'Exception in processing "{}". {}:{}'.format(
+                        f, e.__class__.__name__, e
+                    )
+                )
+
+                if self.stop_on_err:
                     raise
+
+        return files
+
+def write_artifacts(artifacts, out_dir='', zip_name=None):
+    """
+    Writes output files rendered in memory, e.g., by
+    AppLangTranslate.render(), or XML2JSON.render(), either to the
+    filesystem, or to a .zip file. Returns the paths written
+
+    artifacts: dict of output paths to contents as bytes, e.g., for one
+         output format
+    out_dir: directory in which files, or the .zip file are written.
+         Created if needed. '' is the current directory
+    zip_name: either None, or the name of a .zip file to write the files
+         to, e.g., "ios_languages.zip". If None, the files are written
+         directly to the filesystem
+    """
+    if out_dir:
+        os.makedirs( out_dir, exist_ok=True )
+
+    if zip_name is not None:
+        path = os.path.join( out_dir, zip_name )
+        with zipfile.ZipFile( path, mode='w' ) as zoutp:
+            for name, buf in artifacts.items():
+                zoutp.writestr( name, buf )
+
+        return [path]
+
+    paths = []
+    for name, buf in artifacts.items():
+        path = os.path.join( out_dir, name )
+        dir = os.path.dirname( path )
+        if dir:
+            os.makedirs( dir, exist_ok=True )
+
+        with open( path, 'wb' ) as foutp:
+            foutp.write( buf )
+
+        paths.append( path )
+
+    return paths
+
+def export_batch(
+        paths, targets=OUT_FMTS, out_dir='', jobs=1, stop_on_err=False,
+        level=None, fallback_savings=None, **kwargs
+):
+    """
+    Writes output language files for many workbooks in one process, sharing
+    the locale data, and one process pool. The output of each workbook is
+    written to a sub-directory of out_dir named after the workbook, e.g.,
+    "app/ios_languages.zip" for "app.xlsx"
+
+    paths: paths to input files, or to directories, in which all .xlsx files
+         are converted, or all files of the input format in kwargs, if any
+    targets: iterable of output formats from ALL_OUT_FMTS
+    out_dir: directory in which the sub-directories are created
+    jobs: no. of worker processes shared by all workbooks. Zero means the no.
+         of CPUs
+    stop_on_err: if True, processing stops at the first workbook with an
+         error, else errors are collected, and the rest are processed
+    level: either None, or the logging level, as for set_log_level()
+    fallback_savings: either None, or a dict to which the bytes saved with
+         "omit_fallback" are added for each workbook converted, as a dict
+         of workbook path to AppLangTranslate.fallback_savings
+    kwargs: other keyword arguments for AppLangTranslate
+    Returns a dict of failed workbook paths to exceptions. Empty if all
+    succeeded
+    """
+    input_fmt = kwargs.get( 'input_fmt' ) or IN_FMT_XLSX
+    exts = tuple(
+        ext for ext, fmt in IN_FMT_EXTS.items() if fmt == input_fmt
+    )
+
+    files = []
+    for path in paths:
+        if os.path.isdir( path ):
+            files.extend(
+                os.path.join( path, fname )
+                for fname in sorted( os.listdir( path ) )
+                if fname.lower().endswith( exts ) and
+                not fname.startswith( '~$' )  # Excel lock files
+            )
+        else:
+            files.append( path )
+
+    names = {}
+    for path in files:
+        name = os.path.splitext( os.path.basename( path ) )[0]
+        if name in names:
+            raise ValueError(
+                'Workbooks "{}", and "{}" would have the same output '
+                'directory "{}"'.format( names[name], path, name )
+            )
+        names[name] = path
+
+    failed = {}
+    executor = get_executor( jobs )
+    try:
+        for name, path in names.items():
+            try:
+                app_lang_translate = AppLangTranslate(
+                    path, stop_on_err=stop_on_err,
+                    out_dir=os.path.join( out_dir, name ), **kwargs
+                )
+
+                if level:
+                    app_lang_translate.set_log_level( level )
+
+                app_lang_translate.export( targets, executor=executor )
+
+                if fallback_savings is not None:
+                    fallback_savings[path] = \
+                        app_lang_translate.fallback_savings
+            except Exception as e:
+                logging.error(
+                    'Processing failed for "{}". {}:{}'.format(
+                        path, e.__class__.__name__, e
+                    )
+                )
+                failed[path] = e
+
+                if stop_on_err:
+                    break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return failed
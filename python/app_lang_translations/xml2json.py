@@ -26,8 +26,8 @@ import argparse
 import logging
 import sys
 
-from constants import LOG_LEVELS, JSON_ZIP_FILE_NAME
-from utils import XML2JSON
+from constants import LOG_LEVELS, JSON_ZIP_FILE_NAME, PROFILE_FILE_NAME
+from utils import Profiler, XML2JSON
 
 EXIT_SUCCESS = 0
 EXIT_FAILURE_MISSING_ARG = 1
@@ -58,8 +58,64 @@ def _parse_command_line():
         ' processing'
     )
 
+    parser.add_argument(
+        '-j', '--jobs', default=1, type=int,
+        help='No. of worker processes in which the XML files in a .zip input '
+        'file are converted concurrently. Zero means the no. of CPUs. '
+        'Default is "1"'
+    )
+
+    parser.add_argument(
+        '--compact', default=False, action='store_true',
+        help='Write iOS JSON files compactly, with no whitespace, which is '
+        'smaller, and faster. orjson is used, if installed. Default is to '
+        'indent them'
+    )
+
+    parser.add_argument(
+        '--profile', nargs='?', const=PROFILE_FILE_NAME,
+        help='Write a JSON report of the wall time, CPU time, and peak '
+        'memory of each stage, in total, and for each language, to this '
+        'file. Files are then converted in this process, whatever the no. '
+        'of jobs, and memory tracing slows conversion down. Default file is '
+        '"{}"'.format( PROFILE_FILE_NAME )
+    )
+
+    parser.add_argument(
+        '--profile_stats',
+        help='Write cProfile statistics of the conversion to this file, for '
+        'the "pstats" module'
+    )
+
     return parser.parse_known_args()
 
+def _write_profile(args, profiler):
+    """
+    Stops the profiler, and writes the report, and the cProfile statistics
+    as requested on the command line
+    """
+    profiler.stop()
+
+    try:
+        if args.profile:
+            profiler.write_report( args.profile )
+            logging.info(
+                'Wrote profiling report to "{}"'.format( args.profile )
+            )
+
+        if args.profile_stats:
+            profiler.dump_stats( args.profile_stats )
+            logging.info(
+                'Wrote cProfile statistics to "{}"'.format(
+                    args.profile_stats
+                )
+            )
+    except OSError as e:
+        print(
+            'Writing profile failed. {}:{}'.format( e.__class__.__name__, e ),
+            file=sys.stderr
+        )
+
 def main():
     args, files = _parse_command_line()
 
@@ -71,9 +127,15 @@ def main():
 
         exit( EXIT_FAILURE_MISSING_ARG )
 
+    profiler = None
+    if args.profile or args.profile_stats:
+        profiler = Profiler( stats=bool( args.profile_stats ) )
+        profiler.start()
+
     try:
         xml2json = XML2JSON(
-            files, stop_on_err=args.stop_on_err, filesystem=args.filesystem
+            files, stop_on_err=args.stop_on_err, filesystem=args.filesystem,
+            jobs=args.jobs, profiler=profiler, compact=args.compact
         )
 
         if args.level:
@@ -93,11 +155,13 @@ def main():
             )
     except Exception as e:
         print(
-            f'Processing failed for input file "{f}". '
-            f'{e.__class__.__name__}:{e}', file=sys.stderr
+            f'Processing failed. {e.__class__.__name__}:{e}', file=sys.stderr
             )
 
         exit( EXIT_FAILURE_RUNTIME_ERROR )
+    finally:
+        if profiler is not None:
+            _write_profile( args, profiler )
 
     exit( EXIT_SUCCESS )
 